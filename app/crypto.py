@@ -6,16 +6,49 @@ Title: crypto.py
 
 Author: theStygianArchitect
 """
+import base64
+import mmap
 import os
+import struct
 import sys
+import tempfile
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from functools import partial
+from itertools import repeat
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Tuple
+from typing import Union
 
 try:
+    from cryptography.exceptions import InvalidTag
     from cryptography.fernet import Fernet
+    from cryptography.fernet import InvalidToken
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import ciphers
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives import hmac
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 except ModuleNotFoundError:
     print('Please install packaged libraries')
     sys.exit(1)
 
+try:
+    import pandas
+except ModuleNotFoundError:
+    pandas = None  # pylint: disable=C0103
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_FILE_CHUNK_SIZE = 1 << 20
+FILE_MAGIC = b'ASC1'
+_FILE_HEADER = struct.Struct('>4sI16s')
+_FILE_TAG_SIZE = 16
+
 
 def generate_key() -> str:
     """Generate a Fernet compatible key.
@@ -29,6 +62,450 @@ def generate_key() -> str:
     return Fernet.generate_key().decode('utf-8')
 
 
+class Cipher:
+    """Fernet encryption with the key decoded once.
+
+    Fernet(key) decodes the key and splits it into the signing and
+    encryption keys; a Cipher does that once and reuses the result
+    for every value, which matters when millions of values share a
+    key.
+    """
+
+    def __init__(self, key: str):
+        """Initialize a cipher, decoding key once."""
+        if not key:
+            raise ValueError('key must be present')
+        self.key = key
+        self._fernet = Fernet(key.encode())
+        raw_key = base64.urlsafe_b64decode(key.encode())
+        self._signing_mac = hmac.HMAC(raw_key[:16], hashes.SHA256(), backend=default_backend())
+        self._algorithm = ciphers.algorithms.AES(raw_key[16:])
+        iv_key = self._mac(self._signing_mac, b'deterministic initialization vector')
+        self._iv_mac = hmac.HMAC(iv_key, hashes.SHA256(), backend=default_backend())
+
+    @staticmethod
+    def _mac(mac: 'hmac.HMAC', data: bytes) -> bytes:
+        """Return the HMAC-SHA256 of data from a copy of a keyed mac."""
+        mac = mac.copy()
+        mac.update(data)
+        return mac.finalize()
+
+    def _deterministic_token(self, data: bytes) -> bytes:
+        """Build a Fernet token whose IV and timestamp depend only on data.
+
+        The IV is an HMAC of data under a key derived from the signing
+        key and the timestamp is zero, so equal payloads give equal
+        tokens and Fernet.decrypt still verifies and decrypts them.
+        """
+        initialization_vector = self._mac(self._iv_mac, data)[:16]
+        pad = 16 - len(data) % 16
+        encryptor = ciphers.Cipher(self._algorithm, ciphers.modes.CBC(initialization_vector),
+                                   backend=default_backend()).encryptor()
+        body = (b'\x80' + bytes(8) + initialization_vector
+                + encryptor.update(data + bytes((pad,)) * pad) + encryptor.finalize())
+        return base64.urlsafe_b64encode(body + self._mac(self._signing_mac, body))
+
+    def encrypt(self, token: str, deterministic: bool = False) -> str:
+        """Encrypt token returning a unique digest every time.
+
+        Args:
+            token(str): The payload to be encrypted.
+            deterministic(bool): Optional. Return the same digest for
+                the same token and key, so digests can be compared for
+                equality without decrypting them. This reveals which
+                values are equal.
+
+        Returns:
+            A str representation of the encrypted token
+
+        Raises:
+            ValueError if token is not present
+
+        """
+        if token:
+            if deterministic:
+                return self._deterministic_token(token.encode()).decode('utf-8')
+            return self._fernet.encrypt(token.encode()).decode('utf-8')
+        raise ValueError('token must be present')
+
+    def decrypt(self, digest: str) -> str:
+        """Decrypt the digest.
+
+        Args:
+            digest(str): The encrypted payload to be decrypted.
+
+        Returns:
+            A str representation of the decrypted digest.
+
+        Raises:
+            ValueError if digest is not present.
+
+        """
+        if digest:
+            return self._fernet.decrypt(digest.encode()).decode('utf-8')
+        raise ValueError('digest must be present')
+
+    def encrypt_many(self, tokens: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE,
+                     pool: str = None, max_workers: int = None,
+                     deterministic: bool = False) -> Union[List[str], 'pandas.Series']:
+        """Encrypt every token.
+
+        Args:
+            tokens(Iterable): The payloads to be encrypted, e.g. a
+                pandas.Series.
+            batch_size(int): Optional. The tokens handed to a worker at
+                a time.
+            pool(str): Optional. thread or process to spread the
+                batches over a worker pool; serial by default.
+            max_workers(int): Optional. The size of the worker pool.
+            deterministic(bool): Optional. See encrypt.
+
+        Returns:
+            The digests in the order of tokens, as a pandas.Series with
+            the same index when tokens is one, otherwise a list.
+
+        Raises:
+            ValueError if a token is not present or pool is unknown.
+
+        """
+        return self._map(partial(_encrypt_batch, deterministic=deterministic), tokens,
+                         batch_size, pool, max_workers)
+
+    def decrypt_many(self, digests: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE,
+                     pool: str = None,
+                     max_workers: int = None) -> Union[List[str], 'pandas.Series']:
+        """Decrypt every digest.
+
+        Args:
+            digests(Iterable): The encrypted payloads, e.g. a
+                pandas.Series.
+            batch_size(int): Optional. The digests handed to a worker
+                at a time.
+            pool(str): Optional. thread or process to spread the
+                batches over a worker pool; serial by default.
+            max_workers(int): Optional. The size of the worker pool.
+
+        Returns:
+            The tokens in the order of digests, as a pandas.Series with
+            the same index when digests is one, otherwise a list.
+
+        Raises:
+            ValueError if a digest is not present or pool is unknown.
+
+        """
+        return self._map(_decrypt_batch, digests, batch_size, pool, max_workers)
+
+    def _map(self, function, values: Iterable[str], batch_size: int, pool: str,
+             max_workers: int) -> Union[List[str], 'pandas.Series']:
+        """Run function over batches of values, optionally in a pool."""
+        if batch_size < 1:
+            raise ValueError('batch_size must be positive')
+        series = values if pandas is not None and isinstance(values, pandas.Series) else None
+        values = list(values)
+        batches = [values[start:start + batch_size]
+                   for start in range(0, len(values), batch_size)]
+        if pool is None or len(batches) < 2:
+            results = [function(self, batch) for batch in batches]
+        elif pool == 'thread':
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(function, repeat(self), batches))
+        elif pool == 'process':
+            # Processes receive the key and build their own Cipher once.
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(function, repeat(self.key), batches))
+        else:
+            raise ValueError("pool must be 'thread' or 'process'")
+        output = [value for batch in results for value in batch]
+        if series is not None:
+            return pandas.Series(output, index=series.index, name=series.name, dtype=object)
+        return output
+
+
+@lru_cache(maxsize=16)
+def _cipher(key: str) -> Cipher:
+    """Return the Cipher of key, built once per process."""
+    return Cipher(key)
+
+
+def _encrypt_batch(cipher: Union[Cipher, str], tokens: List[str],
+                   deterministic: bool = False) -> List[str]:
+    """Encrypt a batch with a Cipher or, in a worker process, a key."""
+    if isinstance(cipher, str):
+        cipher = _cipher(cipher)
+    return [cipher.encrypt(token, deterministic) for token in tokens]
+
+
+def _decrypt_batch(cipher: Union[Cipher, str], digests: List[str]) -> List[str]:
+    """Decrypt a batch with a Cipher or, in a worker process, a key."""
+    if isinstance(cipher, str):
+        cipher = _cipher(cipher)
+    return [cipher.decrypt(digest) for digest in digests]
+
+
+def _column_values(data_frame: 'pandas.DataFrame', column_name: str):
+    """Return the mask and str values of the cells that get encrypted."""
+    column = data_frame[column_name]
+    mask = (column.notna() & (column.astype(str) != '')).to_numpy()
+    return mask, [value if isinstance(value, str) else str(value)
+                  for value in column.to_numpy()[mask]]
+
+
+def _transform_columns(data_frame: 'pandas.DataFrame', columns: List[str], key: str,
+                       transform: str, **options) -> 'pandas.DataFrame':
+    """Apply encrypt_many or decrypt_many to the cells of columns."""
+    if pandas is None:
+        raise ValueError('pandas is required to encrypt DataFrame columns')
+    cipher = _cipher(key)
+    result = data_frame.copy(deep=False)
+    for column_name in columns:
+        mask, values = _column_values(data_frame, column_name)
+        column = data_frame[column_name].astype(object)
+        column[mask] = getattr(cipher, transform)(values, **options)
+        result[column_name] = column
+    return result
+
+
+def encrypt_columns(data_frame: 'pandas.DataFrame', columns: List[str], key: str, *,
+                    deterministic: bool = False, **options) -> 'pandas.DataFrame':
+    """Encrypt columns of data_frame.
+
+    This function encrypts every cell of columns with Cipher.encrypt_many
+    instead of one encrypt_string call per cell. Missing values and
+    empty strings are left as they are; other values are encrypted as
+    their str. With deterministic, equal cells give equal digests, so
+    the equality filters of pandas_aggregation_techniques work on the
+    encrypted column when the filter values are encrypted the same
+    way, e.g. filter_data_where_column_eq_value(encrypted, 'email',
+    Cipher(key).encrypt('a@b.com', deterministic=True)).
+
+    Args:
+        data_frame(pandas.DataFrame): The DataFrame object holding the
+            columns. It is not modified.
+        columns(List): The columns to encrypt.
+        key(str): The key used to encrypt the cells.
+        deterministic(bool): Optional. See Cipher.encrypt.
+        options: Optional. batch_size, pool and max_workers, see
+            Cipher.encrypt_many. With a pool the batches of a column
+            are encrypted in parallel; serial by default.
+
+    Returns:
+        A copy of data_frame with the columns encrypted.
+
+    Raises:
+        ValueError if key is not present or pandas is not installed.
+
+    """
+    return _transform_columns(data_frame, columns, key, 'encrypt_many',
+                              deterministic=deterministic, **options)
+
+
+def decrypt_columns(data_frame: 'pandas.DataFrame', columns: List[str], key: str,
+                    **options) -> 'pandas.DataFrame':
+    """Decrypt columns of data_frame encrypted by encrypt_columns.
+
+    Missing values and empty strings are left as they are. Decrypted
+    cells are str.
+
+    Args:
+        data_frame(pandas.DataFrame): The DataFrame object holding the
+            columns. It is not modified.
+        columns(List): The columns to decrypt.
+        key(str): The key used to decrypt the cells.
+        options: Optional. batch_size, pool and max_workers, see
+            Cipher.decrypt_many. With a pool the batches of a column
+            are decrypted in parallel; serial by default.
+
+    Returns:
+        A copy of data_frame with the columns decrypted.
+
+    Raises:
+        ValueError if key is not present or pandas is not installed.
+
+    """
+    return _transform_columns(data_frame, columns, key, 'decrypt_many', **options)
+
+
+def _file_key(key: str, salt: bytes) -> 'AESGCM':
+    """Derive the AES-GCM key of one encrypted file from key and salt."""
+    if not key:
+        raise ValueError('key must be present')
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt,
+                info=b'app.crypto file encryption', backend=default_backend())
+    return AESGCM(hkdf.derive(base64.urlsafe_b64decode(key.encode())))
+
+
+def _chunk_nonce_and_data(header: bytes, index: int, final: bool):
+    """Return the nonce and associated data of chunk index.
+
+    The per file key makes a counter nonce safe, and binding the
+    header, index and final flag into the tag stops chunks from being
+    swapped, reordered or cut off at a chunk boundary.
+    """
+    nonce = struct.pack('>4xQ', index)
+    return nonce, header + nonce + (b'\x01' if final else b'\x00')
+
+
+def _map_file(handle) -> Union[mmap.mmap, bytes]:
+    """Memory map handle read only; empty files cannot be mapped."""
+    if os.fstat(handle.fileno()).st_size == 0:
+        return b''
+    return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_encrypted_chunks(sink_file, data: Union[mmap.mmap, bytes], aead: 'AESGCM',
+                            header: bytes, chunk_size: int) -> int:
+    """Write header and the encrypted chunks of data, returning the chunks."""
+    chunks = max(1, -(-len(data) // chunk_size))
+    sink_file.write(header)
+    for index in range(chunks):
+        nonce, associated_data = _chunk_nonce_and_data(header, index, index == chunks - 1)
+        start = index * chunk_size
+        sink_file.write(aead.encrypt(nonce, data[start:start + chunk_size], associated_data))
+    return chunks
+
+
+def encrypt_file(source: str, sink: str, key: str,
+                 chunk_size: int = DEFAULT_FILE_CHUNK_SIZE) -> int:
+    """Encrypt the file source into sink in chunks.
+
+    This function encrypts source chunk_size bytes at a time with
+    AES-GCM under a key derived from key and a random salt, so memory
+    use does not grow with the file. source is memory mapped. Every
+    chunk carries its own tag, which lets decrypt_file_chunks verify
+    and decrypt any range of chunks without reading the others.
+
+    Args:
+        source(str): The path of the file to encrypt.
+        sink(str): The path the encrypted file is written to.
+        key(str): The key used to encrypt the file, e.g. from
+            generate_key.
+        chunk_size(int): Optional. The bytes of source in every chunk.
+
+    Returns:
+        The number of chunks written.
+
+    Raises:
+        ValueError if key is not present or chunk_size is not positive.
+
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be positive')
+    salt = os.urandom(16)
+    header = _FILE_HEADER.pack(FILE_MAGIC, chunk_size, salt)
+    aead = _file_key(key, salt)
+    with open(source, 'rb') as source_file, open(sink, 'wb') as sink_file:
+        data = _map_file(source_file)
+        try:
+            return _write_encrypted_chunks(sink_file, data, aead, header, chunk_size)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def _file_layout(data: Union[mmap.mmap, bytes], source: str) -> Tuple[bytes, bytes, int, int]:
+    """Return the header, salt, chunk stride and chunk count of an encrypted file."""
+    if len(data) < _FILE_HEADER.size + _FILE_TAG_SIZE:
+        raise ValueError(f'{source} is not an encrypted file')
+    header = data[:_FILE_HEADER.size]
+    magic, chunk_size, salt = _FILE_HEADER.unpack(header)
+    if magic != FILE_MAGIC:
+        raise ValueError(f'{source} is not an encrypted file')
+    stride = chunk_size + _FILE_TAG_SIZE
+    return header, salt, stride, -(-(len(data) - _FILE_HEADER.size) // stride)
+
+
+def _decrypt_chunk(aead: 'AESGCM', data: Union[mmap.mmap, bytes], header: bytes, index: int,
+                   stride: int) -> bytes:
+    """Verify and decrypt chunk index of a memory mapped encrypted file."""
+    offset = _FILE_HEADER.size + index * stride
+    nonce, associated_data = _chunk_nonce_and_data(header, index, offset + stride >= len(data))
+    return aead.decrypt(nonce, data[offset:offset + stride], associated_data)
+
+
+def decrypt_file_chunks(source: str, key: str, start: int = 0,
+                        stop: int = None) -> Iterator[bytes]:
+    """Yield the decrypted chunks start to stop of an encrypted file.
+
+    Only the header and the requested chunks of the memory mapped
+    source are read, so a range can be decrypted from the middle of a
+    large file. Chunk i holds the bytes i * chunk_size up to
+    (i + 1) * chunk_size of the original file.
+
+    Args:
+        source(str): The path of a file written by encrypt_file.
+        key(str): The key used to encrypt the file.
+        start(int): Optional. The first chunk to decrypt.
+        stop(int): Optional. The chunk to stop before; the end of the
+            file by default.
+
+    Yields:
+        The bytes of every chunk in the range.
+
+    Raises:
+        ValueError if source is not an encrypted file or the range is
+            outside it.
+        InvalidToken if a chunk was modified, reordered or cut off or
+            key is wrong.
+
+    """
+    with open(source, 'rb') as source_file:
+        data = _map_file(source_file)
+        try:
+            header, salt, stride, chunks = _file_layout(data, source)
+            stop = chunks if stop is None else stop
+            if not 0 <= start <= stop <= chunks:
+                raise ValueError(f'chunk range must be within 0 and {chunks}')
+            aead = _file_key(key, salt)
+            for index in range(start, stop):
+                try:
+                    yield _decrypt_chunk(aead, data, header, index, stride)
+                except InvalidTag as error:
+                    raise InvalidToken(f'chunk {index} of {source} failed '
+                                       'authentication') from error
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def decrypt_file(source: str, sink: str, key: str, start: int = 0, stop: int = None) -> int:
+    """Decrypt the file source written by encrypt_file into sink.
+
+    The bytes are written to a temporary file next to sink, which
+    replaces sink only once every chunk was verified, so a file failing
+    authentication never leaves partial plaintext at sink.
+
+    Args:
+        source(str): The path of a file written by encrypt_file.
+        sink(str): The path the decrypted bytes are written to.
+        key(str): The key used to encrypt the file.
+        start(int): Optional. The first chunk to decrypt.
+        stop(int): Optional. The chunk to stop before; the end of the
+            file by default.
+
+    Returns:
+        The number of bytes written.
+
+    Raises:
+        ValueError if source is not an encrypted file or the range is
+            outside it.
+        InvalidToken if a chunk was modified, reordered or cut off or
+            key is wrong.
+
+    """
+    written = 0
+    directory, name = os.path.split(os.path.abspath(sink))
+    handle, partial_sink = tempfile.mkstemp(prefix=f'.{name}.', suffix='.part', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as sink_file:
+            for chunk in decrypt_file_chunks(source, key, start, stop):
+                written += sink_file.write(chunk)
+        os.replace(partial_sink, sink)
+    except BaseException:
+        os.remove(partial_sink)
+        raise
+    return written
+
+
 def encrypt_string(token: str, key: str) -> str:
     """Encrypt token returning a unique digest every time.
 
@@ -47,8 +524,7 @@ def encrypt_string(token: str, key: str) -> str:
 
     """
     if token and key:
-        fernet = Fernet(key.encode())
-        return fernet.encrypt(token.encode()).decode('utf-8')
+        return _cipher(key).encrypt(token)
     raise ValueError('token and key must be present')
 
 
@@ -70,18 +546,23 @@ def decrypt_string(digest: str, key: str) -> str:
 
     """
     if digest and key:
-        fernet = Fernet(key.encode())
-        return fernet.decrypt(digest.encode()).decode('utf-8')
+        return _cipher(key).decrypt(digest)
     raise ValueError('token and key must be present')
 
 
 def main():
     """Provide access to module as standalone project."""
     parser = ArgumentParser()
-    parser.add_argument('--secret_string', required=True)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--secret_string')
+    source.add_argument('--in-file')
+    parser.add_argument('--out-file')
+    parser.add_argument('--chunk_size', type=int, default=DEFAULT_FILE_CHUNK_SIZE)
     parser.add_argument('--secret_key')
     parser.add_argument('--decrypt', default=False, action='store_true')
     args = parser.parse_args()
+    if bool(args.in_file) != bool(args.out_file):
+        parser.error('--in-file and --out-file must be used together')
 
     if not args.secret_key:
         args.secret_key = os.getenv('ENCRYPTION_KEY')
@@ -92,7 +573,11 @@ def main():
             print(f"Encryption Key: {args.secret_key}")
             sys.exit()
 
-    if args.decrypt:
+    if args.in_file and args.decrypt:
+        decrypt_file(args.in_file, args.out_file, args.secret_key)
+    elif args.in_file:
+        encrypt_file(args.in_file, args.out_file, args.secret_key, args.chunk_size)
+    elif args.decrypt:
         print(decrypt_string(args.secret_string, args.secret_key))
     else:
         print(encrypt_string(args.secret_string, args.secret_key))
@@ -0,0 +1,43 @@
+"""
+Description: This package is written to interface with databases.
+
+Title: __init__.py
+
+Author: theStygianArchitect
+"""
+from .asynchronous import async_dispose_all
+from .asynchronous import async_query_mssql_server
+from .asynchronous import async_query_mysql_server
+from .asynchronous import async_query_postgresql_server
+from .cache import QUERY_CACHE
+from .cache import QueryResultCache
+from .cache import query_cache_key
+from .engine import ENGINE_REGISTRY
+from .engine import DatabaseInformation
+from .engine import EngineRegistry
+from .engine import PoolConfiguration
+from .engine import dispose_all
+from .engine import mssql_database_connection
+from .engine import mysql_database_connection
+from .engine import postgres_database_connection
+from .fetch import read_sql_columnar
+from .lazy import LazyQuery
+from .metrics import QUERY_INSTRUMENTATION
+from .metrics import LatencyHistogram
+from .metrics import QueryInstrumentation
+from .partition import partition_ranges
+from .partition import query_partitioned
+from .partition import stream_partitioned
+from .query import query_in_batches
+from .query import query_metrics
+from .query import query_mssql_server
+from .query import query_mysql_server
+from .query import query_postgresql_server
+from .query import stream_mssql_server
+from .query import stream_mysql_server
+from .query import stream_postgresql_server
+from .statements import normalize_sql
+from .statements import sql_fingerprint
+from .write import WriteReport
+from .write import upsert_dataframe
+from .write import write_dataframe
@@ -0,0 +1,281 @@
+"""
+Description: This module queries databases without blocking the event loop.
+
+Title: asynchronous.py
+
+Author: theStygianArchitect
+"""
+import asyncio
+import os
+import sys
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from importlib.util import find_spec
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+try:
+    import pandas
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine
+except ImportError:
+    create_async_engine = None  # pylint: disable=C0103
+
+try:
+    from .engine import ENGINE_REGISTRY
+    from .engine import DatabaseInformation
+    from .engine import EngineRegistry
+    from .engine import _pool_arguments
+    from .engine import dispose_all
+    from .query import query_mssql_server
+    from .query import query_mysql_server
+    from .query import query_postgresql_server
+    from .statements import _statement
+except ImportError:
+    from app.database.engine import ENGINE_REGISTRY
+    from app.database.engine import DatabaseInformation
+    from app.database.engine import EngineRegistry
+    from app.database.engine import _pool_arguments
+    from app.database.engine import dispose_all
+    from app.database.query import query_mssql_server
+    from app.database.query import query_mysql_server
+    from app.database.query import query_postgresql_server
+    from app.database.statements import _statement
+
+DATABASE_THREAD_POOL_SIZE = int(os.getenv('DATABASE_THREAD_POOL_SIZE', '8'))
+
+# Engines are bound to the loop they were created on, so they are kept
+# per loop and dropped with it.
+_ASYNC_ENGINES: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, Any]]' = \
+    weakref.WeakKeyDictionary()
+_ASYNC_LOCK = threading.Lock()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _reset_after_fork():
+    """Drop engines and worker threads inherited from the parent process."""
+    global _EXECUTOR  # pylint: disable=W0603
+    _ASYNC_ENGINES.clear()
+    _EXECUTOR = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _database_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool used to offload blocking queries."""
+    global _EXECUTOR  # pylint: disable=W0603
+    with _ASYNC_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=DATABASE_THREAD_POOL_SIZE,
+                                           thread_name_prefix='database')
+        return _EXECUTOR
+
+
+def _async_driver(dialect: Text) -> Optional[Text]:
+    """Return the installed asyncio driver for a dialect, if any."""
+    if create_async_engine is None:
+        return None
+    driver = {'postgresql': 'asyncpg', 'mysql': 'aiomysql'}.get(dialect)
+    if driver is None or find_spec(driver) is None:
+        return None
+    return driver
+
+
+def _async_engine(dialect: Text, driver: Text, database_information: DatabaseInformation,
+                  connection_arguments: Optional[Dict]):
+    """Return the pooled asyncio engine for a connection target."""
+    loop = asyncio.get_running_loop()
+    key = EngineRegistry._registry_key(  # pylint: disable=W0212
+        dialect, database_information, False, connection_arguments)
+    with _ASYNC_LOCK:
+        for closed_loop in [other for other in _ASYNC_ENGINES if other.is_closed()]:
+            del _ASYNC_ENGINES[closed_loop]
+        engines = _ASYNC_ENGINES.setdefault(loop, {})
+        engine = engines.get(key)
+        if engine is not None:
+            return engine
+        server_name = database_information.server_fqdn
+        port = f":{database_information.port}" if database_information.port else ''
+        connection_string = (f"{dialect}+{driver}://{database_information.user_name}:"
+                             f"{database_information.user_pass}@{server_name}{port}/"
+                             f"{database_information.database_name}")
+        engine = create_async_engine(connection_string,
+                                     connect_args=dict(connection_arguments or {}),
+                                     **_pool_arguments(ENGINE_REGISTRY.pool_configuration))
+        engines[key] = engine
+        return engine
+
+
+async def _async_read_sql(engine, sql_command: Text,
+                          parameters: Optional[Dict]) -> pandas.DataFrame:
+    """Run sql_command on an asyncio engine and build a DataFrame."""
+    async with engine.connect() as connection:
+        result = await connection.execute(_statement(sql_command), parameters or {})
+        columns = list(result.keys())
+        rows = result.fetchall()
+    return pandas.DataFrame.from_records(rows, columns=columns)
+
+
+def _blocking_query(dialect: Text):
+    """Return the synchronous query function of a dialect."""
+    return {'mssql': query_mssql_server, 'postgresql': query_postgresql_server,
+            'mysql': query_mysql_server}[dialect]
+
+
+async def _run_query(dialect: Text, database_information: DatabaseInformation,
+                     sql_command: Text, timeout: Optional[float],
+                     **options: Any) -> pandas.DataFrame:
+    """Run a query on an async driver, or offload the blocking query function.
+
+    options are the keyword arguments of the blocking query function,
+    connection_arguments and parameters are also used by the async
+    driver.
+    """
+    driver = _async_driver(dialect)
+    if driver is not None:
+        engine = _async_engine(dialect, driver, database_information,
+                               options.get('connection_arguments'))
+        awaitable = _async_read_sql(engine, sql_command, options.get('parameters'))
+    else:
+        blocking_query = partial(_blocking_query(dialect), database_information, sql_command,
+                                 **options)
+        loop = asyncio.get_running_loop()
+        awaitable = loop.run_in_executor(_database_executor(), blocking_query)
+    return await asyncio.wait_for(awaitable, timeout)
+
+
+async def async_query_mssql_server(database_information: DatabaseInformation,
+                                   sql_command: Text, windows_authentication: bool = False,
+                                   connection_arguments: Dict = None,
+                                   **options: Any) -> pandas.DataFrame:
+    """Query MSSQL database without blocking the event loop.
+
+    There is no asyncio driver for MSSQL so query_mssql_server is
+    offloaded to a bounded thread pool sized by the
+    DATABASE_THREAD_POOL_SIZE environment variable.
+
+    Notes:
+        A query that times out or is cancelled stops being awaited but
+        its worker thread runs the statement to completion.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        windows_authentication(bool): Deciding variable to determine
+            the type of authentication to use.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        options(Any): Optional. The query options below.
+
+    Keyword Args:
+        timeout(float): Optional. Seconds to wait before raising
+            asyncio.TimeoutError.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+
+    Returns:
+        A tabular representation of the query result.
+
+    """
+    timeout = options.pop('timeout', None)
+    return await _run_query('mssql', database_information, sql_command, timeout,
+                            windows_authentication=windows_authentication,
+                            connection_arguments=connection_arguments, **options)
+
+
+async def async_query_postgresql_server(database_information: DatabaseInformation,
+                                        sql_command: Text, connection_arguments: Dict = None,
+                                        timeout: float = None,
+                                        parameters: Dict = None) -> pandas.DataFrame:
+    """Query PostgreSQL database without blocking the event loop.
+
+    The asyncpg driver is used when it is installed, otherwise
+    query_postgresql_server is offloaded to a bounded thread pool.
+
+    Notes:
+        connection_arguments should map to asyncpg arguments when
+        asyncpg is installed and psycopg2 arguments otherwise.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        timeout(float): Optional. Seconds to wait before raising
+            asyncio.TimeoutError.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+
+    Returns:
+        A tabular representation of the query result.
+
+    """
+    return await _run_query('postgresql', database_information, sql_command, timeout,
+                            connection_arguments=connection_arguments, parameters=parameters)
+
+
+async def async_query_mysql_server(database_information: DatabaseInformation,
+                                   sql_command: Text, connection_arguments: Dict = None,
+                                   timeout: float = None,
+                                   parameters: Dict = None) -> pandas.DataFrame:
+    """Query MySQL database without blocking the event loop.
+
+    The aiomysql driver is used when it is installed, otherwise
+    query_mysql_server is offloaded to a bounded thread pool.
+
+    Notes:
+        connection_arguments should map to aiomysql arguments when
+        aiomysql is installed and pymysql arguments otherwise.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        timeout(float): Optional. Seconds to wait before raising
+            asyncio.TimeoutError.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+
+    Returns:
+        A tabular representation of the query result.
+
+    """
+    return await _run_query('mysql', database_information, sql_command, timeout,
+                            connection_arguments=connection_arguments, parameters=parameters)
+
+
+async def async_dispose_all():
+    """Dispose every synchronous and asyncio engine and stop the thread pool.
+
+    Asyncio engines of other event loops cannot be awaited here, they
+    are dropped instead.
+    """
+    global _EXECUTOR  # pylint: disable=W0603
+    with _ASYNC_LOCK:
+        engines = list(_ASYNC_ENGINES.get(asyncio.get_running_loop(), {}).values())
+        _ASYNC_ENGINES.clear()
+        executor, _EXECUTOR = _EXECUTOR, None
+    for engine in engines:
+        await engine.dispose()
+    if executor is not None:
+        executor.shutdown(wait=False)
+    dispose_all()
@@ -0,0 +1,336 @@
+"""
+Description: This module caches query results in memory and on disk.
+
+Title: cache.py
+
+Author: theStygianArchitect
+"""
+import hashlib
+import itertools
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+try:
+    import pandas
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+try:
+    import pyarrow
+except ModuleNotFoundError:
+    pyarrow = None  # pylint: disable=C0103
+
+try:
+    from ..logger import set_up_stream_logging
+    from .engine import DatabaseInformation
+    from .engine import _freeze
+    from .statements import normalize_sql
+except ImportError:
+    from app.logger import set_up_stream_logging
+    from app.database.engine import DatabaseInformation
+    from app.database.engine import _freeze
+    from app.database.statements import normalize_sql
+
+log = set_up_stream_logging()  # pylint: disable=C0103
+
+QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', f"{256 * 1024 * 1024}"))
+QUERY_CACHE_DIRECTORY = os.getenv('QUERY_CACHE_DIRECTORY')
+QUERY_CACHE_DISK_MAX_BYTES = int(os.getenv('QUERY_CACHE_DISK_MAX_BYTES',
+                                           f"{4 * 1024 * 1024 * 1024}"))
+
+
+def query_cache_key(dialect: Text, database_information: DatabaseInformation,
+                    sql_command: Text, parameters: Any = None, **options: Any) -> Text:
+    """Build the cache key of a query.
+
+    The key covers the normalized SQL, the bound parameters and the
+    connection target. The password is never part of the key.
+
+    Args:
+        dialect(Text): One of mssql, postgresql or mysql.
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        parameters(Any): Optional. The bound parameters of the query.
+        options(Any): Other values that change the result, e.g. the
+            fetch_mode.
+
+    Returns:
+        A hex digest identifying the query result.
+
+    """
+    target = (dialect,
+              database_information.server_fqdn,
+              database_information.instance_name,
+              database_information.port,
+              database_information.logon_domain,
+              database_information.database_name,
+              database_information.user_name)
+    key = (target, normalize_sql(sql_command), _freeze(parameters), _freeze(options))
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+class _CacheEntry:  # pylint: disable=R0903
+    """Hold one cached result and its bookkeeping."""
+
+    __slots__ = ('data_frame', 'path', 'size', 'expires_at')
+
+    def __init__(self, data_frame: Optional[pandas.DataFrame], path: Optional[Text], size: int,
+                 expires_at: float):
+        """Initialize a cache entry."""
+        self.data_frame = data_frame
+        self.path = path
+        self.size = size
+        self.expires_at = expires_at
+
+
+class QueryResultCache:  # pylint: disable=R0902
+    """Memory-bounded LRU cache of query results with per-entry TTL.
+
+    Results evicted from memory are spilled to an optional on-disk
+    tier stored as Parquet (pyarrow is required for the disk tier).
+    Concurrent loads of the same key are coalesced so only one caller
+    queries the database while the others wait for its result.
+    """
+
+    def __init__(self, max_bytes: int = QUERY_CACHE_MAX_BYTES,
+                 directory: Text = QUERY_CACHE_DIRECTORY,
+                 disk_max_bytes: int = QUERY_CACHE_DISK_MAX_BYTES):
+        """Initialize an empty cache."""
+        self.max_bytes = max_bytes
+        self.directory = directory if pyarrow is not None else None
+        self.disk_max_bytes = disk_max_bytes
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._memory: 'OrderedDict[Text, _CacheEntry]' = OrderedDict()
+        self._disk: 'OrderedDict[Text, _CacheEntry]' = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._loading: Dict[Text, Future] = {}
+        self._stale_paths: List[Text] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def _pop_expired(self, tier: 'OrderedDict[Text, _CacheEntry]', key: Text,
+                     now: float) -> Optional[_CacheEntry]:
+        """Return a live entry of a tier, dropping it when expired."""
+        entry = tier.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at > now:
+            return entry
+        self.expirations += 1
+        self._discard(tier, key)
+        return None
+
+    def _discard(self, tier: 'OrderedDict[Text, _CacheEntry]', key: Text) -> _CacheEntry:
+        """Remove an entry from a tier, queueing the file of a disk entry for removal."""
+        entry = tier.pop(key)
+        if tier is self._memory:
+            self._memory_bytes -= entry.size
+        else:
+            self._disk_bytes -= entry.size
+            self._stale_paths.append(entry.path)
+        return entry
+
+    def _remove_stale_files(self):
+        """Delete the files of discarded disk entries outside the lock."""
+        with self._lock:
+            paths, self._stale_paths = self._stale_paths, []
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _spill(self, evicted: List[Tuple[Text, _CacheEntry]]):
+        """Write entries evicted from memory to the disk tier outside the lock."""
+        for key, entry in evicted:
+            if not self.directory or entry.size > self.disk_max_bytes:
+                continue
+            path = os.path.join(self.directory, f"{key}.{next(self._sequence)}.parquet")
+            try:
+                entry.data_frame.to_parquet(path, index=True)
+                size = os.path.getsize(path)
+            except (ValueError, TypeError, OSError, pyarrow.ArrowException):
+                continue
+            with self._lock:
+                if key in self._memory or key in self._disk or key in self._loading:
+                    # A newer result was stored while this one was written.
+                    self._stale_paths.append(path)
+                    continue
+                self._disk[key] = _CacheEntry(None, path, size, entry.expires_at)
+                self._disk_bytes += size
+                while self._disk_bytes > self.disk_max_bytes:
+                    self._discard(self._disk, next(iter(self._disk)))
+                    self.evictions += 1
+        self._remove_stale_files()
+
+    def _store(self, key: Text, data_frame: pandas.DataFrame,
+               ttl: float) -> List[Tuple[Text, _CacheEntry]]:
+        """Insert a result into the memory tier, returning the evicted entries to spill."""
+        size = int(data_frame.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return []
+        if key in self._memory:
+            self._discard(self._memory, key)
+        self._memory[key] = _CacheEntry(data_frame, None, size, time.monotonic() + ttl)
+        self._memory_bytes += size
+        evicted = []
+        while self._memory_bytes > self.max_bytes:
+            evicted_key, evicted_entry = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_entry.size
+            self.evictions += 1
+            evicted.append((evicted_key, evicted_entry))
+        return evicted
+
+    @staticmethod
+    def _read_spilled(entry: _CacheEntry) -> Optional[pandas.DataFrame]:
+        """Read a disk entry, removing its file; None when it is unreadable."""
+        try:
+            return pandas.read_parquet(entry.path)
+        except (ValueError, TypeError, OSError, pyarrow.ArrowException):
+            return None
+        finally:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def get_or_load(self, key: Text, loader, ttl: float) -> pandas.DataFrame:
+        """Return the cached result of key or load and cache it.
+
+        The lock only guards the index: results spilled to disk are
+        written and read outside of it, and a result read back from
+        disk is loaded once while concurrent callers wait for it.
+
+        Args:
+            key(Text): The cache key, see query_cache_key.
+            loader: A callable without arguments that returns the
+                DataFrame when the key is not cached.
+            ttl(float): Seconds the loaded result stays valid.
+
+        Returns:
+            A copy of the cached DataFrame.
+
+        """
+        spilled = None
+        with self._lock:
+            now = time.monotonic()
+            entry = self._pop_expired(self._memory, key, now)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            else:
+                future = self._loading.get(key)
+                leader = future is None
+                if leader:
+                    future = self._loading[key] = Future()
+                    spilled = self._pop_expired(self._disk, key, now)
+                    if spilled is not None:
+                        # The leader owns the file now; it is removed after reading.
+                        self._disk.pop(key)
+                        self._disk_bytes -= spilled.size
+                        self.disk_hits += 1
+                    else:
+                        self.misses += 1
+                else:
+                    self.coalesced += 1
+        self._remove_stale_files()
+        if entry is not None:
+            return entry.data_frame.copy()
+        if not leader:
+            return future.result().copy()
+        try:
+            data_frame = None
+            if spilled is not None:
+                data_frame = self._read_spilled(spilled)
+                ttl = spilled.expires_at - now
+            if data_frame is None:
+                data_frame = loader()
+        except BaseException as error:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            evicted = self._store(key, data_frame, ttl)
+            del self._loading[key]
+        future.set_result(data_frame)
+        self._spill(evicted)
+        return data_frame.copy()
+
+    def invalidate(self, key: Text = None):
+        """Drop one cached result, or every result when key is None."""
+        with self._lock:
+            for tier in (self._memory, self._disk):
+                keys = list(tier) if key is None else [key] if key in tier else []
+                for tier_key in keys:
+                    self._discard(tier, tier_key)
+        self._remove_stale_files()
+
+    def statistics(self) -> Dict:
+        """Return cache hit/miss/eviction counters and sizes."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._memory),
+                'bytes': self._memory_bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+            }
+
+
+QUERY_CACHE = QueryResultCache()
+
+
+_CALLABLE_TOKENS: 'weakref.WeakKeyDictionary[Callable, int]' = weakref.WeakKeyDictionary()
+_CALLABLE_TOKENS_LOCK = threading.Lock()
+_CALLABLE_SEQUENCE = itertools.count()
+
+
+def _callable_token(function: Optional[Callable]) -> Optional[Text]:
+    """Return the cache key part identifying a post_process callable.
+
+    Every callable object gets its own token for as long as it lives,
+    so lambdas, closures and partials sharing a name never share cache
+    entries and tokens are never reused. Callables without weak
+    reference support, e.g. builtins, are identified by their name.
+    """
+    if function is None:
+        return None
+    with _CALLABLE_TOKENS_LOCK:
+        try:
+            token = _CALLABLE_TOKENS.get(function)
+            if token is None:
+                token = _CALLABLE_TOKENS[function] = next(_CALLABLE_SEQUENCE)
+        except TypeError:
+            name = getattr(function, '__qualname__', None) or repr(function)
+            return f"{getattr(function, '__module__', '')}.{name}"
+    return f"callable-{token}"
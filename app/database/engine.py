@@ -0,0 +1,346 @@
+"""
+Description: This module creates and pools database engines.
+
+Title: engine.py
+
+Author: theStygianArchitect
+"""
+import hashlib
+import os
+import sys
+import threading
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+try:
+    from pydantic import BaseModel  # pylint: disable=E0611
+    from pytds.login import NtlmAuth
+    from sqlalchemy import create_engine
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+try:
+    from .metrics import _instrument_engine
+except ImportError:
+    from app.database.metrics import _instrument_engine
+
+
+class DatabaseInformation(BaseModel):  # pylint: disable=R0903
+    """Develop Database Information model."""
+
+    server_fqdn: Text
+    instance_name: Optional[Text] = None
+    port: Optional[int] = None
+    logon_domain: Optional[Text] = None
+    database_name: Text
+    user_name: Text
+    user_pass: Text
+
+
+class PoolConfiguration(BaseModel):  # pylint: disable=R0903
+    """Develop connection pool configuration model."""
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_pre_ping: bool = True
+    pool_recycle: int = 3600
+
+
+def _pool_arguments(pool_configuration: Optional[PoolConfiguration]) -> Dict:
+    """Convert a PoolConfiguration into create_engine arguments."""
+    if pool_configuration is None:
+        return {}
+    return {
+        'pool_size': pool_configuration.pool_size,
+        'max_overflow': pool_configuration.max_overflow,
+        'pool_pre_ping': pool_configuration.pool_pre_ping,
+        'pool_recycle': pool_configuration.pool_recycle,
+    }
+
+
+def mssql_database_connection(database_information: DatabaseInformation,
+                              windows_authentication: bool = False,
+                              connection_arguments: Dict = None,
+                              pool_configuration: PoolConfiguration = None):
+    """Create MSSQL database connection.
+
+    This function will create a sql database connection. This function
+    will support both windows and sql authentication specified by the
+    windows_authentication variable. The driver used to handle database
+    communication is python-tds.
+
+    Notes:
+        connection_arguments should map to python-tds arguments.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        windows_authentication(bool): Deciding variable to determine
+            the type of authentication to use.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        pool_configuration(PoolConfiguration): Optional. The pool
+            settings applied to the engine.
+
+    Returns:
+        The database connection object.
+
+    """
+    server_name = database_information.server_fqdn
+    database_name = database_information.database_name
+    user_name = database_information.user_name
+    user_pass = database_information.user_pass
+
+    if windows_authentication:
+        if not database_information.instance_name:
+            connection_string = f"mssql+pytds://{server_name}/{database_name}"
+        else:
+            instance_name = database_information.instance_name
+            connection_string = f"mssql+pytds://{server_name}\\{instance_name}/{database_name}"
+
+        user_name = f"{database_information.logon_domain}\\{user_name}"
+        connection_arguments = dict(connection_arguments or {})
+        if 'auth' not in connection_arguments:
+            connection_arguments['auth'] = NtlmAuth(user_name, user_pass)
+    else:
+        if not database_information.instance_name:
+            connection_string = f"mssql+pytds://{user_name}:{user_pass}@{server_name}/" \
+                                f"{database_name}"
+        else:
+            instance_name = database_information.instance_name
+            connection_string = f"mssql+pytds://{user_name}:{user_pass}@{server_name}\\" \
+                                f"{instance_name}/{database_name}"
+    engine = create_engine(connection_string, connect_args=connection_arguments or {},
+                           **_pool_arguments(pool_configuration))
+    return engine
+
+
+def postgres_database_connection(database_information: DatabaseInformation,
+                                 connection_arguments: Dict = None,
+                                 pool_configuration: PoolConfiguration = None):
+    """Create PostgreSQL database connection.
+
+    This function will create a sql database connection. The driver
+    used to handle database communication is psycopg2.
+
+    Notes:
+        connection_arguments should map to psycopg2 arguments.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        pool_configuration(PoolConfiguration): Optional. The pool
+            settings applied to the engine.
+
+    Returns:
+        The database connection object.
+
+    """
+    server_name = database_information.server_fqdn
+    database_name = database_information.database_name
+    user_name = database_information.user_name
+    user_pass = database_information.user_pass
+    port = database_information.port
+
+    connection_string = f"postgresql+psycopg2://{user_name}:{user_pass}@{server_name}:{port}/" \
+                        f"{database_name}"
+    engine = create_engine(connection_string, connect_args=connection_arguments or {},
+                           **_pool_arguments(pool_configuration))
+    return engine
+
+
+def mysql_database_connection(database_information: DatabaseInformation,
+                              connection_arguments: Dict = None,
+                              pool_configuration: PoolConfiguration = None):
+    """Create MySQL database connection.
+
+    This function will create a sql database connection. The driver
+    used to handle database communication is pymysql.
+
+    Notes:
+        connection_arguments should map to pymysql arguments.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        pool_configuration(PoolConfiguration): Optional. The pool
+            settings applied to the engine.
+
+    Returns:
+        The database connection object.
+
+    """
+    server_name = database_information.server_fqdn
+    database_name = database_information.database_name
+    user_name = database_information.user_name
+    user_pass = database_information.user_pass
+
+    connection_string = f"mysql+pymysql://{user_name}:{user_pass}@{server_name}/{database_name}"
+    engine = create_engine(connection_string, connect_args=connection_arguments or {},
+                           **_pool_arguments(pool_configuration))
+    return engine
+
+
+def _freeze(value: Any) -> Any:
+    """Convert a value into a hashable representation for registry keys."""
+    if isinstance(value, dict):
+        return tuple(sorted((f"{key}", _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class EngineRegistry:
+    """Process-wide cache of pooled SQLAlchemy engines.
+
+    Engines are keyed by the DatabaseInformation fields, the
+    authentication mode and the connection arguments so repeated
+    queries against the same target reuse one connection pool instead
+    of creating a new engine per call. The password is only kept as a
+    digest inside the key.
+    """
+
+    _builders = {
+        'mssql': mssql_database_connection,
+        'postgresql': postgres_database_connection,
+        'mysql': mysql_database_connection,
+    }
+
+    def __init__(self, pool_configuration: PoolConfiguration = None):
+        """Initialize an empty registry."""
+        self.pool_configuration = pool_configuration or PoolConfiguration()
+        self._engines: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _registry_key(dialect: Text, database_information: DatabaseInformation,
+                      windows_authentication: bool, connection_arguments: Optional[Dict]) -> Tuple:
+        """Build the lookup key for a connection target."""
+        password_digest = hashlib.sha256(database_information.user_pass.encode()).hexdigest()
+        return (dialect,
+                database_information.server_fqdn,
+                database_information.instance_name,
+                database_information.port,
+                database_information.logon_domain,
+                database_information.database_name,
+                database_information.user_name,
+                password_digest,
+                windows_authentication,
+                _freeze(connection_arguments or {}))
+
+    def configure(self, pool_configuration: PoolConfiguration):
+        """Replace the pool configuration used for newly created engines.
+
+        Engines that already exist keep their settings until
+        dispose_all is called.
+
+        Args:
+            pool_configuration(PoolConfiguration): The pool settings
+                applied to engines created from now on.
+
+        """
+        self.pool_configuration = pool_configuration
+
+    def get_engine(self, dialect: Text, database_information: DatabaseInformation,
+                   windows_authentication: bool = False, connection_arguments: Dict = None):
+        """Return the pooled engine for a connection target.
+
+        Args:
+            dialect(Text): One of mssql, postgresql or mysql.
+            database_information(DatabaseInformation): A key, value
+                object containing the database connection information.
+            windows_authentication(bool): Deciding variable to
+                determine the type of authentication to use. Only used
+                by mssql.
+            connection_arguments(Dict): A key, value object containing
+                arguments passed to the engine.
+
+        Raises:
+            ValueError - When the dialect is not supported.
+
+        Returns:
+            The database connection object.
+
+        """
+        if dialect not in self._builders:
+            raise ValueError(f"unsupported dialect: {dialect}")
+        key = self._registry_key(dialect, database_information, windows_authentication,
+                                 connection_arguments)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                self.hits += 1
+                return engine
+            self.misses += 1
+            if connection_arguments is not None:
+                connection_arguments = dict(connection_arguments)
+            if dialect == 'mssql':
+                engine = mssql_database_connection(database_information, windows_authentication,
+                                                   connection_arguments,
+                                                   self.pool_configuration)
+            else:
+                engine = self._builders[dialect](database_information, connection_arguments,
+                                                 self.pool_configuration)
+            _instrument_engine(engine)
+            self._engines[key] = engine
+            return engine
+
+    def dispose_all(self):
+        """Dispose every pooled engine and empty the registry.
+
+        Call this on application shutdown, or before forking worker
+        processes, so no connection is shared across processes.
+        """
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+        for engine in engines:
+            engine.dispose()
+
+    def statistics(self) -> Dict:
+        """Return registry hit/miss counters and the pool status of each engine."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'engines': len(self._engines),
+                'pools': [engine.pool.status() for engine in self._engines.values()],
+            }
+
+    def _reset_after_fork(self):
+        """Drop inherited engines in a forked child without closing parent connections."""
+        self._lock = threading.Lock()
+        for engine in self._engines.values():
+            try:
+                engine.dispose(close=False)
+            except TypeError:
+                pass
+        self._engines.clear()
+
+
+ENGINE_REGISTRY = EngineRegistry()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(
+        after_in_child=ENGINE_REGISTRY._reset_after_fork)  # pylint: disable=W0212
+
+
+def dispose_all():
+    """Dispose every engine held by the process-wide registry."""
+    ENGINE_REGISTRY.dispose_all()
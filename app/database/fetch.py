@@ -0,0 +1,242 @@
+"""
+Description: This module reads query results into DataFrames.
+
+Title: fetch.py
+
+Author: theStygianArchitect
+"""
+import sys
+from tempfile import SpooledTemporaryFile
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+try:
+    import numpy
+    import pandas
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+try:
+    from pymysql import cursors as pymysql_cursors
+except ModuleNotFoundError:
+    pymysql_cursors = None  # pylint: disable=C0103
+
+try:
+    import pyarrow
+    from pyarrow import csv as arrow_csv
+except ModuleNotFoundError:
+    pyarrow = None  # pylint: disable=C0103
+    arrow_csv = None  # pylint: disable=C0103
+
+try:
+    from .metrics import QUERY_INSTRUMENTATION
+    from .metrics import _QueryTrace
+    from .statements import _driver_statement
+    from .statements import _statement
+except ImportError:
+    from app.database.metrics import QUERY_INSTRUMENTATION
+    from app.database.metrics import _QueryTrace
+    from app.database.statements import _driver_statement
+    from app.database.statements import _statement
+
+FETCH_MODES = ('read_sql', 'columnar')
+COLUMNAR_BATCH_ROWS = 100000
+COPY_SPOOL_BYTES = 64 * 1024 * 1024
+
+
+def _arrow_type(dtype: Any):
+    """Convert a dtype hint into a pyarrow type."""
+    if isinstance(dtype, pyarrow.DataType):
+        return dtype
+    if f"{dtype}" in ('str', 'string', 'object'):
+        return pyarrow.string()
+    return pyarrow.from_numpy_dtype(numpy.dtype(dtype))
+
+
+def _copy_to_data_frame(engine, statement: Tuple[Text, Any], dtypes: Dict,
+                        trace: '_QueryTrace') -> pandas.DataFrame:
+    """Fetch a PostgreSQL result through COPY ... TO STDOUT.
+
+    The server streams CSV straight into a spooled buffer which is then
+    parsed by the pyarrow (or pandas) CSV reader, so no Python row
+    tuples are ever built.
+    """
+    with SpooledTemporaryFile(max_size=COPY_SPOOL_BYTES) as buffer:
+        connection = trace.checkout(engine.raw_connection)
+        try:
+            cursor = connection.cursor()
+            statement, values = statement
+            if values is not None:
+                statement = cursor.mogrify(statement, values).decode()
+            with trace.phase('fetch'):
+                cursor.copy_expert(f"COPY ({statement.strip().rstrip(';')}) TO STDOUT "
+                                   f"WITH (FORMAT CSV, HEADER)", buffer)
+            cursor.close()
+        finally:
+            connection.close()
+        buffer.seek(0)
+        with trace.phase('build'):
+            if arrow_csv is None:
+                return pandas.read_csv(buffer, dtype=dtypes or None)
+            convert_options = arrow_csv.ConvertOptions(
+                column_types={column: _arrow_type(dtype) for column, dtype in dtypes.items()},
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False)
+            return arrow_csv.read_csv(buffer, convert_options=convert_options).to_pandas()
+
+
+def _arrow_column(chunks: List, dtype: Any):
+    """Join the per-batch arrays of one column into a single chunked array."""
+    if dtype is not None:
+        return pyarrow.chunked_array(chunks, type=_arrow_type(dtype))
+    types = [chunk.type for chunk in chunks if chunk.type != pyarrow.null()]
+    if not types:
+        return pyarrow.chunked_array(chunks, type=pyarrow.null())
+    return pyarrow.chunked_array([chunk.cast(types[0]) if chunk.type != types[0] else chunk
+                                  for chunk in chunks], type=types[0])
+
+
+def _append_batch(buffers: Dict[Text, List], columns: List[Text], rows: List,
+                  dtypes: Dict):
+    """Transpose one batch of rows into a typed array per column."""
+    for column, values in zip(columns, zip(*rows)):
+        dtype = dtypes.get(column)
+        if pyarrow is not None:
+            arrow_type = None if dtype is None else _arrow_type(dtype)
+            buffers[column].append(pyarrow.array(values, type=arrow_type, from_pandas=True))
+        else:
+            buffers[column].append(numpy.array(values, dtype=dtype))
+
+
+def _buffers_to_data_frame(buffers: Dict[Text, List], columns: List[Text],
+                           dtypes: Dict) -> pandas.DataFrame:
+    """Join the per-column arrays of every batch into one DataFrame."""
+    if pyarrow is not None and all(buffers.values()):
+        table = pyarrow.Table.from_arrays(
+            [_arrow_column(buffers[column], dtypes.get(column)) for column in columns],
+            names=columns)
+        return table.to_pandas()
+    return pandas.DataFrame({column: numpy.concatenate(buffers[column]) if buffers[column]
+                             else numpy.array([], dtype=dtypes.get(column))
+                             for column in columns}, columns=columns)
+
+
+def _cursor_to_data_frame(engine, statement: Tuple[Text, Any], dtypes: Dict, batch_rows: int,
+                          trace: '_QueryTrace') -> pandas.DataFrame:
+    """Fetch a result into typed column buffers batch by batch.
+
+    The DBAPI cursor is read directly, skipping SQLAlchemy's Row
+    objects, and each batch of rows is transposed once into per-column
+    Arrow arrays (or NumPy arrays without pyarrow), so the full result
+    never exists as a list of row tuples.
+    """
+    connection = trace.checkout(engine.raw_connection)
+    try:
+        if engine.dialect.driver == 'pymysql':
+            cursor = connection.cursor(pymysql_cursors.SSCursor)
+        else:
+            cursor = connection.cursor()
+        statement, values = statement
+        with trace.phase('execute'):
+            if values is None:
+                cursor.execute(statement)
+            else:
+                cursor.execute(statement, values)
+        columns = [description[0] for description in cursor.description]
+        buffers: Dict[Text, List] = {column: [] for column in columns}
+        while True:
+            with trace.phase('fetch'):
+                rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            with trace.phase('build'):
+                _append_batch(buffers, columns, rows, dtypes)
+        cursor.close()
+    finally:
+        connection.close()
+    with trace.phase('build'):
+        return _buffers_to_data_frame(buffers, columns, dtypes)
+
+
+def read_sql_columnar(sql_command: Text, engine, dtypes: Dict = None,
+                      batch_rows: int = COLUMNAR_BATCH_ROWS,
+                      parameters: Dict = None) -> pandas.DataFrame:
+    """Read a query result through typed columnar buffers.
+
+    This function is an opt-in replacement for pandas.read_sql on
+    large results. PostgreSQL engines using psycopg2 fetch through
+    COPY ... TO STDOUT, every other engine fills Arrow arrays (NumPy
+    arrays when pyarrow is not installed) straight from the cursor.
+
+    Notes:
+        The COPY path transports CSV, so columns without a dtype hint
+        are typed by the CSV reader's inference.
+
+    Args:
+        sql_command(Text): The sql query that's ran against the
+            database.
+        engine: The database connection object.
+        dtypes(Dict): Optional. A key, value object mapping column
+            names to NumPy dtypes or pyarrow types.
+        batch_rows(int): The number of rows fetched per batch.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+
+    Returns:
+        A tabular representation of the query result.
+
+    """
+    dtypes = dict(dtypes or {})
+    trace = _QueryTrace()
+    statement = _driver_statement(engine, sql_command, parameters)
+    if engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2':
+        data_frame = _copy_to_data_frame(engine, statement, dtypes, trace)
+    else:
+        data_frame = _cursor_to_data_frame(engine, statement, dtypes, batch_rows, trace)
+    trace.observe(data_frame)
+    QUERY_INSTRUMENTATION.record(engine.dialect.name, sql_command, trace)
+    return data_frame
+
+
+def _read_rows(sql_command: Text, engine, parameters: Optional[Dict],
+               trace: '_QueryTrace') -> pandas.DataFrame:
+    """Read a query result the way pandas.read_sql does, timing every phase."""
+    connection = trace.checkout(engine.connect)
+    try:
+        with trace.phase('execute'):
+            if parameters:
+                result = connection.execute(_statement(sql_command), parameters)
+            elif hasattr(connection, 'exec_driver_sql'):
+                result = connection.exec_driver_sql(sql_command)
+            else:
+                result = connection.execute(sql_command)
+        with trace.phase('fetch'):
+            columns = list(result.keys())
+            rows = result.fetchall()
+    finally:
+        connection.close()
+    with trace.phase('build'):
+        return pandas.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+
+def _read(sql_command: Text, engine, fetch_mode: Text, dtypes: Optional[Dict],
+          parameters: Optional[Dict] = None):
+    """Read a query result with the requested fetch mode."""
+    if fetch_mode not in FETCH_MODES:
+        raise ValueError(f"fetch_mode must be one of {FETCH_MODES}")
+    if fetch_mode == 'columnar':
+        return read_sql_columnar(sql_command, engine, dtypes, parameters=parameters)
+    trace = _QueryTrace()
+    data_frame = _read_rows(sql_command, engine, parameters, trace)
+    if dtypes:
+        with trace.phase('build'):
+            data_frame = data_frame.astype(dtypes)
+    trace.observe(data_frame)
+    QUERY_INSTRUMENTATION.record(engine.dialect.name, sql_command, trace)
+    return data_frame
@@ -0,0 +1,255 @@
+"""
+Description: This module pushes DataFrame filters down into SQL.
+
+Title: lazy.py
+
+Author: theStygianArchitect
+"""
+import sys
+from copy import copy
+from datetime import date
+from datetime import time as dt_time
+from decimal import Decimal
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+try:
+    import numpy
+    import pandas
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+try:
+    from .engine import ENGINE_REGISTRY
+    from .engine import DatabaseInformation
+    from ..pandas_aggregation_techniques import filter_data_where_column_eq_value
+    from ..pandas_aggregation_techniques import filter_data_where_column_isin_array
+    from ..pandas_aggregation_techniques import filter_data_where_column_is_not_in_array
+    from ..pandas_aggregation_techniques import filter_data_where_column_neq_value
+    from .query import _query
+    from .query import _query_options
+    from .statements import normalize_sql
+except ImportError:
+    from app.database.engine import ENGINE_REGISTRY
+    from app.database.engine import DatabaseInformation
+    from app.pandas_aggregation_techniques import filter_data_where_column_eq_value
+    from app.pandas_aggregation_techniques import filter_data_where_column_isin_array
+    from app.pandas_aggregation_techniques import filter_data_where_column_is_not_in_array
+    from app.pandas_aggregation_techniques import filter_data_where_column_neq_value
+    from app.database.query import _query
+    from app.database.query import _query_options
+    from app.database.statements import normalize_sql
+
+LAZY_OPERATORS = ('eq', 'neq', 'isin', 'not_in')
+LAZY_MAX_IN_VALUES = 2000
+_PUSHDOWN_TYPES = (str, int, float, bool, Decimal, date, dt_time, numpy.generic, type(None))
+
+
+def _is_missing(value: Any) -> bool:
+    """Return True for None, NaN, NaT and NA, the values pandas treats as missing."""
+    return value is None or (pandas.api.types.is_scalar(value) and bool(pandas.isna(value)))
+
+
+def _bind_value(value: Any) -> Any:
+    """Convert NumPy scalars into values every driver can bind."""
+    return value.item() if isinstance(value, numpy.generic) else value
+
+
+def _pushable(operator: Text, value: Any) -> bool:
+    """Return True when a filter can be compiled into SQL."""
+    if operator in ('eq', 'neq'):
+        return isinstance(value, _PUSHDOWN_TYPES)
+    if not isinstance(value, (list, tuple, set, frozenset, numpy.ndarray, pandas.Series)):
+        return False
+    return (len(value) <= LAZY_MAX_IN_VALUES
+            and all(isinstance(item, _PUSHDOWN_TYPES) for item in value))
+
+
+def _equality_sql(column: Text, name: Text, operator: Text, value: Any,
+                  parameters: Dict) -> Optional[Text]:
+    """Compile an eq or neq predicate, binding value as :name."""
+    if _is_missing(value):
+        return '1 = 0' if operator == 'eq' else None
+    parameters[name] = _bind_value(value)
+    if operator == 'eq':
+        return f"{column} = :{name}"
+    return f"({column} <> :{name} OR {column} IS NULL)"
+
+
+def _membership_sql(column: Text, name: Text, operator: Text, value: Any,
+                    parameters: Dict) -> Optional[Text]:
+    """Compile an isin or not_in predicate, binding the values as :name_position."""
+    values = [item for item in value if not _is_missing(item)]
+    has_missing = len(values) != len(value)
+    placeholders = ', '.join(f":{name}_{position}" for position in range(len(values)))
+    parameters.update({f"{name}_{position}": _bind_value(item)
+                       for position, item in enumerate(values)})
+    if operator == 'isin':
+        parts = [f"{column} IN ({placeholders})"] if values else []
+        if has_missing:
+            parts.append(f"{column} IS NULL")
+        return f"({' OR '.join(parts)})" if parts else '1 = 0'
+    if not values:
+        return f"{column} IS NOT NULL" if has_missing else None
+    if has_missing:
+        return f"({column} NOT IN ({placeholders}) AND {column} IS NOT NULL)"
+    return f"({column} NOT IN ({placeholders}) OR {column} IS NULL)"
+
+
+def _predicate_sql(quote, index: int, predicate: Tuple[Text, Text, Any],
+                   parameters: Dict) -> Optional[Text]:
+    """Compile one recorded predicate, adding its bound values to parameters."""
+    column_name, operator, value = predicate
+    if operator in ('eq', 'neq'):
+        return _equality_sql(quote(column_name), f"lazy_{index}", operator, value, parameters)
+    return _membership_sql(quote(column_name), f"lazy_{index}", operator, value, parameters)
+
+
+class _Operations(NamedTuple):
+    """The operations recorded on a LazyQuery."""
+
+    predicates: Tuple[Tuple[Text, Text, Any], ...] = ()
+    columns: Optional[Tuple[Text, ...]] = None
+    local: Tuple[Callable, ...] = ()
+
+
+class LazyQuery:
+    """Query whose filters and projection are pushed down into SQL.
+
+    The filter helpers of pandas_aggregation_techniques accept a
+    LazyQuery in place of a DataFrame and record their operation on it
+    instead of filtering. collect() compiles the recorded equality,
+    membership and projection operations into WHERE / IN / column-list
+    SQL around sql_command, so only the needed rows and columns leave
+    the database. Operations that cannot be compiled, and every
+    operation recorded after them, run locally on the fetched
+    DataFrame with the same semantics as the pandas helpers. Every
+    method returns a new LazyQuery.
+    """
+
+    def __init__(self, dialect: Text, database_information: DatabaseInformation,
+                 sql_command: Text, **options: Any):
+        """Initialize a lazy query without any recorded operation.
+
+        options are the query options of query_mssql_server, e.g.
+        windows_authentication, parameters, fetch_mode or cache_ttl.
+
+        Raises:
+            TypeError - When an option is not in QUERY_OPTIONS.
+
+        """
+        self.dialect = dialect
+        self.database_information = database_information
+        self.sql_command = sql_command
+        self.options = _query_options(options)
+        self.operations = _Operations()
+
+    def _record(self, **changes: Any) -> 'LazyQuery':
+        """Return a copy whose recorded operations include changes."""
+        lazy = copy(self)
+        lazy.operations = self.operations._replace(**changes)
+        return lazy
+
+    def push_filter(self, operator: Text, column_name: Text, value: Any) -> 'LazyQuery':
+        """Record a filter on column_name.
+
+        Args:
+            operator(Text): One of eq, neq, isin or not_in.
+            column_name(Text): The column that is being inspected.
+            value(Any): The value, or values for isin and not_in.
+
+        Raises:
+            ValueError - When the operator is not supported.
+            KeyError - When column_name was projected away.
+
+        Returns:
+            A new LazyQuery including the filter.
+
+        """
+        if operator not in LAZY_OPERATORS:
+            raise ValueError(f"operator must be one of {LAZY_OPERATORS}")
+        operations = self.operations
+        if (not operations.local and operations.columns is not None
+                and column_name not in operations.columns):
+            raise KeyError(column_name)
+        if operations.local or not _pushable(operator, value):
+            function = _LOCAL_FILTERS[operator]
+            return self._record(local=operations.local + (
+                lambda data_frame: function(data_frame, column_name, value),))
+        return self._record(predicates=operations.predicates + ((column_name, operator, value),))
+
+    def push_projection(self, columns: List[Text]) -> 'LazyQuery':
+        """Record a projection to columns.
+
+        Raises:
+            KeyError - When a column was projected away before.
+
+        Returns:
+            A new LazyQuery including the projection.
+
+        """
+        columns = list(columns)
+        operations = self.operations
+        if operations.local:
+            return self._record(local=operations.local + (
+                lambda data_frame: data_frame[columns],))
+        missing = [column for column in columns
+                   if operations.columns is not None and column not in operations.columns]
+        if missing:
+            raise KeyError(missing)
+        return self._record(columns=tuple(columns))
+
+    def apply(self, function) -> 'LazyQuery':
+        """Record a local operation taking and returning a DataFrame.
+
+        Every operation recorded after it also runs locally.
+        """
+        return self._record(local=self.operations.local + (function,))
+
+    def compile(self) -> Tuple[Text, Dict]:
+        """Return the pushed down SQL and its bound parameters."""
+        engine = ENGINE_REGISTRY.get_engine(self.dialect, self.database_information,
+                                            self.options['windows_authentication'],
+                                            self.options['connection_arguments'])
+        quote = engine.dialect.identifier_preparer.quote
+        parameters = dict(self.options['parameters'] or {})
+        conditions = [_predicate_sql(quote, index, predicate, parameters)
+                      for index, predicate in enumerate(self.operations.predicates)]
+        conditions = [condition for condition in conditions if condition]
+        columns = self.operations.columns
+        select_list = '*' if columns is None else ', '.join(quote(column) for column in columns)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        if select_list == '*' and not where:
+            return self.sql_command, parameters
+        return (f"SELECT {select_list} FROM ({normalize_sql(self.sql_command)}) lazy_query"
+                f"{where}", parameters)
+
+    def collect(self) -> pandas.DataFrame:
+        """Run the pushed down query and the local operations.
+
+        Returns:
+            A tabular representation of the filtered query result.
+
+        """
+        sql_command, parameters = self.compile()
+        options = dict(self.options, parameters=parameters or None)
+        data_frame = _query(self.dialect, self.database_information, sql_command, **options)
+        for function in self.operations.local:
+            data_frame = function(data_frame)
+        return data_frame
+
+
+_LOCAL_FILTERS = {
+    'eq': filter_data_where_column_eq_value,
+    'neq': filter_data_where_column_neq_value,
+    'isin': filter_data_where_column_isin_array,
+    'not_in': filter_data_where_column_is_not_in_array,
+}
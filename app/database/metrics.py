@@ -0,0 +1,172 @@
+"""
+Description: This module records database query timings.
+
+Title: metrics.py
+
+Author: theStygianArchitect
+"""
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict
+from typing import Text
+from typing import Tuple
+
+try:
+    import pandas
+    from sqlalchemy import event
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+try:
+    from ..logger import set_up_stream_logging
+    from .statements import sql_fingerprint
+except ImportError:
+    from app.logger import set_up_stream_logging
+    from app.database.statements import sql_fingerprint
+
+log = set_up_stream_logging()  # pylint: disable=C0103
+
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_SECONDS', '1.0'))
+HISTOGRAM_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_CONNECT_TIMING = threading.local()
+
+
+class LatencyHistogram:
+    """Thread-safe cumulative latency histogram per label."""
+
+    def __init__(self, bounds: Tuple = HISTOGRAM_BOUNDS):
+        """Initialize an empty histogram with upper bucket bounds in seconds."""
+        self.bounds = tuple(bounds)
+        self._series: Dict[Text, Dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label: Text, seconds: float):
+        """Count one observation of label."""
+        index = bisect_left(self.bounds, seconds)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = {'counts': [0] * (len(self.bounds) + 1),
+                                                'count': 0, 'sum': 0.0}
+            series['counts'][index] += 1
+            series['count'] += 1
+            series['sum'] += seconds
+
+    def snapshot(self) -> Dict:
+        """Return the cumulative bucket counts, count and sum of every label."""
+        with self._lock:
+            snapshot = {}
+            for label, series in self._series.items():
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.bounds + (float('inf'),), series['counts']):
+                    cumulative += count
+                    buckets[f"{bound}"] = cumulative
+                snapshot[label] = {'buckets': buckets, 'count': series['count'],
+                                   'sum': series['sum']}
+            return snapshot
+
+    def reset(self):
+        """Drop every observation."""
+        with self._lock:
+            self._series.clear()
+
+
+class _QueryTrace:
+    """Accumulate the phase timings, rows and bytes of one query."""
+
+    __slots__ = ('phases', 'rows', 'bytes')
+
+    def __init__(self):
+        """Initialize an empty trace."""
+        self.phases: Dict[Text, float] = {}
+        self.rows = 0
+        self.bytes = 0
+
+    @contextmanager
+    def phase(self, name: Text):
+        """Add the time spent inside the block to phase name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def checkout(self, connect):
+        """Check a connection out of the pool, splitting pool wait from connect time."""
+        _CONNECT_TIMING.seconds = 0.0
+        start = time.perf_counter()
+        connection = connect()
+        elapsed = time.perf_counter() - start
+        connect_seconds = min(elapsed, getattr(_CONNECT_TIMING, 'seconds', 0.0))
+        self.phases['connect'] = self.phases.get('connect', 0.0) + connect_seconds
+        self.phases['pool_wait'] = self.phases.get('pool_wait', 0.0) + elapsed - connect_seconds
+        return connection
+
+    def observe(self, data_frame: pandas.DataFrame):
+        """Count the rows and shallow in-memory bytes of a fetched frame."""
+        self.rows += len(data_frame)
+        self.bytes += int(data_frame.memory_usage(index=False).sum())
+
+
+class QueryInstrumentation:  # pylint: disable=R0903
+    """Record database query timings as structured log events and a histogram.
+
+    Every query is logged at debug level through app.logger. Queries
+    slower than slow_query_seconds are logged at warning level with
+    their statement fingerprint.
+    """
+
+    def __init__(self, slow_query_seconds: float = SLOW_QUERY_SECONDS):
+        """Initialize instrumentation with an empty histogram."""
+        self.slow_query_seconds = slow_query_seconds
+        self.histogram = LatencyHistogram()
+
+    def record(self, dialect: Text, sql_command: Text, trace: _QueryTrace):
+        """Record one finished query."""
+        total = sum(trace.phases.values())
+        self.histogram.observe(f"{dialect}.total", total)
+        for phase, seconds in trace.phases.items():
+            self.histogram.observe(f"{dialect}.{phase}", seconds)
+        slow = total >= self.slow_query_seconds
+        if not slow and not log.isEnabledFor(logging.DEBUG):
+            return
+        event_fields = {'event': 'database_query', 'dialect': dialect, 'rows': trace.rows,
+                        'bytes': trace.bytes, 'seconds': total}
+        event_fields.update({f"{phase}_seconds": seconds
+                             for phase, seconds in trace.phases.items()})
+        if slow:
+            fingerprint = sql_fingerprint(sql_command)
+            event_fields['fingerprint'] = fingerprint
+            event_fields['fingerprint_id'] = hashlib.blake2b(fingerprint.encode(),
+                                                             digest_size=8).hexdigest()
+            log.warning('slow database query', extra=event_fields)
+        else:
+            log.debug('database query', extra=event_fields)
+
+
+QUERY_INSTRUMENTATION = QueryInstrumentation()
+
+
+def _instrument_engine(engine):
+    """Time new DBAPI connections so pool wait can be told apart from connecting."""
+    def before_connect(*_):
+        _CONNECT_TIMING.started = time.perf_counter()
+
+    def after_connect(*_):
+        started = getattr(_CONNECT_TIMING, 'started', None)
+        if started is not None:
+            _CONNECT_TIMING.seconds = (getattr(_CONNECT_TIMING, 'seconds', 0.0)
+                                       + time.perf_counter() - started)
+            _CONNECT_TIMING.started = None
+
+    event.listen(engine, 'do_connect', before_connect)
+    event.listen(engine, 'connect', after_connect)
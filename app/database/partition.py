@@ -0,0 +1,225 @@
+"""
+Description: This module runs range partitioned queries in parallel.
+
+Title: partition.py
+
+Author: theStygianArchitect
+"""
+import sys
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+try:
+    import pandas
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+try:
+    from .engine import DatabaseInformation
+    from .query import QUERY_OPTIONS
+    from .query import _query
+    from .statements import normalize_sql
+except ImportError:
+    from app.database.engine import DatabaseInformation
+    from app.database.query import QUERY_OPTIONS
+    from app.database.query import _query
+    from app.database.statements import normalize_sql
+
+
+def partition_ranges(lower_bound: Any, upper_bound: Any, partitions: int) -> List[Tuple]:
+    """Split [lower_bound, upper_bound] into contiguous ranges.
+
+    Integers are split on integer boundaries, any other type
+    supporting subtraction and division (floats, datetimes) is split
+    evenly. Every range is half-open except the last one, which
+    includes upper_bound.
+
+    Args:
+        lower_bound(Any): The smallest partition column value.
+        upper_bound(Any): The largest partition column value.
+        partitions(int): The number of ranges.
+
+    Raises:
+        ValueError - When partitions is not positive or the bounds are
+            reversed.
+
+    Returns:
+        A list of (lower, upper) tuples.
+
+    """
+    if partitions < 1:
+        raise ValueError('partitions must be positive')
+    if upper_bound < lower_bound:
+        raise ValueError('upper_bound must not be smaller than lower_bound')
+    span = upper_bound - lower_bound
+    if isinstance(lower_bound, int) and isinstance(upper_bound, int):
+        partitions = max(1, min(partitions, span))
+        edges = [lower_bound + span * index // partitions for index in range(partitions + 1)]
+    else:
+        edges = [lower_bound + span * index / partitions for index in range(partitions + 1)]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+PARTITION_OPTIONS = {
+    'lower_bound': None,
+    'upper_bound': None,
+    'partitions': 4,
+    'ranges': None,
+}
+
+
+def _partition_sql(sql_command: Text, partition_column: Text, bounds: Tuple[Any, Any, bool],
+                   parameters: Optional[Dict]) -> Tuple[Text, Dict]:
+    """Wrap sql_command with the bound range predicate of one partition.
+
+    bounds is (lower, upper, include_upper).
+    """
+    lower, upper, include_upper = bounds
+    conditions = []
+    parameters = dict(parameters or {})
+    if lower is not None:
+        conditions.append(f"{partition_column} >= :partition_lower")
+        parameters['partition_lower'] = lower
+    if upper is not None:
+        operator = '<=' if include_upper else '<'
+        conditions.append(f"{partition_column} {operator} :partition_upper")
+        parameters['partition_upper'] = upper
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    return f"SELECT * FROM ({normalize_sql(sql_command)}) partitioned{where}", parameters
+
+
+def _partition_bounds(options: Dict) -> List[Tuple[Any, Any, bool]]:
+    """Return the (lower, upper, include_upper) bounds of every partition."""
+    options = {**PARTITION_OPTIONS, **options}
+    if options['ranges'] is not None:
+        return [(lower, upper, False) for lower, upper in options['ranges']]
+    if options['lower_bound'] is None or options['upper_bound'] is None:
+        raise ValueError('either ranges or lower_bound and upper_bound must be present')
+    ranges = partition_ranges(options['lower_bound'], options['upper_bound'],
+                              options['partitions'])
+    return [(lower, upper, position == len(ranges) - 1)
+            for position, (lower, upper) in enumerate(ranges)]
+
+
+def _partition_futures(executor, dialect: Text, database_information: DatabaseInformation,
+                       sql_command: Text, partition_column: Text,
+                       **options: Any) -> List[Future]:
+    """Submit one range query per partition and return the futures in range order.
+
+    options are the keys of PARTITION_OPTIONS and QUERY_OPTIONS.
+    """
+    unknown = sorted(set(options) - set(PARTITION_OPTIONS) - set(QUERY_OPTIONS))
+    if unknown:
+        raise TypeError(f"unexpected partition options: {', '.join(unknown)}")
+    query_options = {name: value for name, value in options.items()
+                     if name not in PARTITION_OPTIONS}
+    parameters = query_options.pop('parameters', None)
+    futures = []
+    for bounds in _partition_bounds(options):
+        partition_command, partition_parameters = _partition_sql(
+            sql_command, partition_column, bounds, parameters)
+        futures.append(executor.submit(_query, dialect, database_information,
+                                       partition_command, parameters=partition_parameters,
+                                       **query_options))
+    return futures
+
+
+def _partition_executor(pool: Text, max_workers: int):
+    """Create the worker pool for partitioned reads."""
+    if pool == 'process':
+        return ProcessPoolExecutor(max_workers=max_workers)
+    if pool == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='partitioned_read')
+    raise ValueError("pool must be 'thread' or 'process'")
+
+
+def query_partitioned(dialect: Text, database_information: DatabaseInformation,
+                      sql_command: Text, partition_column: Text,
+                      **options: Any) -> pandas.DataFrame:
+    """Query a database in parallel range partitions.
+
+    This function wraps sql_command once per range of partition_column
+    and runs the range queries concurrently on a thread or process
+    pool. Threads share the pooled engine of the registry, processes
+    build their own. The partial results are concatenated in range
+    order.
+
+    Notes:
+        Rows whose partition_column is NULL are not returned. MSSQL
+        does not allow ORDER BY inside the wrapped sql_command.
+
+    Args:
+        dialect(Text): One of mssql, postgresql or mysql.
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        partition_column(Text): The column the ranges apply to.
+        options(Any): Optional. The partition options below, the other
+            keys are QUERY_OPTIONS, e.g. connection_arguments or
+            fetch_mode.
+
+    Keyword Args:
+        lower_bound(Any): Optional. The smallest partition_column value.
+        upper_bound(Any): Optional. The largest partition_column value.
+        partitions(int): Optional. The number of ranges built from the
+            bounds.
+        ranges(List): Optional. Explicit (lower, upper) half-open
+            ranges, used instead of the bounds. None leaves a side
+            open.
+        pool(Text): Optional. thread (default) or process.
+        max_workers(int): Optional. The number of concurrent queries.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command. The range bounds are bound as
+            :partition_lower and :partition_upper.
+
+    Raises:
+        ValueError - When neither ranges nor both bounds are present.
+        TypeError - When an option is not a partition or query
+            option.
+
+    Returns:
+        A tabular representation of the query result.
+
+    """
+    pool = options.pop('pool', 'thread')
+    with _partition_executor(pool, options.pop('max_workers', None)) as executor:
+        futures = _partition_futures(executor, dialect, database_information, sql_command,
+                                     partition_column, **options)
+        return pandas.concat([future.result() for future in futures], ignore_index=True)
+
+
+def stream_partitioned(dialect: Text, database_information: DatabaseInformation,
+                       sql_command: Text, partition_column: Text,
+                       **options: Any) -> Iterator[pandas.DataFrame]:
+    """Yield the partitions of query_partitioned as they finish.
+
+    Args:
+        See query_partitioned.
+
+    Yields:
+        A tabular representation of one partition, in completion
+        order.
+
+    """
+    pool = options.pop('pool', 'thread')
+    with _partition_executor(pool, options.pop('max_workers', None)) as executor:
+        futures = _partition_futures(executor, dialect, database_information, sql_command,
+                                     partition_column, **options)
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
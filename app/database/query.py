@@ -0,0 +1,471 @@
+"""
+Description: This module queries databases through the pooled engines.
+
+Title: query.py
+
+Author: theStygianArchitect
+"""
+import re
+import sys
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import Text
+
+try:
+    import pandas
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+try:
+    from .cache import QUERY_CACHE
+    from .cache import _callable_token
+    from .cache import query_cache_key
+    from .engine import ENGINE_REGISTRY
+    from .engine import DatabaseInformation
+    from .fetch import _read
+    from .metrics import QUERY_INSTRUMENTATION
+    from .metrics import _QueryTrace
+    from .statements import _statement
+except ImportError:
+    from app.database.cache import QUERY_CACHE
+    from app.database.cache import _callable_token
+    from app.database.cache import query_cache_key
+    from app.database.engine import ENGINE_REGISTRY
+    from app.database.engine import DatabaseInformation
+    from app.database.fetch import _read
+    from app.database.metrics import QUERY_INSTRUMENTATION
+    from app.database.metrics import _QueryTrace
+    from app.database.statements import _statement
+
+
+QUERY_OPTIONS = {
+    'windows_authentication': False,
+    'connection_arguments': None,
+    'fetch_mode': 'read_sql',
+    'dtypes': None,
+    'cache_ttl': None,
+    'parameters': None,
+    'post_process': None,
+}
+
+
+def _query_options(options: Dict) -> Dict:
+    """Return options with the defaults of QUERY_OPTIONS for missing keys.
+
+    Raises:
+        TypeError - When an option is not in QUERY_OPTIONS.
+
+    """
+    unknown = sorted(set(options) - set(QUERY_OPTIONS))
+    if unknown:
+        raise TypeError(f"unexpected query options: {', '.join(unknown)}")
+    return {**QUERY_OPTIONS, **options}
+
+
+def _query(dialect: Text, database_information: DatabaseInformation, sql_command: Text,
+           **options: Any) -> pandas.DataFrame:
+    """Run a query through the engine registry and, optionally, the result cache.
+
+    options are the keys of QUERY_OPTIONS, see _query_options.
+    post_process runs before the result is cached.
+    """
+    options = _query_options(options)
+    post_process = options.pop('post_process')
+
+    def load():
+        engine = ENGINE_REGISTRY.get_engine(dialect, database_information,
+                                            options['windows_authentication'],
+                                            options['connection_arguments'])
+        data_frame = _read(sql_command, engine, options['fetch_mode'], options['dtypes'],
+                           options['parameters'])
+        return data_frame if post_process is None else post_process(data_frame)
+
+    if not options['cache_ttl']:
+        return load()
+    key = query_cache_key(dialect, database_information, sql_command, options['parameters'],
+                          windows_authentication=options['windows_authentication'],
+                          connection_arguments=options['connection_arguments'],
+                          fetch_mode=options['fetch_mode'], dtypes=options['dtypes'],
+                          post_process=_callable_token(post_process))
+    return QUERY_CACHE.get_or_load(key, load, options['cache_ttl'])
+
+
+def query_mssql_server(database_information: DatabaseInformation, sql_command: Text,
+                       windows_authentication: bool = False,
+                       connection_arguments: Dict = None, **options: Any) -> pandas.DataFrame:
+    """Query MSSQL database.
+
+    This function will reuse a pooled MSSQL database connection. This
+    function will support both windows and sql authentication specified
+    by the windows_authentication variable.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        windows_authentication(bool): Deciding variable to determine
+            the type of authentication to use.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        options(Any): Optional. The query options below.
+
+    Keyword Args:
+        fetch_mode(Text): Optional. read_sql (default) or columnar,
+            see read_sql_columnar.
+        dtypes(Dict): Optional. A key, value object mapping column
+            names to the dtypes of the result.
+        cache_ttl(float): Optional. Seconds the result is served from
+            QUERY_CACHE. The cache is bypassed when not set.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+        post_process(Callable): Optional. Applied to the result before
+            it is cached and returned, e.g.
+            pandas_compaction.compact_frame. Only the same
+            callable object hits its cached results.
+
+    Raises:
+        TypeError - When an option is not in QUERY_OPTIONS.
+
+    Returns:
+        The database connection object.
+
+    """
+    data_frame = _query('mssql', database_information, sql_command,
+                        windows_authentication=windows_authentication,
+                        connection_arguments=connection_arguments, **options)
+    return data_frame
+
+
+def query_postgresql_server(database_information: DatabaseInformation, sql_command: Text,
+                            connection_arguments: Dict = None, **options: Any) -> pandas.DataFrame:
+    """Query PostgreSQL database.
+
+    This function will reuse a pooled PostgreSQL database connection.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        options(Any): Optional. The query options below.
+
+    Keyword Args:
+        fetch_mode(Text): Optional. read_sql (default) or columnar,
+            see read_sql_columnar.
+        dtypes(Dict): Optional. A key, value object mapping column
+            names to the dtypes of the result.
+        cache_ttl(float): Optional. Seconds the result is served from
+            QUERY_CACHE. The cache is bypassed when not set.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+        post_process(Callable): Optional. Applied to the result before
+            it is cached and returned, e.g.
+            pandas_compaction.compact_frame. Only the same
+            callable object hits its cached results.
+
+    Raises:
+        TypeError - When an option is not in QUERY_OPTIONS.
+
+    Returns:
+        The database connection object.
+
+    """
+    data_frame = _query('postgresql', database_information, sql_command,
+                        windows_authentication=False,
+                        connection_arguments=connection_arguments, **options)
+    return data_frame
+
+
+def query_mysql_server(database_information: DatabaseInformation, sql_command: Text,
+                       connection_arguments: Dict = None, **options: Any) -> pandas.DataFrame:
+    """Query MySQL database.
+
+    This function will reuse a pooled MySQL database connection.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        options(Any): Optional. The query options below.
+
+    Keyword Args:
+        fetch_mode(Text): Optional. read_sql (default) or columnar,
+            see read_sql_columnar.
+        dtypes(Dict): Optional. A key, value object mapping column
+            names to the dtypes of the result.
+        cache_ttl(float): Optional. Seconds the result is served from
+            QUERY_CACHE. The cache is bypassed when not set.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+        post_process(Callable): Optional. Applied to the result before
+            it is cached and returned, e.g.
+            pandas_compaction.compact_frame. Only the same
+            callable object hits its cached results.
+
+    Raises:
+        TypeError - When an option is not in QUERY_OPTIONS.
+
+    Returns:
+        The database connection object.
+
+    """
+    data_frame = _query('mysql', database_information, sql_command,
+                        windows_authentication=False,
+                        connection_arguments=connection_arguments, **options)
+    return data_frame
+
+
+def query_metrics() -> Dict:
+    """Return the query histogram with engine registry and cache statistics."""
+    return {
+        'queries': QUERY_INSTRUMENTATION.histogram.snapshot(),
+        'engines': ENGINE_REGISTRY.statistics(),
+        'cache': QUERY_CACHE.statistics(),
+    }
+
+
+DEFAULT_CHUNK_ROWS = 50000
+
+
+def _stream_query(engine, sql_command: Text, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                  chunk_bytes: int = None,
+                  parameters: Dict = None) -> Iterator[pandas.DataFrame]:
+    """Yield the result of sql_command as bounded DataFrame chunks.
+
+    The statement is executed with a server-side cursor
+    (stream_results) so the driver does not buffer the whole result.
+    When chunk_bytes is given the row count of each chunk is resized
+    from the measured size of the previous chunk so every chunk stays
+    close to the byte budget.
+
+    Args:
+        engine: The database connection object.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        chunk_rows(int): The maximum number of rows per chunk.
+        chunk_bytes(int): Optional. The approximate in-memory size of
+            each chunk in bytes.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+
+    Raises:
+        ValueError - When chunk_rows or chunk_bytes is not positive.
+
+    Yields:
+        A tabular representation of one chunk of the result set.
+
+    """
+    if chunk_rows < 1 or (chunk_bytes is not None and chunk_bytes < 1):
+        raise ValueError('chunk_rows and chunk_bytes must be positive')
+    fetch_size = chunk_rows if chunk_bytes is None else min(chunk_rows, 1000)
+    trace = _QueryTrace()
+    connection = trace.checkout(engine.connect)
+    try:
+        with trace.phase('execute'):
+            result = connection.execution_options(stream_results=True).execute(
+                _statement(sql_command), parameters or {})
+        columns = list(result.keys())
+        while True:
+            with trace.phase('fetch'):
+                rows = result.fetchmany(fetch_size)
+            if not rows:
+                break
+            with trace.phase('build'):
+                data_frame = pandas.DataFrame.from_records(rows, columns=columns)
+            trace.observe(data_frame)
+            if chunk_bytes is not None:
+                row_bytes = max(1, int(data_frame.memory_usage(deep=True).sum()) // len(rows))
+                fetch_size = max(1, min(chunk_rows, chunk_bytes // row_bytes))
+            yield data_frame
+    finally:
+        connection.close()
+        QUERY_INSTRUMENTATION.record(engine.dialect.name, sql_command, trace)
+
+
+def stream_mssql_server(database_information: DatabaseInformation, sql_command: Text,
+                        windows_authentication: bool = False,
+                        connection_arguments: Dict = None,
+                        **options: Any) -> Iterator[pandas.DataFrame]:
+    """Stream a MSSQL query as DataFrame chunks.
+
+    This function is the streaming variant of query_mssql_server. Only
+    one chunk is held in memory at a time.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        windows_authentication(bool): Deciding variable to determine
+            the type of authentication to use.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        options(Any): Optional. The stream options below.
+
+    Keyword Args:
+        chunk_rows(int): Optional. The maximum number of rows per
+            chunk.
+        chunk_bytes(int): Optional. The approximate in-memory size of
+            each chunk in bytes.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+
+    Yields:
+        A tabular representation of one chunk of the result set.
+
+    """
+    engine = ENGINE_REGISTRY.get_engine('mssql', database_information, windows_authentication,
+                                        connection_arguments)
+    yield from _stream_query(engine, sql_command, **options)
+
+
+def stream_postgresql_server(database_information: DatabaseInformation, sql_command: Text,
+                             connection_arguments: Dict = None,
+                             **options: Any) -> Iterator[pandas.DataFrame]:
+    """Stream a PostgreSQL query as DataFrame chunks.
+
+    This function is the streaming variant of query_postgresql_server.
+    Only one chunk is held in memory at a time.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        options(Any): Optional. The stream options below.
+
+    Keyword Args:
+        chunk_rows(int): Optional. The maximum number of rows per
+            chunk.
+        chunk_bytes(int): Optional. The approximate in-memory size of
+            each chunk in bytes.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+
+    Yields:
+        A tabular representation of one chunk of the result set.
+
+    """
+    engine = ENGINE_REGISTRY.get_engine('postgresql', database_information,
+                                        connection_arguments=connection_arguments)
+    yield from _stream_query(engine, sql_command, **options)
+
+
+def stream_mysql_server(database_information: DatabaseInformation, sql_command: Text,
+                        connection_arguments: Dict = None,
+                        **options: Any) -> Iterator[pandas.DataFrame]:
+    """Stream a MySQL query as DataFrame chunks.
+
+    This function is the streaming variant of query_mysql_server. Only
+    one chunk is held in memory at a time.
+
+    Args:
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database.
+        connection_arguments(Dict): A key, value object containing
+            arguments passed to the engine.
+        options(Any): Optional. The stream options below.
+
+    Keyword Args:
+        chunk_rows(int): Optional. The maximum number of rows per
+            chunk.
+        chunk_bytes(int): Optional. The approximate in-memory size of
+            each chunk in bytes.
+        parameters(Dict): Optional. Values bound to the :name
+            placeholders of sql_command.
+
+    Yields:
+        A tabular representation of one chunk of the result set.
+
+    """
+    engine = ENGINE_REGISTRY.get_engine('mysql', database_information,
+                                        connection_arguments=connection_arguments)
+    yield from _stream_query(engine, sql_command, **options)
+
+
+IN_LIST_BATCH_SIZE = 1000
+
+
+def _expand_in_list(sql_command: Text, parameter_name: Text, batch_size: int) -> Text:
+    """Replace :parameter_name with a list of batch_size numbered placeholders."""
+    placeholders = ', '.join(f":{parameter_name}_{index}" for index in range(batch_size))
+    pattern = re.compile(rf"(?<![:\w]):{re.escape(parameter_name)}\b")
+    if not pattern.search(sql_command):
+        raise ValueError(f"sql_command has no :{parameter_name} placeholder")
+    return pattern.sub(f"({placeholders})", sql_command)
+
+
+def query_in_batches(dialect: Text, database_information: DatabaseInformation,
+                     sql_command: Text, parameter_name: Text, values: Iterable[Any],
+                     **options: Any) -> pandas.DataFrame:
+    """Look up many values through chunked, bound IN lists.
+
+    sql_command references the list as IN :parameter_name. The values
+    are bound batch_size at a time and the final batch is padded with
+    its last value, so every batch runs the same statement text and
+    the server can reuse one plan. Keep batch_size below 2100 for
+    MSSQL.
+
+    Args:
+        dialect(Text): One of mssql, postgresql or mysql.
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        sql_command(Text): The sql query that's ran against the
+            database, e.g. SELECT * FROM users WHERE id IN :ids.
+        parameter_name(Text): The name of the IN list placeholder.
+        values(Iterable): The values looked up.
+        options(Any): Optional. batch_size and parameters below, the
+            other keys are QUERY_OPTIONS, e.g. connection_arguments
+            or fetch_mode.
+
+    Keyword Args:
+        batch_size(int): Optional. The number of values bound per
+            query.
+        parameters(Dict): Optional. Other values bound to the :name
+            placeholders of sql_command.
+        windows_authentication(bool): Optional. Deciding variable to
+            determine the type of authentication to use. Only used by
+            mssql.
+
+    Raises:
+        ValueError - When batch_size is not positive or the
+            placeholder is missing.
+        TypeError - When an option is not in QUERY_OPTIONS.
+
+    Returns:
+        A tabular representation of the combined query results.
+
+    """
+    batch_size = options.pop('batch_size', IN_LIST_BATCH_SIZE)
+    parameters = options.pop('parameters', None)
+    if batch_size < 1:
+        raise ValueError('batch_size must be positive')
+    values = list(dict.fromkeys(values))
+    if not values:
+        return pandas.DataFrame()
+    batch_size = min(batch_size, len(values))
+    batch_command = _expand_in_list(sql_command, parameter_name, batch_size)
+    data_frames = []
+    for offset in range(0, len(values), batch_size):
+        batch = values[offset:offset + batch_size]
+        batch += [batch[-1]] * (batch_size - len(batch))
+        batch_parameters = dict(parameters or {})
+        batch_parameters.update({f"{parameter_name}_{index}": value
+                                 for index, value in enumerate(batch)})
+        data_frames.append(_query(dialect, database_information, batch_command,
+                                  parameters=batch_parameters, **options))
+    return pandas.concat(data_frames, ignore_index=True)
@@ -0,0 +1,70 @@
+"""
+Description: This module normalizes, fingerprints and caches SQL statements.
+
+Title: statements.py
+
+Author: theStygianArchitect
+"""
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import Dict
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+try:
+    from sqlalchemy import text
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+
+STATEMENT_CACHE_SIZE = int(os.getenv('STATEMENT_CACHE_SIZE', '512'))
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![:\w]):\w+|\b\d+(?:\.\d+)?\b")
+_SQL_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def normalize_sql(sql_command: Text) -> Text:
+    """Collapse whitespace outside of quoted literals and drop a trailing semicolon."""
+    normalized = _SQL_TOKENS.sub(lambda match: match.group(1) or ' ', sql_command)
+    return normalized.strip().rstrip(';').strip()
+
+
+def sql_fingerprint(sql_command: Text) -> Text:
+    """Return sql_command with literals and placeholders replaced by ?.
+
+    Statements differing only in their values share a fingerprint, so
+    slow-query logs can be grouped by statement shape.
+    """
+    fingerprint = _SQL_LITERALS.sub('?', normalize_sql(sql_command))
+    return _SQL_LISTS.sub('(?+)', fingerprint)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _statement(sql_command: Text):
+    """Return the cached text() construct of sql_command."""
+    return text(sql_command)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _compiled_statement(dialect, sql_command: Text):
+    """Return sql_command compiled for a dialect's paramstyle, cached per dialect."""
+    return _statement(sql_command).compile(dialect=dialect)
+
+
+def _driver_statement(engine, sql_command: Text, parameters: Optional[Dict]) -> Tuple:
+    """Return the DBAPI statement and parameters for a raw cursor.
+
+    Without parameters sql_command is passed to the driver untouched.
+    """
+    if not parameters:
+        return sql_command, None
+    compiled = _compiled_statement(engine.dialect, sql_command)
+    values = compiled.construct_params(parameters)
+    if compiled.positional:
+        return f"{compiled}", [values[name] for name in compiled.positiontup]
+    return f"{compiled}", values
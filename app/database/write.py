@@ -0,0 +1,314 @@
+"""
+Description: This module bulk writes DataFrames into database tables.
+
+Title: write.py
+
+Author: theStygianArchitect
+"""
+import sys
+import time
+from tempfile import SpooledTemporaryFile
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+try:
+    import numpy
+    import pandas
+    from pydantic import BaseModel  # pylint: disable=E0611
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages.')
+    sys.exit()
+
+try:
+    from .engine import ENGINE_REGISTRY
+    from .engine import DatabaseInformation
+    from .fetch import COPY_SPOOL_BYTES
+except ImportError:
+    from app.database.engine import ENGINE_REGISTRY
+    from app.database.engine import DatabaseInformation
+    from app.database.fetch import COPY_SPOOL_BYTES
+
+
+class WriteReport(BaseModel):  # pylint: disable=R0903
+    """Develop bulk write report model."""
+
+    table_name: Text
+    rows: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+
+
+DEFAULT_WRITE_BATCH_ROWS = 10000
+
+
+def _qualified_name(engine, table_name: Text, schema: Optional[Text]) -> Text:
+    """Quote a table name, and its schema, for the engine's dialect."""
+    preparer = engine.dialect.identifier_preparer
+    if schema:
+        return f"{preparer.quote_schema(schema)}.{preparer.quote(table_name)}"
+    return preparer.quote(table_name)
+
+
+_INT64_LIMIT = 2 ** 63
+
+
+def _restore_integers(data_frame: pandas.DataFrame) -> pandas.DataFrame:
+    """Return data_frame with whole-number float columns as Int64.
+
+    An integer column holding a missing value is read as float64, and
+    writing it as 1.0 is rejected by integer columns. Float columns
+    only holding whole numbers are written as integers instead, which
+    float and numeric columns accept as well.
+    """
+    result = data_frame
+    for column_name, column in data_frame.items():
+        if not (isinstance(column.dtype, numpy.dtype) and column.dtype.kind == 'f'):
+            continue
+        present = column.to_numpy()[column.notna().to_numpy()]
+        if (present.size and numpy.isfinite(present).all()
+                and (present == numpy.round(present)).all()
+                and numpy.abs(present).max() < _INT64_LIMIT):
+            if result is data_frame:
+                result = data_frame.copy(deep=False)
+            result[column_name] = column.astype('Int64')
+    return result
+
+
+def _rows(data_frame: pandas.DataFrame) -> List[Tuple]:
+    """Convert a DataFrame into DBAPI rows with None for missing values."""
+    data_frame = _restore_integers(data_frame)
+    values = data_frame.astype(object).where(data_frame.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def _copy_from_stdin(cursor, data_frame: pandas.DataFrame, qualified_name: Text,
+                     column_list: Text):
+    """Load a DataFrame chunk through PostgreSQL COPY ... FROM STDIN."""
+    with SpooledTemporaryFile(max_size=COPY_SPOOL_BYTES, mode='w+') as buffer:
+        _restore_integers(data_frame).to_csv(buffer, index=False, header=False, na_rep='\\N')
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {qualified_name} ({column_list}) FROM STDIN "
+                           f"WITH (FORMAT CSV, NULL '\\N')", buffer)
+
+
+def _postgresql_batch(cursor, engine, data_frame: pandas.DataFrame,
+                      target: Tuple[Text, Optional[Text]], key_columns: Optional[List[Text]]):
+    """Write one batch into PostgreSQL, target is (table_name, schema)."""
+    table_name, schema = target
+    quote = engine.dialect.identifier_preparer.quote
+    qualified_name = _qualified_name(engine, table_name, schema)
+    column_list = ', '.join(quote(column) for column in data_frame.columns)
+    if not key_columns:
+        _copy_from_stdin(cursor, data_frame, qualified_name, column_list)
+        return
+    stage_name = quote(f"stage_{table_name}")
+    cursor.execute(f"CREATE TEMP TABLE {stage_name} (LIKE {qualified_name} INCLUDING DEFAULTS) "
+                   f"ON COMMIT DROP")
+    _copy_from_stdin(cursor, data_frame, stage_name, column_list)
+    update_columns = [column for column in data_frame.columns if column not in key_columns]
+    if update_columns:
+        action = 'DO UPDATE SET ' + ', '.join(f"{quote(column)} = EXCLUDED.{quote(column)}"
+                                              for column in update_columns)
+    else:
+        action = 'DO NOTHING'
+    cursor.execute(f"INSERT INTO {qualified_name} ({column_list}) "
+                   f"SELECT {column_list} FROM {stage_name} "
+                   f"ON CONFLICT ({', '.join(quote(column) for column in key_columns)}) {action}")
+
+
+def _mssql_batch(cursor, engine, data_frame: pandas.DataFrame,
+                 target: Tuple[Text, Optional[Text]], key_columns: Optional[List[Text]]):
+    """Write one batch into MSSQL through TDS bulk copy."""
+    table_name, schema = target
+    columns = list(data_frame.columns)
+    if not key_columns:
+        cursor.copy_to(table_or_view=table_name, schema=schema, columns=columns,
+                       data=_rows(data_frame), keep_nulls=True, tablock=True)
+        return
+    quote = engine.dialect.identifier_preparer.quote
+    qualified_name = _qualified_name(engine, table_name, schema)
+    column_list = ', '.join(quote(column) for column in columns)
+    stage_name = f"#stage_{table_name}"
+    cursor.execute(f"SELECT TOP 0 {column_list} INTO {quote(stage_name)} FROM {qualified_name}")
+    cursor.copy_to(table_or_view=stage_name, columns=columns, data=_rows(data_frame),
+                   keep_nulls=True, tablock=True)
+    match = ' AND '.join(f"target.{quote(column)} = source.{quote(column)}"
+                         for column in key_columns)
+    update_columns = [column for column in columns if column not in key_columns]
+    update = ''
+    if update_columns:
+        update = 'WHEN MATCHED THEN UPDATE SET ' + ', '.join(
+            f"target.{quote(column)} = source.{quote(column)}" for column in update_columns)
+    cursor.execute(f"MERGE {qualified_name} WITH (HOLDLOCK) AS target "
+                   f"USING {quote(stage_name)} AS source ON {match} {update} "
+                   f"WHEN NOT MATCHED THEN INSERT ({column_list}) "
+                   f"VALUES ({', '.join(f'source.{quote(column)}' for column in columns)});")
+    cursor.execute(f"DROP TABLE {quote(stage_name)}")
+
+
+def _mysql_batch(cursor, engine, data_frame: pandas.DataFrame,
+                 target: Tuple[Text, Optional[Text]], key_columns: Optional[List[Text]]):
+    """Write one batch into MySQL as a multi-row INSERT."""
+    quote = engine.dialect.identifier_preparer.quote
+    columns = list(data_frame.columns)
+    sql_command = (f"INSERT INTO {_qualified_name(engine, *target)} "
+                   f"({', '.join(quote(column) for column in columns)}) "
+                   f"VALUES ({', '.join(['%s'] * len(columns))})")
+    if key_columns is not None:
+        update_columns = [column for column in columns if column not in key_columns]
+        assignments = [f"{quote(column)} = VALUES({quote(column)})"
+                       for column in update_columns or key_columns[:1]]
+        sql_command += f" ON DUPLICATE KEY UPDATE {', '.join(assignments)}"
+    cursor.executemany(sql_command, _rows(data_frame))
+
+
+_BATCH_WRITERS = {
+    'postgresql': _postgresql_batch,
+    'mssql': _mssql_batch,
+    'mysql': _mysql_batch,
+}
+
+
+WRITE_OPTIONS = {
+    'schema': None,
+    'key_columns': None,
+    'windows_authentication': False,
+    'connection_arguments': None,
+    'batch_rows': DEFAULT_WRITE_BATCH_ROWS,
+}
+
+
+def _bulk_write(dialect: Text, database_information: DatabaseInformation,
+                data_frame: pandas.DataFrame, table_name: Text, **options: Any) -> WriteReport:
+    """Write data_frame in batches, committing after every batch.
+
+    options are the keys of WRITE_OPTIONS, missing ones take its
+    defaults.
+    """
+    unknown = sorted(set(options) - set(WRITE_OPTIONS))
+    if unknown:
+        raise TypeError(f"unexpected write options: {', '.join(unknown)}")
+    options = {**WRITE_OPTIONS, **options}
+    if dialect not in _BATCH_WRITERS:
+        raise ValueError(f"unsupported dialect: {dialect}")
+    if options['batch_rows'] < 1:
+        raise ValueError('batch_rows must be positive')
+    engine = ENGINE_REGISTRY.get_engine(dialect, database_information,
+                                        options['windows_authentication'],
+                                        options['connection_arguments'])
+    report = WriteReport(table_name=table_name)
+    start = time.perf_counter()
+    connection = engine.raw_connection()
+    try:
+        for offset in range(0, len(data_frame), options['batch_rows']):
+            chunk = data_frame.iloc[offset:offset + options['batch_rows']]
+            cursor = connection.cursor()
+            try:
+                _BATCH_WRITERS[dialect](cursor, engine, chunk, (table_name, options['schema']),
+                                        options['key_columns'])
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+            report.rows += len(chunk)
+            report.batches += 1
+    finally:
+        connection.close()
+        report.seconds = time.perf_counter() - start
+        if report.seconds:
+            report.rows_per_second = report.rows / report.seconds
+    return report
+
+
+def write_dataframe(dialect: Text, database_information: DatabaseInformation,
+                    data_frame: pandas.DataFrame, table_name: Text,
+                    **options: Any) -> WriteReport:
+    """Bulk insert a DataFrame into an existing table.
+
+    This function uses the fastest bulk path of each dialect: COPY
+    FROM STDIN for PostgreSQL, TDS bulk copy for MSSQL and multi-row
+    INSERT for MySQL. Every batch is committed in its own transaction
+    so a failure only rolls back the batch in flight.
+
+    Args:
+        dialect(Text): One of mssql, postgresql or mysql.
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        data_frame(pandas.DataFrame): The rows written. Column names
+            must match the table's columns.
+        table_name(Text): The target table.
+        options(Any): Optional. The write options below.
+
+    Keyword Args:
+        schema(Text): Optional. The schema of the target table.
+        windows_authentication(bool): Optional. Deciding variable to
+            determine the type of authentication to use. Only used by
+            mssql.
+        connection_arguments(Dict): Optional. A key, value object
+            containing arguments passed to the engine.
+        batch_rows(int): Optional. The number of rows committed per
+            batch.
+
+    Raises:
+        ValueError - When the dialect is not supported or batch_rows
+            is not positive.
+        TypeError - When an option is not a write option.
+
+    Returns:
+        A WriteReport with the rows, batches and rows per second.
+
+    """
+    return _bulk_write(dialect, database_information, data_frame, table_name,
+                       key_columns=None, **options)
+
+
+def upsert_dataframe(dialect: Text, database_information: DatabaseInformation,
+                     data_frame: pandas.DataFrame, table_name: Text, key_columns: List[Text],
+                     **options: Any) -> WriteReport:
+    """Bulk insert or update a DataFrame into an existing table.
+
+    PostgreSQL and MSSQL bulk load each batch into a temporary staging
+    table and then run INSERT ... ON CONFLICT or MERGE. MySQL uses a
+    multi-row INSERT ... ON DUPLICATE KEY UPDATE, which matches on the
+    table's own primary or unique keys.
+
+    Args:
+        dialect(Text): One of mssql, postgresql or mysql.
+        database_information(DatabaseInformation): A key, value object
+            containing the database connection information.
+        data_frame(pandas.DataFrame): The rows written. Column names
+            must match the table's columns.
+        table_name(Text): The target table.
+        key_columns(List): The columns identifying an existing row.
+        options(Any): Optional. The write options below.
+
+    Keyword Args:
+        schema(Text): Optional. The schema of the target table.
+        windows_authentication(bool): Optional. Deciding variable to
+            determine the type of authentication to use. Only used by
+            mssql.
+        connection_arguments(Dict): Optional. A key, value object
+            containing arguments passed to the engine.
+        batch_rows(int): Optional. The number of rows committed per
+            batch.
+
+    Raises:
+        ValueError - When the dialect is not supported, batch_rows is
+            not positive or key_columns is empty.
+        TypeError - When an option is not a write option.
+
+    Returns:
+        A WriteReport with the rows, batches and rows per second.
+
+    """
+    if not key_columns:
+        raise ValueError('key_columns must be present')
+    return _bulk_write(dialect, database_information, data_frame, table_name,
+                       key_columns=list(key_columns), **options)
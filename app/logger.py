@@ -5,12 +5,29 @@ Title: logger.py
 
 Author: theStygianArchitect
 """
+import gzip
 import logging
+import logging.handlers
+import queue
+import random
+import shutil
 import sys
+import threading
+from collections import deque
+from datetime import date
 from datetime import datetime
+from datetime import time
+from glob import escape as glob_escape
+from glob import glob
 from os import getenv
 from os import makedirs
+from os import remove
+from os import rename
+from os.path import exists
+from os.path import getsize
 from platform import node
+from typing import Dict
+from typing import Hashable
 from typing import Text
 from typing import Union
 
@@ -32,44 +49,533 @@ except ModuleNotFoundError as module_not_found_error:
 LOG_LEVEL = f"{getenv('LOG_LEVEL', '')}"
 if not LOG_LEVEL:
     LOG_LEVEL = logging.getLevelName(20)
+LOG_ASYNC = getenv('LOG_ASYNC', '').lower() in ('1', 'true', 'yes')
+LOG_QUEUE_SIZE = int(getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_QUEUE_OVERFLOW = getenv('LOG_QUEUE_OVERFLOW', 'block')
+LOG_BATCH_SIZE = 512
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'sample')
+LOG_MAX_BYTES = int(getenv('LOG_MAX_BYTES', str(100 * 1024 * 1024)))
+LOG_ROTATE_SECONDS = float(getenv('LOG_ROTATE_SECONDS', '86400'))
+LOG_BACKUP_COUNT = int(getenv('LOG_BACKUP_COUNT', '10'))
+LOG_FLUSH_RECORDS = int(getenv('LOG_FLUSH_RECORDS', '256'))
+LOG_FLUSH_SECONDS = float(getenv('LOG_FLUSH_SECONDS', '1'))
+LOG_BUFFER_SIZE = 1 << 16
+LOG_SUMMARY_SECONDS = 60.0
 
 
 def _default_json_serializer(obj):
     """Create serialization method."""
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
     try:
         return obj.__dict__
     except AttributeError:
         return str(obj)
 
 
+def _serializer(json_lib):
+    """Return a function serializing a record to str with json_lib once."""
+    if getattr(json_lib, '__name__', '') == 'orjson':
+        option = json_lib.OPT_NON_STR_KEYS | json_lib.OPT_SERIALIZE_NUMPY
+
+        def dumps(record):
+            return json_lib.dumps(record, default=_default_json_serializer,
+                                  option=option).decode('utf-8')
+        return dumps
+
+    def dumps(record):  # pylint: disable=E0102
+        return json_lib.dumps(record, default=_default_json_serializer)
+    return dumps
+
+
 class CustomisedJSONFormatter(json_log_formatter.JSONFormatter):
-    """Customized Logger class."""
+    """Customized Logger class.
+
+    host, pid and service are looked up once per formatter, time comes
+    from record.created and every record is serialized in one call of
+    json_lib with _default_json_serializer for unknown types. format
+    builds the record itself, so mutate_json_record is not called.
+    """
 
     json_lib = json
 
+    def __init__(self, *args, service: Text = None, json_lib=None, **kwargs):
+        """Initialize the formatter with its serializer and host fields."""
+        super().__init__(*args, **kwargs)
+        if json_lib is not None:
+            self.json_lib = json_lib
+        self._dumps = _serializer(self.json_lib)
+        self.host = node()
+        self.service = service if service is not None else getenv('SERVICE_NAME')
+        self._second = (None, '')
+
+    def _time(self, created: float) -> Text:
+        """Return created as a local ISO 8601 time, formatting each second once."""
+        second = int(created)
+        cached_second, prefix = self._second
+        if second != cached_second:
+            prefix = datetime.fromtimestamp(second).strftime('%Y-%m-%dT%H:%M:%S')
+            self._second = (second, prefix)
+        return f'{prefix}.{int((created - second) * 1000000):06d}'
+
+    def format(self, record):
+        """Overload method to build and serialize the record in one pass."""
+        extra = {name: value for name, value in record.__dict__.items()
+                 if name not in json_log_formatter.BUILTIN_ATTRS}
+        return self.to_json(self.json_record(record.getMessage(), extra, record))
+
     def json_record(self, message, extra, record):
         """Customize method to include additional information."""
         extra['message'] = message
-        extra['host'] = node()
+        extra['host'] = self.host
+        extra['pid'] = record.process
+        if self.service:
+            extra['service'] = self.service
         extra['function_name'] = record.funcName
         extra['module_name'] = record.module
         if 'time' not in extra:
-            extra['time'] = datetime.now().isoformat()
+            extra['time'] = self._time(record.created)
+        if record.exc_info:
+            extra['exc_info'] = self.formatException(record.exc_info)
         return extra
 
     def to_json(self, record):
-        """Overload method to convert bytes to string."""
+        """Overload method to serialize record once."""
         try:
-            return str(self.json_lib.dumps(record), 'utf-8')
-        except TypeError:
+            return self._dumps(record)
+        except (TypeError, ValueError, OverflowError):
+            # e.g. a circular reference; keep the record with str values.
+            return self._dumps({key: value if isinstance(value, (str, int, float, bool))
+                                or value is None else str(value)
+                                for key, value in record.items()})
+
+
+class AsyncLogHandler(logging.Handler):
+    """Queue records and write them from a background thread.
+
+    emit only appends the record to a bounded queue; a writer thread
+    formats the records with the formatter of target and writes every
+    batch to its stream in a single write, so the logging thread never
+    waits on the stream. When the queue is full the overflow policy
+    decides: block waits for room, drop_oldest discards the oldest
+    queued record and sample keeps one in sample_rate of the records
+    that arrive while it is full, discarding the oldest for each. The
+    queue is drained by flush and close, which logging.shutdown calls
+    at exit; records emitted after close are written synchronously.
+
+    Records are formatted after emit returns, so arguments mutated
+    right after the logging call may be logged with the new values.
+    """
+
+    def __init__(self, target: logging.StreamHandler, capacity: int = LOG_QUEUE_SIZE,
+                 overflow: Text = LOG_QUEUE_OVERFLOW, batch_size: int = LOG_BATCH_SIZE,
+                 sample_rate: int = 10):
+        """Initialize a handler queueing records for target."""
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow must be one of {OVERFLOW_POLICIES}')
+        if capacity < 1 or batch_size < 1 or sample_rate < 1:
+            raise ValueError('capacity, batch_size and sample_rate must be positive')
+        super().__init__(target.level)
+        self.target = target
+        self.capacity = capacity
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.sample_rate = sample_rate
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self._queue = deque()
+        self._in_flight = 0
+        self._overflowed = 0
+        self._closed = False
+        self._condition = threading.Condition(threading.Lock())
+        self._writer = threading.Thread(target=self._drain, name='AsyncLogHandler',
+                                        daemon=True)
+        self._writer.start()
+
+    @property
+    def counters(self) -> dict:
+        """Return the queued, dropped, written and pending record counts."""
+        with self._condition:
+            return {'queued': self.queued, 'dropped': self.dropped, 'written': self.written,
+                    'pending': len(self._queue) + self._in_flight}
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        """Overload method to queue without taking the handler lock."""
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record: logging.LogRecord):
+        """Queue record for the writer thread."""
+        from_writer = threading.current_thread() is self._writer
+        with self._condition:
+            if not from_writer:
+                self._make_room()
+            synchronous = from_writer or self._closed
+            if not synchronous:
+                if len(self._queue) < self.capacity:
+                    self._queue.append(record)
+                    self.queued += 1
+                    self._condition.notify_all()
+                else:
+                    self.dropped += 1
+        if synchronous:
+            self.target.handle(record)
+
+    def _make_room(self):
+        """Apply the overflow policy while the queue is full."""
+        if self.overflow == 'block':
+            while len(self._queue) >= self.capacity and not self._closed:
+                self._condition.wait()
+        elif len(self._queue) >= self.capacity:
+            self._overflowed += 1
+            if self.overflow == 'drop_oldest' or (self._overflowed - 1) % self.sample_rate == 0:
+                self._queue.popleft()
+                self.dropped += 1
+
+    def _drain(self):
+        """Write batches of queued records until closed."""
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft()
+                         for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                if len(self._queue) < self.capacity:
+                    self._overflowed = 0
+                self._condition.notify_all()
+            self._write(batch)
+            with self._condition:
+                self._in_flight = 0
+                self.written += len(batch)
+                self._condition.notify_all()
+
+    def _write(self, batch):
+        """Format batch with target and write it to its stream at once."""
+        if self.target.stream is None or type(self.target).emit not in (
+                logging.StreamHandler.emit, logging.FileHandler.emit):
+            # A delayed FileHandler opens its file on the first emit and
+            # rotating handlers check every record.
+            for record in batch:
+                self.target.handle(record)
+            return
+        lines = []
+        for record in batch:
             try:
-                return self.json_lib.dumps(record, default=_default_json_serializer)
+                if self.target.filter(record):
+                    lines.append(self.target.format(record) + self.target.terminator)
+            except Exception:  # pylint: disable=W0703
+                self.target.handleError(record)
+        if not lines:
+            return
+        self.target.acquire()
+        try:
+            self.target.stream.write(''.join(lines))
+            self.target.flush()
+        except Exception:  # pylint: disable=W0703
+            self.target.handleError(batch[-1])
+        finally:
+            self.target.release()
+
+    def flush(self):
+        """Wait until every queued record is written."""
+        with self._condition:
+            while (self._queue or self._in_flight) and self._writer.is_alive():
+                self._condition.wait(0.1)
+
+    def close(self):
+        """Drain the queue, stop the writer thread and close target."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if threading.current_thread() is not self._writer:
+            self._writer.join()
+        self.target.close()
+        super().close()
+
+
+class RotatingCompressedFileHandler(logging.handlers.BaseRotatingHandler):
+    """Buffered file handler rolling over by size and time.
+
+    Lines go through a LOG_BUFFER_SIZE write buffer that is flushed
+    every flush_records records and, from a background thread, every
+    flush_seconds, instead of on every record. The file is rolled over
+    when the next line would take it past max_bytes or rotate_seconds
+    after it was opened; the rotated segment is renamed with its
+    rollover time, gzip compressed by the background thread when
+    compress is set, and only the backup_count newest segments are
+    kept. Sizes are counted in characters, which is exact for ASCII
+    JSON.
+    """
+
+    def __init__(self, filename: Text, max_bytes: int = LOG_MAX_BYTES,
+                 rotate_seconds: float = LOG_ROTATE_SECONDS,
+                 backup_count: int = LOG_BACKUP_COUNT, compress: bool = True,
+                 flush_records: int = LOG_FLUSH_RECORDS,
+                 flush_seconds: float = LOG_FLUSH_SECONDS, encoding: Text = 'utf-8'):
+        """Initialize the handler and start its flush and compression worker."""
+        if max_bytes < 1 or rotate_seconds <= 0 or backup_count < 0 or flush_records < 1:
+            raise ValueError('max_bytes, rotate_seconds and flush_records must be positive')
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.compress = compress
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self._pending = 0
+        super().__init__(filename, 'a', encoding=encoding)
+        self._size = getsize(self.baseFilename)
+        self._rollover_at = datetime.now().timestamp() + rotate_seconds
+        self._jobs = queue.Queue()
+        self._worker = threading.Thread(target=self._work, name='RotatingCompressedFileHandler',
+                                        daemon=True)
+        self._worker.start()
+
+    def _open(self):
+        """Overload method to open the file with a large write buffer."""
+        return open(self.baseFilename, self.mode,  # pylint: disable=R1732
+                    buffering=LOG_BUFFER_SIZE, encoding=self.encoding)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        """Return whether the file is older than rotate_seconds."""
+        return record.created >= self._rollover_at
+
+    def emit(self, record: logging.LogRecord):
+        """Overload method to format once and write to the buffer."""
+        try:
+            line = self.format(record) + self.terminator
+            if self.shouldRollover(record) or (self._size and
+                                               self._size + len(line) > self.max_bytes):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(line)
+            self._size += len(line)
+            self._pending += 1
+            if self._pending >= self.flush_records:
+                self.flush()
+        except Exception:  # pylint: disable=W0703
+            self.handleError(record)
+
+    def flush(self):
+        """Overload method to write out the buffered records."""
+        self.acquire()
+        try:
+            self._pending = 0
+            if self.stream is not None:
+                self.stream.flush()
+        finally:
+            self.release()
+
+    def doRollover(self):
+        """Rename the file with the rollover time and start a new one."""
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        rotated = f"{self.baseFilename}.{datetime.now().strftime('%Y%m%dT%H%M%S%f')}"
+        while exists(rotated) or exists(f'{rotated}.gz'):
+            rotated += '_'
+        if exists(self.baseFilename):
+            rename(self.baseFilename, rotated)
+            self._jobs.put(rotated)
+        self._pending = 0
+        self._size = 0
+        self._rollover_at = datetime.now().timestamp() + self.rotate_seconds
+        self.stream = self._open()
+
+    def _work(self):
+        """Flush on a timer and compress and prune rotated segments."""
+        while True:
+            try:
+                rotated = self._jobs.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                if self._pending:
+                    self.flush()
+                continue
+            if rotated is None:
+                return
+            try:
+                if self.compress:
+                    self._compress(rotated)
+                self._prune()
+            except OSError:
+                self.handleError(logging.makeLogRecord({
+                    'msg': 'Unable to compress %s', 'args': (rotated,),
+                    'levelno': logging.ERROR, 'levelname': 'ERROR'}))
+
+    @staticmethod
+    def _compress(rotated: Text):
+        """Gzip the rotated segment and remove the uncompressed one."""
+        with open(rotated, 'rb') as source, gzip.open(f'{rotated}.gz', 'wb', 6) as sink:
+            shutil.copyfileobj(source, sink, LOG_BUFFER_SIZE)
+        remove(rotated)
+
+    def _prune(self):
+        """Remove all but the backup_count newest rotated segments."""
+        segments = sorted(glob(f'{glob_escape(self.baseFilename)}.[0-9]*'))
+        for segment in segments[:max(0, len(segments) - self.backup_count)]:
+            try:
+                remove(segment)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        """Overload method to finish compressing before closing."""
+        if self._worker.is_alive():
+            self._jobs.put(None)
+            if threading.current_thread() is not self._worker:
+                self._worker.join()
+        super().close()
+
+
+class LogSampler(logging.Filter):
+    """Sample, rate limit and deduplicate records before they are formatted.
+
+    Added to a logger, the checks run on the unformatted record: a
+    level in sample_rates keeps that fraction of its records, a logger
+    in logger_rate_limits and a template in template_rate_limits (or
+    every template with default_template_rate) keep at most that many
+    records per second, and with dedup_seconds a record with the same
+    template and arguments, or the same dict message, as one kept
+    within dedup_seconds is dropped.
+    The template of a record is its msg when that is a str and its call
+    site otherwise, e.g. log.info({'status': 'Ok'}); template_rate_limits
+    matches such a record by str(msg). Times come from record.created.
+    Every summary_seconds the dropped records are logged as one
+    'suppressed N similar messages' record per template, with the count
+    in its suppressed field, and idle rate limit and dedup state is
+    dropped.
+    """
+
+    def __init__(self, sample_rates: Dict[int, float] = None,
+                 logger_rate_limits: Dict[Text, float] = None,
+                 template_rate_limits: Dict[Text, float] = None,
+                 default_template_rate: float = None, dedup_seconds: float = None,
+                 summary_seconds: float = LOG_SUMMARY_SECONDS):
+        """Initialize a sampler that drops nothing until limits are given."""
+        super().__init__()
+        self.sample_rates = dict(sample_rates or {})
+        self.logger_rate_limits = dict(logger_rate_limits or {})
+        self.template_rate_limits = dict(template_rate_limits or {})
+        self.default_template_rate = default_template_rate
+        self.dedup_seconds = dedup_seconds
+        self.summary_seconds = summary_seconds
+        self._buckets = {}
+        self._last_seen = {}
+        self._suppressed = {}
+        self._next_summary = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _template(record: logging.LogRecord) -> Hashable:
+        """Return the template of record, its msg or its call site."""
+        if isinstance(record.msg, str):
+            return record.name, record.msg
+        return record.name, record.pathname, record.lineno
+
+    def _take(self, key: Hashable, rate: float, now: float) -> bool:
+        """Take a token from the bucket of key refilling rate tokens per second.
+
+        The bucket holds at least one token, so rates below one record
+        per second keep one record every 1 / rate seconds.
+        """
+        capacity = max(1.0, rate)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [capacity, now, rate]
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _keep(self, record: logging.LogRecord, template: Hashable) -> bool:
+        """Return whether record passes sampling, rate limits and dedup."""
+        rate = self.sample_rates.get(record.levelno)
+        # Sampling needs speed, not unpredictability.
+        if rate is not None and random.random() >= rate:  # nosec B311
+            return False
+        now = record.created
+        rate = self.logger_rate_limits.get(record.name)
+        if rate is not None and not self._take(record.name, rate, now):
+            return False
+        rate = self.default_template_rate
+        if self.template_rate_limits:
+            message = record.msg if isinstance(record.msg, str) else str(record.msg)
+            rate = self.template_rate_limits.get(message, rate)
+        if rate is not None and not self._take(template, rate, now):
+            return False
+        if self.dedup_seconds is not None:
+            message = record.msg
+            try:
+                key = (template, record.args if isinstance(message, str) else
+                       tuple(message.items()) if isinstance(message, dict) else message)
+                last = self._last_seen.get(key)
             except TypeError:
-                return self.json_lib.dumps(record)
+                return True
+            if last is not None and now - last < self.dedup_seconds:
+                return False
+            self._last_seen[key] = now
+        return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Return whether record is logged, counting it when it is not."""
+        if getattr(record, 'sampling_summary', False):
+            return True
+        template = self._template(record)
+        with self._lock:
+            keep = self._keep(record, template)
+            if not keep:
+                suppressed = self._suppressed.get(template)
+                if suppressed is None:
+                    self._suppressed[template] = [1, record.levelno, record.msg]
+                else:
+                    suppressed[0] += 1
+                    suppressed[1] = max(suppressed[1], record.levelno)
+            if self._next_summary is None:
+                self._next_summary = record.created + self.summary_seconds
+            due = record.created >= self._next_summary
+        if due:
+            self.summarize(record.created)
+        return keep
+
+    def summarize(self, now: float = None):
+        """Log the records suppressed since the last summary."""
+        with self._lock:
+            suppressed, self._suppressed = self._suppressed, {}
+            if now is not None:
+                self._next_summary = now + self.summary_seconds
+                self._buckets = {key: bucket for key, bucket in self._buckets.items()
+                                 if bucket[0] + (now - bucket[1]) * bucket[2]
+                                 < max(1.0, bucket[2])}
+                if self.dedup_seconds is not None:
+                    self._last_seen = {key: last for key, last in self._last_seen.items()
+                                       if now - last < self.dedup_seconds}
+        for template, (count, levelno, msg) in suppressed.items():
+            logger = logging.getLogger(template[0])
+            record = logger.makeRecord(logger.name, levelno, __file__, 0,
+                                       'suppressed %d similar messages: %s', (count, msg),
+                                       None, extra={'suppressed': count,
+                                                    'sampling_summary': True})
+            logger.handle(record)
+
+
+def _attach_handler(logger: logging.Logger, handler: logging.StreamHandler,
+                    asynchronous: bool):
+    """Add handler to logger, through an AsyncLogHandler if asynchronous."""
+    logger.addHandler(AsyncLogHandler(handler) if asynchronous else handler)
 
 
 def set_up_stream_logging(log_name: Text = __file__,
-                          log_level: Union[str, int] = LOG_LEVEL) -> logging.Logger:
+                          log_level: Union[str, int] = LOG_LEVEL,
+                          asynchronous: bool = LOG_ASYNC,
+                          sampler: LogSampler = None) -> logging.Logger:
     """Customize a setup for logging.
 
     This function exists to setup a customized logging solution. As
@@ -80,6 +586,11 @@ def set_up_stream_logging(log_name: Text = __file__,
     Args:
         log_name(Text): The name of the log file.
         log_level(str, int): The minimum level to act on.
+        asynchronous(bool): Optional. Write through an AsyncLogHandler
+            so logging calls do not wait on stderr. Defaults to the
+            LOG_ASYNC environment variable.
+        sampler(LogSampler): Optional. Sample, rate limit and
+            deduplicate the records of the logger.
 
     Returns:
         A logger instance that can receive messages to log.
@@ -90,19 +601,26 @@ def set_up_stream_logging(log_name: Text = __file__,
     json_handler.setFormatter(formatter)
     logger = logging.getLogger(name=log_name)
     if not logger.handlers:
-        logger.addHandler(json_handler)
+        _attach_handler(logger, json_handler, asynchronous)
+    if sampler is not None:
+        logger.addFilter(sampler)
     logger.setLevel(log_level)
     return logger
 
 
 def set_up_file_logging(log_name: Text = __file__, log_path: Text = '.',
-                        log_level: Union[str, int] = LOG_LEVEL) -> logging.Logger:
+                        log_level: Union[str, int] = LOG_LEVEL,
+                        asynchronous: bool = LOG_ASYNC, max_bytes: int = LOG_MAX_BYTES,
+                        backup_count: int = LOG_BACKUP_COUNT,
+                        sampler: LogSampler = None) -> logging.Logger:
     """Customize a setup for logging.
 
     This function exists to setup a customized logging solution. As
     well as provide a central location for logging changes.
 
-    Currently this setup utilizes a Stream handler (stderr)
+    Currently this setup utilizes a RotatingCompressedFileHandler,
+    tuned by the LOG_ROTATE_SECONDS, LOG_FLUSH_RECORDS and
+    LOG_FLUSH_SECONDS environment variables.
 
     Args:
         log_name(Text): The name of the log file.
@@ -110,6 +628,13 @@ def set_up_file_logging(log_name: Text = __file__, log_path: Text = '.',
             If absolute path isn't specified then relative path will be
             used.
         log_level(str, int): Optional. The minimum level to act on.
+        asynchronous(bool): Optional. Write through an AsyncLogHandler
+            so logging calls do not wait on the file. Defaults to the
+            LOG_ASYNC environment variable.
+        max_bytes(int): Optional. The size the log is rolled over at.
+        backup_count(int): Optional. The compressed rotated logs kept.
+        sampler(LogSampler): Optional. Sample, rate limit and
+            deduplicate the records of the logger.
 
     Raises:
         LookupError - When log_name not present
@@ -120,11 +645,14 @@ def set_up_file_logging(log_name: Text = __file__, log_path: Text = '.',
     """
     makedirs(log_path, exist_ok=True)
     log_file_name = f"{log_path}/{log_name}"
-    formatter = CustomisedJSONFormatter()
-    json_handler = logging.FileHandler(filename=log_file_name)
-    json_handler.setFormatter(formatter)
     logger = logging.getLogger(name=log_name)
-    if logger.handlers:
-        logger.addHandler(json_handler)
+    if not logger.handlers:
+        formatter = CustomisedJSONFormatter()
+        json_handler = RotatingCompressedFileHandler(log_file_name, max_bytes=max_bytes,
+                                                     backup_count=backup_count)
+        json_handler.setFormatter(formatter)
+        _attach_handler(logger, json_handler, asynchronous)
+    if sampler is not None:
+        logger.addFilter(sampler)
     logger.setLevel(log_level)
     return logger
@@ -6,25 +6,138 @@ Title: pandas_aggregation_techniques.py
 
 Author: theStygianArchitect
 """
+import os
 import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
 from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
 from typing import List
+from typing import Sequence
 from typing import Text
+from typing import Tuple
 
 try:
+    import numpy
     import pandas
 except ModuleNotFoundError as module_not_found_error:
     print(module_not_found_error)
     print('Please install required packages')
     sys.exit(1)
 
-
-from logger import set_up_stream_logging
+try:
+    from .logger import set_up_stream_logging
+except ImportError:
+    from app.logger import set_up_stream_logging
 
 
 log = set_up_stream_logging()  # pylint: disable=C0103
 
 
+class FilterTracer:  # pylint: disable=R0903
+    """Structured trace events for the filter and aggregation helpers.
+
+    Every traced call produces one event with the function name, the
+    rows in and out, the elapsed seconds and a summary of the
+    arguments: strings and scalars as they are, sized arguments such
+    as filter_array as <name>_size, so large arrays are never
+    formatted. Events go to sink, or are logged at INFO with the
+    fields as JSON extras.
+    """
+
+    def __init__(self, sink: Callable[[Dict[Text, Any]], None] = None):
+        """Initialize a tracer sending events to sink."""
+        self.sink = sink or self._log_event
+
+    @staticmethod
+    def _log_event(event: Dict[Text, Any]):
+        """Log event with its fields as structured extras."""
+        log.info('filter trace', extra=event)
+
+    @staticmethod
+    def _rows(data_frame: Any) -> Optional[int]:
+        """Return the rows of a DataFrame-like argument, if known."""
+        if isinstance(data_frame, (pandas.DataFrame, IndexedFrame)):
+            return len(data_frame)
+        return None
+
+    def trace(self, function: Callable, data_frame: Any, args: Tuple,
+              kwargs: Dict[Text, Any]) -> Any:
+        """Call function and emit its trace event."""
+        start = time.perf_counter()
+        result = function(data_frame, *args, **kwargs)
+        seconds = time.perf_counter() - start
+        event = {'function': function.__name__, 'rows_in': self._rows(data_frame),
+                 'rows_out': self._rows(result), 'seconds': seconds}
+        names = function.__code__.co_varnames[1:function.__code__.co_argcount]
+        for name, value in list(zip(names, args)) + list(kwargs.items()):
+            if value is None or isinstance(value, (str, bool, int, float)):
+                event[name] = value
+            elif hasattr(value, '__len__'):
+                event[f"{name}_size"] = len(value)
+            else:
+                event[name] = type(value).__name__
+        self.sink(event)
+        return result
+
+
+_FILTER_TRACER: Optional[FilterTracer] = None
+
+
+def enable_filter_tracing(sink: Callable[[Dict[Text, Any]], None] = None) -> FilterTracer:
+    """Start emitting a trace event for every traced helper call.
+
+    Tracing is also enabled at import when the FILTER_TRACING
+    environment variable is set.
+
+    Args:
+        sink(Callable): Optional. Receives every event as a dict. The
+            events are logged at INFO by default.
+
+    Returns:
+        The active FilterTracer.
+
+    """
+    global _FILTER_TRACER  # pylint: disable=W0603
+    _FILTER_TRACER = FilterTracer(sink)
+    return _FILTER_TRACER
+
+
+def disable_filter_tracing():
+    """Stop emitting trace events."""
+    global _FILTER_TRACER  # pylint: disable=W0603
+    _FILTER_TRACER = None
+
+
+def _traced(function: Callable) -> Callable:
+    """Route calls of function through the active FilterTracer.
+
+    When tracing is disabled the wrapper only reads one global, so the
+    helpers do no logging or formatting work at all.
+    """
+    @wraps(function)
+    def wrapper(data_frame, *args, **kwargs):
+        if _FILTER_TRACER is None:
+            return function(data_frame, *args, **kwargs)
+        return _FILTER_TRACER.trace(function, data_frame, args, kwargs)
+    return wrapper
+
+
+def _is_lazy(data_frame: Any) -> bool:
+    """Return True for objects that answer the filters themselves.
+
+    See database.LazyQuery and IndexedFrame.
+    """
+    return hasattr(data_frame, 'push_filter') and hasattr(data_frame, 'push_projection')
+
+
+@_traced
 def filter_data_where_column_eq_value(data_frame: pandas.DataFrame, column_name: Text,
                                       filter_value: Any) -> pandas.DataFrame:
     """Filter data_frame by a specific value.
@@ -34,7 +147,7 @@ def filter_data_where_column_eq_value(data_frame: pandas.DataFrame, column_name:
 
     Args:
         data_frame(pandas.DataFrame): The DataFrame object being
-            filtered.
+            filtered, or a LazyQuery recording the filter.
         column_name(Text): The column that is being inspected.
         filter_value(Any): The value that column_name' value should
             equal.
@@ -43,11 +156,12 @@ def filter_data_where_column_eq_value(data_frame: pandas.DataFrame, column_name:
         A tabular representation of the data filtered.
 
     """
-    log.debug('column_name: %s', column_name)
-    log.debug('filter_value: %s', filter_value)
+    if _is_lazy(data_frame):
+        return data_frame.push_filter('eq', column_name, filter_value)
     return data_frame.loc[data_frame[column_name] == filter_value]
 
 
+@_traced
 def filter_data_where_column_neq_value(data_frame: pandas.DataFrame, column_name: Text,
                                        filter_value: Any) -> pandas.DataFrame:
     """Filter data_frame by a generic value.
@@ -57,7 +171,7 @@ def filter_data_where_column_neq_value(data_frame: pandas.DataFrame, column_name
 
     Args:
         data_frame(pandas.DataFrame): The DataFrame object being
-            filtered.
+            filtered, or a LazyQuery recording the filter.
         column_name(Text): The column that is being inspected.
         filter_value(Any): The value that column_name's value should
             not equal.
@@ -66,11 +180,12 @@ def filter_data_where_column_neq_value(data_frame: pandas.DataFrame, column_name
         A tabular representation of the data filtered.
 
     """
-    log.debug('column_name: %s', column_name)
-    log.debug('filter_value: %s', filter_value)
+    if _is_lazy(data_frame):
+        return data_frame.push_filter('neq', column_name, filter_value)
     return data_frame.loc[data_frame[column_name] != filter_value]
 
 
+@_traced
 def filter_data_where_column_isin_array(data_frame: pandas.DataFrame, column_name: Text,
                                         filter_array: List[Any]) -> pandas.DataFrame:
     """Filter data_frame by multiple values.
@@ -80,7 +195,7 @@ def filter_data_where_column_isin_array(data_frame: pandas.DataFrame, column_nam
 
     Args:
         data_frame(pandas.DataFrame): The DataFrame object being
-            filtered.
+            filtered, or a LazyQuery recording the filter.
         column_name(Text): The column that is being inspected.
         filter_array(List): The values that column_name's value should
             equal.
@@ -89,11 +204,12 @@ def filter_data_where_column_isin_array(data_frame: pandas.DataFrame, column_nam
         A tabular representation of the data filtered.
 
     """
-    log.debug('column_name: %s', column_name)
-    log.debug('filter_array: %s', filter_array)
+    if _is_lazy(data_frame):
+        return data_frame.push_filter('isin', column_name, filter_array)
     return data_frame.loc[data_frame[column_name].isin(filter_array)]
 
 
+@_traced
 def filter_data_where_column_is_not_in_array(data_frame: pandas.DataFrame, column_name: Text,
                                              filter_array: List[Any]) -> pandas.DataFrame:
     """Filter data_frame by multiple values.
@@ -103,7 +219,7 @@ def filter_data_where_column_is_not_in_array(data_frame: pandas.DataFrame, colum
 
     Args:
         data_frame(pandas.DataFrame): The DataFrame object being
-            filtered.
+            filtered, or a LazyQuery recording the filter.
         column_name(Text): The column that is being inspected.
         filter_array(List): The values that column_name's value should
             not equal.
@@ -112,11 +228,12 @@ def filter_data_where_column_is_not_in_array(data_frame: pandas.DataFrame, colum
         A tabular representation of the data filtered.
 
     """
-    log.debug('column_name: %s', column_name)
-    log.debug('filter_array: %s', filter_array)
+    if _is_lazy(data_frame):
+        return data_frame.push_filter('not_in', column_name, filter_array)
     return data_frame.loc[~data_frame[column_name].isin(filter_array)]
 
 
+@_traced
 def filter_data_by_columns(data_frame: pandas.DataFrame, columns: List) -> pandas.DataFrame:
     """Filter data_frame by columns.
 
@@ -125,12 +242,642 @@ def filter_data_by_columns(data_frame: pandas.DataFrame, columns: List) -> panda
 
     Args:
         data_frame(pandas.DataFrame): The DataFrame object being
-            filtered.
+            filtered, or a LazyQuery recording the projection.
         columns(List): The column that is being inspected.
 
     Returns:
         A tabular representation of the data filtered.
 
     """
-    log.debug('columns: %s', columns)
+    if _is_lazy(data_frame):
+        return data_frame.push_projection(columns)
     return data_frame[columns]
+
+
+FILTER_OPERATORS = ('eq', 'neq', 'isin', 'not_in')
+
+
+def _is_missing(value: Any) -> bool:
+    """Return True for None, NaN, NaT and NA, which never compare equal in pandas."""
+    return value is None or (pandas.api.types.is_scalar(value) and bool(pandas.isna(value)))
+
+
+def _predicate_mask(column: pandas.Series, operator: Text, value: Any) -> Any:
+    """Return the boolean mask of one predicate with the helpers' semantics.
+
+    Numeric and bool NumPy columns compared with a numeric or bool
+    scalar use their underlying array. Everything else, e.g. datetime
+    columns compared with a str, goes through the pandas operator so
+    values are coerced like the helpers coerce them, and missing
+    results count as not matching, like .loc does.
+    """
+    if operator in ('isin', 'not_in'):
+        mask = column.isin(value).to_numpy()
+        return ~mask if operator == 'not_in' else mask
+    if (isinstance(column.dtype, numpy.dtype) and column.dtype.kind in 'biuf'
+            and (value is None or isinstance(value, (bool, int, float, numpy.number,
+                                                     numpy.bool_)))):
+        if _is_missing(value):
+            return operator == 'neq'
+        values = column.to_numpy()
+        mask = values == value if operator == 'eq' else values != value
+        if isinstance(mask, numpy.ndarray):
+            return mask
+        return bool(mask)
+    mask = column == value if operator == 'eq' else column != value
+    return mask.to_numpy(dtype=bool, na_value=False)
+
+
+@_traced
+def filter_data_by_predicates(data_frame: pandas.DataFrame,
+                              predicates: Sequence[Tuple[Text, Text, Any]],
+                              columns: List = None) -> pandas.DataFrame:
+    """Filter data_frame by several predicates and a projection at once.
+
+    This function gives the same rows as chaining
+    filter_data_where_column_eq_value, _neq_value, _isin_array,
+    _is_not_in_array and filter_data_by_columns, but it combines the
+    predicate masks in place in one NumPy array and materializes a
+    single result. When the matching rows are contiguous the result is
+    a slice of data_frame rather than a gathered copy, so it may share
+    memory with data_frame; copy it before mutating it in place.
+
+    Args:
+        data_frame(pandas.DataFrame): The DataFrame object being
+            filtered, or a LazyQuery recording the filters.
+        predicates(Sequence): (column_name, operator, value) tuples
+            where operator is one of eq, neq, isin or not_in.
+        columns(List): Optional. The columns kept in the result.
+
+    Raises:
+        ValueError - When an operator is not supported.
+
+    Returns:
+        A tabular representation of the data filtered.
+
+    """
+    for _, operator, _ in predicates:
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"operator must be one of {FILTER_OPERATORS}")
+    if isinstance(data_frame, IndexedFrame):
+        return data_frame.filter(predicates, columns)
+    if _is_lazy(data_frame):
+        for column_name, operator, value in predicates:
+            data_frame = data_frame.push_filter(operator, column_name, value)
+        if columns is not None:
+            data_frame = data_frame.push_projection(columns)
+        return data_frame
+
+    mask = numpy.ones(len(data_frame), dtype=bool)
+    for column_name, operator, value in predicates:
+        mask &= _predicate_mask(data_frame[column_name], operator, value)
+        if not mask.any():
+            break
+    column_positions = (slice(None) if columns is None
+                        else data_frame.columns.get_indexer_for(columns))
+    if columns is not None and (column_positions < 0).any():
+        raise KeyError([column for column in columns if column not in data_frame.columns])
+    rows = numpy.flatnonzero(mask)
+    row_positions: Any = rows
+    if rows.size and rows[-1] - rows[0] + 1 == rows.size:
+        row_positions = slice(rows[0], rows[-1] + 1)
+    return data_frame.iloc[row_positions, column_positions]
+
+
+DEFAULT_INDEX_MEMORY_BUDGET = 256 * 2 ** 20
+
+
+class _ColumnIndex:  # pylint: disable=R0903
+    """Row positions of one column grouped by value.
+
+    positions holds the row positions ordered by factorized code, so
+    the rows equal to the value with code c are
+    positions[offsets[c]:offsets[c + 1]], in ascending row order.
+    Missing values are kept apart because their comparison result
+    depends on the dtype.
+    """
+
+    def __init__(self, column: pandas.Series):
+        """Initialize the index of column."""
+        codes, uniques = pandas.factorize(column)
+        position_type = numpy.int32 if len(column) < 2 ** 31 else numpy.int64
+        self.uniques = pandas.Index(uniques)
+        self.unique_values = pandas.Series(uniques, dtype=column.dtype)
+        self.dtype = column.dtype
+        self.positions = numpy.argsort(codes, kind='stable').astype(position_type)
+        counts = numpy.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.offsets = numpy.zeros(len(uniques) + 1, dtype=numpy.int64)
+        numpy.cumsum(counts, out=self.offsets[1:])
+        missing_count = len(column) - int(self.offsets[-1])
+        self.missing = self.positions[:missing_count]
+        self.positions = self.positions[missing_count:]
+        self.nbytes = (self.positions.nbytes + self.missing.nbytes + self.offsets.nbytes
+                       + self.uniques.memory_usage(deep=True))
+
+    def _hashable(self, value: Any) -> bool:
+        """Return whether a hash lookup of value finds what == finds."""
+        kind = getattr(self.dtype, 'kind', 'O')
+        if isinstance(value, (bool, numpy.bool_)):
+            return kind == 'b'
+        if isinstance(value, (int, float, numpy.integer, numpy.floating)):
+            return kind in 'iuf'
+        return isinstance(value, str) and (self.dtype == object
+                                           or isinstance(self.dtype, pandas.StringDtype))
+
+    def lookup(self, operator: Text, value: Any) -> numpy.ndarray:
+        """Return the ascending row positions matching eq or isin value.
+
+        Values that the column would coerce, e.g. True for an int
+        column or a str for a datetime column, are compared with the
+        unique values using the helpers' semantics instead of hashed.
+        """
+        values = list(value) if operator == 'isin' else [value]
+        present = [item for item in values if not _is_missing(item)]
+        if all(self._hashable(item) for item in present):
+            codes = self.uniques.get_indexer(present)
+            codes = numpy.unique(codes[codes >= 0])
+        else:
+            codes = numpy.flatnonzero(numpy.broadcast_to(
+                _predicate_mask(self.unique_values, operator, value), len(self.unique_values)))
+        if len(codes) == 1:
+            return self.positions[self.offsets[codes[0]]:self.offsets[codes[0] + 1]]
+        groups = [self.positions[self.offsets[code]:self.offsets[code + 1]] for code in codes]
+        return numpy.sort(numpy.concatenate(groups)) if groups else self.positions[:0]
+
+
+class IndexedFrame:
+    """A DataFrame with value indexes for repeated equality filters.
+
+    The first eq, neq, isin or not_in filter on a column factorizes it
+    once; later filters on that column cost a hash lookup plus time
+    proportional to the rows returned instead of a full column scan.
+    Results are the rows the filter helpers in this module return, in
+    the same order.
+
+    Indexes are kept least recently used first within memory_budget
+    bytes; a column whose index alone exceeds the budget is scanned.
+    Assigning through the wrapper, or replacing the frame, drops the
+    affected indexes, and a change of length or row index is detected
+    on the next filter. Call invalidate after changing values of the
+    wrapped frame in place.
+
+    Pass an IndexedFrame wherever the filter helpers accept a
+    DataFrame.
+
+    """
+
+    def __init__(self, data_frame: pandas.DataFrame,
+                 memory_budget: int = DEFAULT_INDEX_MEMORY_BUDGET):
+        """Initialize the wrapper of data_frame without any index."""
+        if memory_budget < 0:
+            raise ValueError('memory_budget must not be negative')
+        self._data_frame = data_frame
+        self.memory_budget = memory_budget
+        self._indexes: 'OrderedDict[Text, _ColumnIndex]' = OrderedDict()
+        self._row_index = data_frame.index
+        self._lock = threading.Lock()
+
+    @property
+    def frame(self) -> pandas.DataFrame:
+        """Return the wrapped DataFrame."""
+        return self._data_frame
+
+    @frame.setter
+    def frame(self, data_frame: pandas.DataFrame):
+        """Replace the wrapped DataFrame and drop every index."""
+        self._data_frame = data_frame
+        self.invalidate()
+
+    def __len__(self) -> int:
+        """Return the rows of the wrapped DataFrame."""
+        return len(self._data_frame)
+
+    def __getitem__(self, key: Any) -> Any:
+        """Return key of the wrapped DataFrame."""
+        return self._data_frame[key]
+
+    def __setitem__(self, column_name: Text, value: Any):
+        """Assign a column of the wrapped DataFrame and drop its index."""
+        self._data_frame[column_name] = value
+        self.invalidate(column_name)
+
+    def invalidate(self, column_name: Text = None):
+        """Drop the index of column_name, or every index."""
+        with self._lock:
+            if column_name is None:
+                self._indexes.clear()
+                self._row_index = self._data_frame.index
+            else:
+                self._indexes.pop(column_name, None)
+
+    @property
+    def nbytes(self) -> int:
+        """Return the bytes held by the column indexes."""
+        with self._lock:
+            return sum(index.nbytes for index in self._indexes.values())
+
+    def indexed_columns(self) -> List[Text]:
+        """Return the indexed columns, least recently used first."""
+        with self._lock:
+            return list(self._indexes)
+
+    def _index(self, column_name: Text) -> Any:
+        """Return the index of column_name, building it on first use.
+
+        Returns None when the index does not fit in the memory budget.
+        """
+        if (self._row_index is not self._data_frame.index
+                or len(self._row_index) != len(self._data_frame)):
+            self.invalidate()
+        with self._lock:
+            index = self._indexes.get(column_name)
+            if index is not None:
+                self._indexes.move_to_end(column_name)
+                return index
+        column = self._data_frame[column_name]
+        # factorize needs about 16 bytes a row while it runs.
+        if 16 * len(column) > self.memory_budget:
+            return None
+        index = _ColumnIndex(column)
+        if index.nbytes > self.memory_budget:
+            return None
+        with self._lock:
+            self._indexes[column_name] = index
+            used = sum(cached.nbytes for cached in self._indexes.values())
+            while used > self.memory_budget:
+                _, evicted = self._indexes.popitem(last=False)
+                used -= evicted.nbytes
+            log.debug('indexed %s in %s bytes', column_name, index.nbytes)
+        return index
+
+    def _matches(self, column_name: Text, operator: Text, value: Any) -> numpy.ndarray:
+        """Return the ascending row positions matching one predicate."""
+        # Comparing with a missing value depends on the dtype, so scan.
+        missing_value = operator in ('eq', 'neq') and _is_missing(value)
+        index = None if missing_value else self._index(column_name)
+        if index is None:
+            mask = _predicate_mask(self._data_frame[column_name], operator, value)
+            return numpy.flatnonzero(numpy.broadcast_to(mask, len(self._data_frame)))
+        positions = index.lookup('isin' if operator in ('isin', 'not_in') else 'eq', value)
+        missing = index.missing
+        if missing.size:
+            kept = _predicate_mask(self._data_frame[column_name].iloc[missing], operator, value)
+            missing = missing[numpy.broadcast_to(kept, missing.shape)]
+        if operator in ('neq', 'not_in'):
+            mask = numpy.ones(len(self._data_frame), dtype=bool)
+            mask[positions] = False
+            mask[index.missing] = False
+            mask[missing] = True
+            return numpy.flatnonzero(mask)
+        return numpy.union1d(positions, missing) if missing.size else positions
+
+    def filter(self, predicates: Sequence[Tuple[Text, Text, Any]],
+               columns: List = None) -> pandas.DataFrame:
+        """Filter the frame by predicates, see filter_data_by_predicates.
+
+        Args:
+            predicates(Sequence): (column_name, operator, value) tuples
+                where operator is one of eq, neq, isin or not_in.
+            columns(List): Optional. The columns kept in the result.
+
+        Raises:
+            ValueError - When an operator is not supported.
+
+        Returns:
+            A tabular representation of the data filtered.
+
+        """
+        rows = None
+        for column_name, operator, value in predicates:
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"operator must be one of {FILTER_OPERATORS}")
+            matches = self._matches(column_name, operator, value)
+            rows = matches if rows is None else numpy.intersect1d(rows, matches,
+                                                                  assume_unique=True)
+            if not rows.size:
+                break
+        data_frame = self._data_frame if columns is None else self._data_frame[columns]
+        return data_frame if rows is None else data_frame.iloc[rows]
+
+    def push_filter(self, operator: Text, column_name: Text, value: Any) -> pandas.DataFrame:
+        """Answer one filter helper from the column index."""
+        return self.filter([(column_name, operator, value)])
+
+    def push_projection(self, columns: List) -> pandas.DataFrame:
+        """Answer filter_data_by_columns."""
+        return self._data_frame[columns]
+
+
+def filter_data_frame_chunks(data_frame_chunks: Iterable[pandas.DataFrame],
+                             filters: List[Callable[[pandas.DataFrame], pandas.DataFrame]],
+                             columns: List = None) -> Iterator[pandas.DataFrame]:
+    """Filter a stream of DataFrame chunks.
+
+    This function applies the filters, in order, to every chunk and
+    then projects the chunk to the supplied columns parameter. Only one
+    chunk is held at a time so the pass runs in constant memory. Use
+    functools.partial to bind the arguments of the filter helpers in
+    this module, e.g.
+    partial(filter_data_where_column_eq_value, column_name='a', filter_value=1).
+
+    Args:
+        data_frame_chunks(Iterable): The DataFrame chunks being
+            filtered, e.g. from database.stream_*_server.
+        filters(List): Callables taking and returning a DataFrame.
+        columns(List): Optional. The columns kept in every chunk.
+
+    Yields:
+        A tabular representation of each filtered chunk that still
+        has rows.
+
+    """
+    for data_frame in data_frame_chunks:
+        for filter_function in filters:
+            data_frame = filter_function(data_frame)
+        if columns is not None:
+            data_frame = filter_data_by_columns(data_frame, columns)
+        if not data_frame.empty:
+            yield data_frame
+
+
+AGGREGATE_FUNCTIONS = ('sum', 'count', 'mean', 'min', 'max', 'distinct_count')
+
+
+def _materialize(data_frame: Any) -> pandas.DataFrame:
+    """Return the DataFrame behind an IndexedFrame or a LazyQuery."""
+    if isinstance(data_frame, IndexedFrame):
+        return data_frame.frame
+    if _is_lazy(data_frame):
+        return data_frame.collect()
+    return data_frame
+
+
+def _group_codes(data_frame: pandas.DataFrame,
+                 key_columns: List) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return a group code per row and the first row of every group.
+
+    Keys are factorized by hashing, so groups are numbered in order of
+    first appearance without sorting. Rows with a missing key get -1
+    and belong to no group, like groupby(dropna=True).
+    """
+    codes = None
+    valid = None
+    size = 1
+    for column_name in key_columns:
+        key_codes, uniques = pandas.factorize(data_frame[column_name])
+        key_codes = key_codes.astype(numpy.int64, copy=False)
+        if codes is None:
+            codes, valid, size = key_codes, key_codes >= 0, len(uniques)
+            continue
+        valid &= key_codes >= 0
+        if size * max(len(uniques), 1) >= 2 ** 62:
+            codes, _ = pandas.factorize(codes)
+            size = int(codes.max()) + 1 if codes.size else 0
+        codes = codes * len(uniques) + key_codes
+        size *= len(uniques)
+    if len(key_columns) > 1:
+        combined = codes
+        codes = numpy.full(len(combined), -1, dtype=numpy.int64)
+        codes[valid] = pandas.factorize(combined[valid])[0]
+    running = numpy.maximum.accumulate(codes) if codes.size else codes
+    first_rows = numpy.flatnonzero(numpy.diff(running, prepend=-1) > 0)
+    return codes, first_rows
+
+
+def _numeric_values(column: pandas.Series) -> Any:
+    """Return column as a NumPy array with NaN for missing values.
+
+    Returns None for columns that are not numeric or boolean.
+    """
+    if not (pandas.api.types.is_numeric_dtype(column.dtype)
+            or pandas.api.types.is_bool_dtype(column.dtype)):
+        return None
+    if isinstance(column.dtype, numpy.dtype):
+        return column.to_numpy()
+    if column.hasnans:
+        return column.to_numpy(dtype=numpy.float64, na_value=numpy.nan)
+    return column.to_numpy(dtype=column.dtype.numpy_dtype)
+
+
+def _distinct_counts(column: pandas.Series, codes: numpy.ndarray, groups: int) -> numpy.ndarray:
+    """Count the distinct non missing values of column per group code."""
+    value_codes, uniques = pandas.factorize(column)
+    present = value_codes >= 0
+    width = max(len(uniques), 1)
+    pairs = codes[present] * width + value_codes[present]
+    if groups * width <= 4 * len(pairs) + 1024:
+        seen = numpy.zeros(groups * width, dtype=bool)
+        seen[pairs] = True
+        return seen.reshape(groups, width).sum(axis=1)
+    return numpy.bincount(pandas.unique(pairs) // width, minlength=groups)
+
+
+def _reduce(values: numpy.ndarray, codes: numpy.ndarray, groups: int,
+            functions: List[Text]) -> Dict[Text, numpy.ndarray]:
+    """Reduce numeric values per group code with NumPy, skipping NaN."""
+    results = {}
+    present = ~numpy.isnan(values) if values.dtype.kind == 'f' else None
+    if present is not None and not present.all():
+        values, codes = values[present], codes[present]
+    if values.dtype.kind == 'b' and {'sum', 'mean'} & set(functions):
+        values = values.astype(numpy.int64)
+    counts = numpy.bincount(codes, minlength=groups)
+    if {'sum', 'mean'} & set(functions):
+        if values.dtype.kind == 'f':
+            sums = numpy.bincount(codes, weights=values, minlength=groups)
+        else:
+            sums = numpy.zeros(groups, dtype=numpy.int64)
+            numpy.add.at(sums, codes, values.astype(numpy.int64, copy=False))
+        results['sum'] = sums
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            results['mean'] = sums / counts
+    results['count'] = counts
+    for function, reduction in (('min', numpy.fmin), ('max', numpy.fmax)):
+        if function not in functions:
+            continue
+        if values.dtype.kind == 'f':
+            initial = numpy.inf if function == 'min' else -numpy.inf
+        elif values.dtype.kind == 'b':
+            initial = function == 'min'
+        else:
+            limits = numpy.iinfo(values.dtype)
+            initial = limits.max if function == 'min' else limits.min
+        result = numpy.full(groups, initial, dtype=values.dtype)
+        reduction.at(result, codes, values)
+        if values.dtype.kind == 'f':
+            result[counts == 0] = numpy.nan
+        results[function] = result
+    return results
+
+
+def _aggregate_column(column: pandas.Series, codes: numpy.ndarray, groups: int,
+                      functions: List[Text]) -> Dict[Text, Any]:
+    """Return one aggregate per group for every function.
+
+    column and codes only hold the rows that have a group.
+    """
+    results = {}
+    if 'distinct_count' in functions:
+        results['distinct_count'] = _distinct_counts(column, codes, groups)
+    reduced = [function for function in functions if function != 'distinct_count']
+    if not reduced:
+        return results
+    values = _numeric_values(column)
+    if values is not None:
+        results.update(_reduce(values, codes, groups, reduced))
+        return results
+    if 'count' in reduced:
+        results['count'] = numpy.bincount(codes[column.notna().to_numpy()], minlength=groups)
+    for function in reduced:
+        if function != 'count':
+            grouped = column.groupby(codes, sort=True).agg(function)
+            results[function] = grouped.reindex(range(groups)).to_numpy()
+    return results
+
+
+@_traced
+def aggregate_data_by_columns(data_frame: pandas.DataFrame, key_columns: List,
+                              aggregations: Dict[Text, Sequence[Text]]) -> pandas.DataFrame:
+    """Aggregate data_frame per group of key_columns.
+
+    This function computes the same values as
+    data_frame.groupby(key_columns, sort=False).agg(aggregations), but
+    the keys are factorized once and every aggregate is a single NumPy
+    reduction over the group codes, which is much faster for high
+    cardinality string keys. Groups are in order of first appearance
+    and rows with a missing key are dropped. sum, mean, min and max
+    skip missing values; count counts non missing values.
+
+    Args:
+        data_frame(pandas.DataFrame): The DataFrame object being
+            aggregated. An IndexedFrame or a LazyQuery is materialized
+            first.
+        key_columns(List): The column or columns that form the groups.
+        aggregations(Dict): Maps a column name to the functions
+            computed for it, any of sum, count, mean, min, max and
+            distinct_count.
+
+    Raises:
+        ValueError - When a function is not supported.
+
+    Returns:
+        A tabular representation of the groups: the key columns
+        followed by one <column>_<function> column per aggregate.
+
+    """
+    if isinstance(key_columns, str):
+        key_columns = [key_columns]
+    for functions in aggregations.values():
+        for function in ([functions] if isinstance(functions, str) else functions):
+            if function not in AGGREGATE_FUNCTIONS:
+                raise ValueError(f"function must be one of {AGGREGATE_FUNCTIONS}")
+    data_frame = _materialize(data_frame)
+    codes, first_rows = _group_codes(data_frame, key_columns)
+    result = data_frame[key_columns].iloc[first_rows].reset_index(drop=True)
+    grouped = codes >= 0
+    rows = slice(None) if grouped.all() else grouped
+    codes = codes[rows]
+    for column_name, functions in aggregations.items():
+        functions = [functions] if isinstance(functions, str) else list(functions)
+        column = data_frame[column_name]
+        aggregates = _aggregate_column(column if isinstance(rows, slice) else column[rows],
+                                       codes, len(first_rows), functions)
+        for function in functions:
+            result[f"{column_name}_{function}"] = aggregates[function]
+    return result
+
+
+TOP_N_SELECTION_LIMIT = 8
+
+
+def _select_smallest(values: numpy.ndarray, codes: numpy.ndarray,
+                     top_n: int) -> numpy.ndarray:
+    """Return the positions of the top_n smallest values per group code.
+
+    Every round takes the minimum of each group with one unbuffered
+    reduction and removes its first row, so small top_n cost a few
+    linear passes instead of a sort. The positions are ordered by
+    group, then rank.
+    """
+    groups = int(codes.max()) + 1 if codes.size else 0
+    initial = (numpy.inf if values.dtype.kind == 'f' else True if values.dtype.kind == 'b'
+               else numpy.iinfo(values.dtype).max)
+    group_codes = codes
+    positions = numpy.arange(len(values))
+    selected = []
+    for _ in range(top_n):
+        if not values.size:
+            break
+        smallest = numpy.full(groups, initial, dtype=values.dtype)
+        numpy.fmin.at(smallest, codes, values)
+        ties = values == smallest[codes]
+        first = numpy.full(groups, len(values))
+        numpy.minimum.at(first, codes[ties], numpy.flatnonzero(ties))
+        first = first[first < len(values)]
+        selected.append(positions[first])
+        kept = numpy.ones(len(values), dtype=bool)
+        kept[first] = False
+        values, codes, positions = values[kept], codes[kept], positions[kept]
+    if not selected:
+        return positions[:0]
+    # Round r picks at most one row per group, so a stable sort by group
+    # keeps the ranks in order.
+    chosen = numpy.concatenate(selected)
+    return chosen[numpy.argsort(group_codes[chosen], kind='stable')]
+
+
+@_traced
+def top_n_data_by_column(data_frame: pandas.DataFrame, key_columns: List, column_name: Text,
+                         top_n: int, ascending: bool = False) -> pandas.DataFrame:
+    """Filter data_frame to the top_n rows of every group by column_name.
+
+    This function keeps, for every group of key_columns, the top_n
+    rows with the largest values of column_name (the smallest when
+    ascending is True), like groupby(key_columns).head(top_n) after a
+    stable sort. Rows with a missing key or a missing value are
+    dropped. The rows are returned group by group, in order of first
+    appearance of the group, and ranked within the group.
+
+    Args:
+        data_frame(pandas.DataFrame): The DataFrame object being
+            filtered. An IndexedFrame or a LazyQuery is materialized
+            first.
+        key_columns(List): The column or columns that form the groups.
+        column_name(Text): The column that ranks the rows.
+        top_n(int): The rows kept per group.
+        ascending(bool): Optional. Keep the smallest values instead.
+
+    Raises:
+        ValueError - When top_n is negative.
+
+    Returns:
+        A tabular representation of the data filtered.
+
+    """
+    if top_n < 0:
+        raise ValueError('top_n must not be negative')
+    if isinstance(key_columns, str):
+        key_columns = [key_columns]
+    data_frame = _materialize(data_frame)
+    codes, _ = _group_codes(data_frame, key_columns)
+    column = data_frame[column_name]
+    rows = numpy.flatnonzero((codes >= 0) & column.notna().to_numpy())
+    values = _numeric_values(column)
+    if values is None:
+        values = pandas.factorize(column, sort=True)[0]
+    values = values[rows]
+    if not ascending:
+        values = -values if values.dtype.kind == 'f' else ~values
+    if top_n <= TOP_N_SELECTION_LIMIT:
+        return data_frame.iloc[rows[_select_smallest(values, codes[rows], top_n)]]
+    # lexsort is stable, so ties keep their order of appearance.
+    order = numpy.lexsort((values, codes[rows]))
+    rows, grouped = rows[order], codes[rows][order]
+    starts = numpy.flatnonzero(numpy.diff(grouped, prepend=-1) != 0)
+    rank = numpy.arange(len(rows)) - numpy.repeat(starts, numpy.diff(numpy.append(starts,
+                                                                                  len(rows))))
+    return data_frame.iloc[rows[rank < top_n]]
+
+
+if os.getenv('FILTER_TRACING'):
+    enable_filter_tracing()
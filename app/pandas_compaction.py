@@ -0,0 +1,153 @@
+#! /bin/env python
+"""
+Description: This module converts DataFrames to their smallest lossless dtypes.
+
+Title: pandas_compaction.py
+
+Author: theStygianArchitect
+"""
+import sys
+
+try:
+    import numpy
+    import pandas
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages')
+    sys.exit(1)
+
+try:
+    from .logger import set_up_stream_logging
+except ImportError:
+    from app.logger import set_up_stream_logging
+
+
+log = set_up_stream_logging()  # pylint: disable=C0103
+
+DEFAULT_CATEGORY_RATIO = 0.5
+
+
+def _smallest_integer_dtype(minimum: int, maximum: int) -> numpy.dtype:
+    """Return the narrowest signed integer dtype holding minimum and maximum."""
+    for dtype in (numpy.int8, numpy.int16, numpy.int32):
+        limits = numpy.iinfo(dtype)
+        if limits.min <= minimum and maximum <= limits.max:
+            return numpy.dtype(dtype)
+    return numpy.dtype(numpy.int64)
+
+
+def _compact_integers(column: pandas.Series) -> pandas.Series:
+    """Return an integer column in its narrowest integer dtype."""
+    if column.isna().all():
+        return column
+    target = _smallest_integer_dtype(int(column.min()), int(column.max()))
+    if target.itemsize >= column.dtype.itemsize:
+        return column
+    if isinstance(column.dtype, numpy.dtype):
+        return column.astype(target)
+    return column.astype(pandas.api.types.pandas_dtype(target.name.capitalize()))
+
+
+def _compact_floats(column: pandas.Series, nullable: bool,
+                    narrow_floats: bool) -> pandas.Series:
+    """Return a NumPy float column as integers or float32 when lossless."""
+    values = column.to_numpy()
+    present = values[~numpy.isnan(values)]
+    if (present.size and numpy.isfinite(present).all()
+            and (present == numpy.round(present)).all()):
+        target = _smallest_integer_dtype(int(present.min()), int(present.max()))
+        if present.size == values.size:
+            return column.astype(target)
+        if nullable:
+            return column.astype(pandas.api.types.pandas_dtype(target.name.capitalize()))
+    if narrow_floats and column.dtype.itemsize > 4:
+        narrowed = values.astype(numpy.float32)
+        if numpy.array_equal(narrowed.astype(column.dtype), values, equal_nan=True):
+            return pandas.Series(narrowed, index=column.index, name=column.name)
+    return column
+
+
+def _compact_objects(column: pandas.Series, category_ratio: float,
+                     nullable: bool) -> pandas.Series:
+    """Return an object or string column as bool, integer or category."""
+    inferred = pandas.api.types.infer_dtype(column, skipna=True)
+    missing = bool(column.isna().any())
+    if inferred == 'boolean' and (nullable or not missing):
+        return column.astype('boolean' if missing else bool)
+    if inferred == 'integer' and (nullable or not missing):
+        return _compact_integers(column.astype('Int64' if missing else numpy.int64))
+    if inferred in ('string', 'empty') and column.nunique() <= category_ratio * len(column):
+        return column.astype('category')
+    return column
+
+
+def _compact_column(column: pandas.Series, category_ratio: float, nullable: bool,
+                    narrow_floats: bool) -> pandas.Series:
+    """Return column in the smallest lossless dtype, or column itself."""
+    dtype = column.dtype
+    if (column.empty or isinstance(dtype, pandas.CategoricalDtype)
+            or pandas.api.types.is_bool_dtype(dtype)):
+        return column
+    if pandas.api.types.is_integer_dtype(dtype):
+        return _compact_integers(column)
+    if pandas.api.types.is_float_dtype(dtype) and isinstance(dtype, numpy.dtype):
+        return _compact_floats(column, nullable, narrow_floats)
+    if dtype == object or pandas.api.types.is_string_dtype(dtype):
+        return _compact_objects(column, category_ratio, nullable)
+    return column
+
+
+def compact_frame(data_frame: pandas.DataFrame,
+                  category_ratio: float = DEFAULT_CATEGORY_RATIO,
+                  nullable: bool = False, narrow_floats: bool = False) -> pandas.DataFrame:
+    """Convert data_frame to the smallest lossless dtypes.
+
+    This function downcasts integers to the narrowest integer dtype,
+    converts floats holding only whole numbers to integers, turns
+    string columns whose distinct values are at most category_ratio of
+    the rows into categoricals, and object columns of booleans or
+    integers into bool and integer dtypes. Values and missing values
+    are unchanged, so the filter helpers return the same rows, faster
+    and with less memory.
+
+    Columns with missing values only become nullable Int and boolean
+    types when nullable is set. Comparisons with their pandas.NA are
+    missing rather than False, so neq and not_in drop those rows.
+
+    Other floats only become float32, when no value changes, with
+    narrow_floats set. Filter values are then compared in float32 too,
+    so e.g. eq 0.1 also matches a stored float32(0.1).
+
+    The bytes saved per column are logged and stored in
+    attrs['bytes_saved'] of the result.
+
+    Args:
+        data_frame(pandas.DataFrame): The DataFrame object being
+            compacted.
+        category_ratio(float): Optional. The largest share of distinct
+            values for a string column to become a categorical.
+        nullable(bool): Optional. Convert columns with missing values
+            to nullable Int and boolean types.
+        narrow_floats(bool): Optional. Convert float64 columns to
+            float32 when no value changes.
+
+    Returns:
+        A tabular representation of the data in compact dtypes.
+
+    """
+    before = data_frame.memory_usage(index=False, deep=True)
+    columns = [data_frame.iloc[:, position] for position in range(data_frame.shape[1])]
+    compacted = [_compact_column(column, category_ratio, nullable, narrow_floats)
+                 for column in columns]
+    if any(new is not old for new, old in zip(compacted, columns)):
+        result = pandas.DataFrame(dict(enumerate(compacted)), copy=False)
+        result.columns = data_frame.columns
+        result.attrs.update(data_frame.attrs)
+    else:
+        result = data_frame.copy(deep=False)
+    after = result.memory_usage(index=False, deep=True)
+    bytes_saved = {column_name: int(before.iloc[position] - after.iloc[position])
+                   for position, column_name in enumerate(data_frame.columns)}
+    result.attrs['bytes_saved'] = bytes_saved
+    log.debug('bytes saved: %s', sum(bytes_saved.values()))
+    return result
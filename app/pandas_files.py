@@ -0,0 +1,273 @@
+#! /bin/env python
+"""
+Description: This module streams predicate filters over files larger than memory.
+
+Title: pandas_files.py
+
+Author: theStygianArchitect
+"""
+import os
+import sys
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Text
+from typing import Tuple
+from typing import Union
+
+try:
+    import pandas
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages')
+    sys.exit(1)
+
+try:
+    import pyarrow
+    from pyarrow import parquet as arrow_parquet
+except ModuleNotFoundError:
+    pyarrow = None  # pylint: disable=C0103
+    arrow_parquet = None  # pylint: disable=C0103
+
+try:
+    from .logger import set_up_stream_logging
+    from .pandas_aggregation_techniques import FILTER_OPERATORS
+    from .pandas_aggregation_techniques import _is_missing
+    from .pandas_aggregation_techniques import filter_data_by_predicates
+except ImportError:
+    from app.logger import set_up_stream_logging
+    from app.pandas_aggregation_techniques import FILTER_OPERATORS
+    from app.pandas_aggregation_techniques import _is_missing
+    from app.pandas_aggregation_techniques import filter_data_by_predicates
+
+
+log = set_up_stream_logging()  # pylint: disable=C0103
+
+DEFAULT_FILE_CHUNK_ROWS = 100000
+
+
+def _needed_columns(predicates: Sequence[Tuple[Text, Text, Any]], columns: List) -> Any:
+    """Return the columns a file must be read with, or None for all."""
+    if columns is None:
+        return None
+    needed = list(columns)
+    needed.extend(column_name for column_name, _, _ in predicates
+                  if column_name not in needed)
+    return needed
+
+
+def _row_group_may_match(statistics: Any, operator: Text, value: Any) -> bool:
+    """Return False when Parquet statistics prove no row can match.
+
+    Missing or incomparable statistics never skip a row group.
+    """
+    if statistics is None or not statistics.has_min_max:
+        return True
+    nulls = statistics.null_count if statistics.has_null_count else 1
+    try:
+        if operator == 'eq':
+            return not _is_missing(value) and statistics.min <= value <= statistics.max
+        if operator == 'isin':
+            return ((nulls > 0 and any(_is_missing(item) for item in value))
+                    or any(statistics.min <= item <= statistics.max
+                           for item in value if not _is_missing(item)))
+        if operator == 'neq':
+            return nulls > 0 or not statistics.min == statistics.max == value
+        return nulls > 0 or statistics.min != statistics.max or statistics.min not in value
+    except TypeError:
+        return True
+
+
+def _parquet_chunks(path: Text, predicates: Sequence[Tuple[Text, Text, Any]],
+                    columns: Any, chunk_rows: int) -> Iterator[pandas.DataFrame]:
+    """Read the row groups of a Parquet file that may hold matching rows."""
+    if arrow_parquet is None:
+        raise ValueError('pyarrow is required to stream Parquet files')
+    parquet_file = arrow_parquet.ParquetFile(path)
+    metadata = parquet_file.metadata
+    positions = {name: index for index, name in enumerate(parquet_file.schema_arrow.names)}
+    for row_group in range(metadata.num_row_groups):
+        group = metadata.row_group(row_group)
+        if not all(_row_group_may_match(group.column(positions[column_name]).statistics,
+                                        operator, value)
+                   for column_name, operator, value in predicates
+                   if column_name in positions):
+            log.debug('skipped row group %s', row_group)
+            continue
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, row_groups=[row_group],
+                                               columns=columns):
+            yield batch.to_pandas()
+
+
+def _file_chunks(source: Any, predicates: Sequence[Tuple[Text, Text, Any]], columns: Any,
+                 chunk_rows: int, dtype: Any = None) -> Iterable[pandas.DataFrame]:
+    """Return the chunks of a CSV or Parquet path, or source itself."""
+    if not isinstance(source, (str, os.PathLike)):
+        return source
+    path = os.fspath(source)
+    if path.endswith(('.parquet', '.parq', '.pq')):
+        return _parquet_chunks(path, predicates, columns, chunk_rows)
+    return pandas.read_csv(path, usecols=columns, chunksize=chunk_rows, dtype=dtype)
+
+
+def filter_data_file_chunks(source: Union[Text, os.PathLike, Iterable[pandas.DataFrame]],
+                            predicates: Sequence[Tuple[Text, Text, Any]], columns: List = None,
+                            chunk_rows: int = DEFAULT_FILE_CHUNK_ROWS, dtype: Any = None
+                            ) -> Iterator[pandas.DataFrame]:
+    """Filter a file larger than memory chunk by chunk.
+
+    This function applies filter_data_by_predicates to one chunk at a
+    time, so peak memory is bounded by chunk_rows rather than by the
+    size of the file. CSV files are read with usecols limited to the
+    columns and predicate columns. For Parquet files, row groups whose
+    statistics rule out every predicate's value are not read, and only
+    the needed columns are decoded.
+
+    Every CSV chunk infers its own dtypes, e.g. a column missing from
+    every row of a chunk is float64 there. Pass dtype to read every
+    chunk alike.
+
+    Args:
+        source(Text): A .csv or .parquet path, or an iterable of
+            DataFrame chunks, e.g. from database.stream_*.
+        predicates(Sequence): (column_name, operator, value) tuples
+            where operator is one of eq, neq, isin or not_in.
+        columns(List): Optional. The columns kept in every chunk.
+        chunk_rows(int): Optional. The rows read per chunk.
+        dtype(Any): Optional. The dtype, or dtype per column, CSV
+            files are read with.
+
+    Raises:
+        ValueError - When an operator is not supported or a Parquet
+            file is given without pyarrow installed.
+
+    Yields:
+        A tabular representation of each filtered chunk that still
+        has rows.
+
+    """
+    log.debug('source: %s', source)
+    for _, operator, _ in predicates:
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"operator must be one of {FILTER_OPERATORS}")
+    for data_frame in _file_chunks(source, predicates, _needed_columns(predicates, columns),
+                                   chunk_rows, dtype):
+        data_frame = filter_data_by_predicates(data_frame, predicates, columns)
+        if not data_frame.empty:
+            yield data_frame
+
+
+_ARROW_TYPES = {'integer': 'int64', 'floating': 'float64', 'mixed-integer-float': 'float64',
+                'boolean': 'bool', 'string': 'string'}
+
+
+def _csv_arrow_types(path: Text, columns: Any, chunk_rows: int, dtype: Any) -> Dict:
+    """Return the Arrow type of every column that holds for all CSV chunks.
+
+    Integers and floats widen to float64 and any other mix to string;
+    columns that are missing everywhere are string.
+    """
+    types: Dict[Any, Optional[Text]] = {}
+    for data_frame in pandas.read_csv(path, usecols=columns, chunksize=chunk_rows, dtype=dtype):
+        for column_name, column in data_frame.items():
+            if column.isna().all():
+                types.setdefault(column_name, None)
+                continue
+            inferred = pandas.api.types.infer_dtype(column, skipna=True)
+            arrow_type = _ARROW_TYPES.get(inferred, 'string')
+            previous = types.get(column_name)
+            if previous is not None and previous != arrow_type:
+                numbers = {previous, arrow_type} <= {'int64', 'float64'}
+                arrow_type = 'float64' if numbers else 'string'
+            types[column_name] = arrow_type
+    return {column_name: pyarrow.type_for_alias(arrow_type or 'string')
+            for column_name, arrow_type in types.items()}
+
+
+def _arrow_table(data_frame: pandas.DataFrame, schema: Any) -> Any:
+    """Convert data_frame to schema, column by column."""
+    table = pyarrow.Table.from_pandas(data_frame, preserve_index=False)
+    arrays = []
+    for field in schema:
+        column = table.column(field.name)
+        if column.null_count == len(column):
+            arrays.append(pyarrow.nulls(len(column), field.type))
+        else:
+            arrays.append(column.cast(field.type))
+    return pyarrow.Table.from_arrays(arrays, schema=schema)
+
+
+def write_filtered_data_file(source: Union[Text, os.PathLike, Iterable[pandas.DataFrame]],
+                             sink: Union[Text, os.PathLike],
+                             predicates: Sequence[Tuple[Text, Text, Any]], columns: List = None,
+                             **options: Any) -> int:
+    """Stream the filtered rows of source into the file sink.
+
+    This function writes the chunks of filter_data_file_chunks as they
+    are produced, to a Parquet file when sink ends in .parquet and to
+    a CSV file otherwise, so the result never has to fit in memory.
+
+    A Parquet file has one schema while every CSV chunk infers its own
+    dtypes, so a CSV source written to Parquet is first read once to
+    find the type of each column across all chunks; the types of the
+    first chunk are used for other sources. Every chunk is converted
+    to that schema.
+
+    Args:
+        source(Text): A .csv or .parquet path, or an iterable of
+            DataFrame chunks.
+        sink(Text): The path of the file written.
+        predicates(Sequence): (column_name, operator, value) tuples
+            where operator is one of eq, neq, isin or not_in.
+        columns(List): Optional. The columns written.
+        options(Any): Optional. chunk_rows and dtype of
+            filter_data_file_chunks.
+
+    Raises:
+        ValueError - When an operator is not supported or a Parquet
+            file is used without pyarrow installed.
+
+    Returns:
+        The number of rows written.
+
+    """
+    sink = os.fspath(sink)
+    parquet = sink.endswith(('.parquet', '.parq', '.pq'))
+    if parquet and pyarrow is None:
+        raise ValueError('pyarrow is required to write Parquet files')
+    arrow_types = {}
+    if parquet and isinstance(source, (str, os.PathLike)) and \
+            not os.fspath(source).endswith(('.parquet', '.parq', '.pq')):
+        arrow_types = _csv_arrow_types(os.fspath(source), columns,
+                                       options.get('chunk_rows', DEFAULT_FILE_CHUNK_ROWS),
+                                       options.get('dtype'))
+    rows = 0
+    writer = None
+    try:
+        for data_frame in filter_data_file_chunks(source, predicates, columns, **options):
+            if parquet:
+                if writer is None:
+                    schema = pyarrow.Table.from_pandas(data_frame, preserve_index=False).schema
+                    schema = pyarrow.schema([
+                        (field.name, arrow_types.get(field.name, field.type))
+                        for field in schema])
+                    writer = arrow_parquet.ParquetWriter(sink, schema)
+                writer.write_table(_arrow_table(data_frame, writer.schema))
+            else:
+                data_frame.to_csv(sink, mode='a' if rows else 'w', header=not rows, index=False)
+            rows += len(data_frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    if not rows:
+        empty = pandas.DataFrame(columns=columns or [])
+        if parquet:
+            empty.to_parquet(sink, index=False)
+        else:
+            empty.to_csv(sink, index=False)
+    log.debug('rows written: %s', rows)
+    return rows
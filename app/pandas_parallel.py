@@ -0,0 +1,324 @@
+#! /bin/env python
+"""
+Description: This module runs DataFrame techniques on row partitions in parallel.
+
+Title: pandas_parallel.py
+
+Author: theStygianArchitect
+"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import Text
+from typing import Tuple
+
+try:
+    import numpy
+    import pandas
+except ModuleNotFoundError as module_not_found_error:
+    print(module_not_found_error)
+    print('Please install required packages')
+    sys.exit(1)
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None  # pylint: disable=C0103
+
+try:
+    from .logger import set_up_stream_logging
+    from .pandas_aggregation_techniques import AGGREGATE_FUNCTIONS
+    from .pandas_aggregation_techniques import _materialize
+    from .pandas_aggregation_techniques import aggregate_data_by_columns
+    from .pandas_aggregation_techniques import filter_data_by_predicates
+except ImportError:
+    from app.logger import set_up_stream_logging
+    from app.pandas_aggregation_techniques import AGGREGATE_FUNCTIONS
+    from app.pandas_aggregation_techniques import _materialize
+    from app.pandas_aggregation_techniques import aggregate_data_by_columns
+    from app.pandas_aggregation_techniques import filter_data_by_predicates
+
+
+log = set_up_stream_logging()  # pylint: disable=C0103
+
+DEFAULT_PARTITION_ROWS = 1000000
+PARALLEL_MIN_ROWS = 2000000
+
+_WORKER_FRAME = None
+_WORKER_MEMORY = None
+
+
+class _SharedFrame:  # pylint: disable=R0903
+    """The column buffers of a DataFrame copied once into shared memory.
+
+    NumPy columns are stored as they are; other columns are stored as
+    factorized codes and their uniques travel once per worker. Workers
+    attach the buffers without copying them, so partitions are never
+    pickled.
+    """
+
+    def __init__(self, data_frame: pandas.DataFrame):
+        """Initialize the shared memory block holding data_frame's columns."""
+        arrays = []
+        self.layout = []
+        offset = 0
+        for position in range(data_frame.shape[1]):
+            column = data_frame.iloc[:, position]
+            uniques = None
+            if isinstance(column.dtype, numpy.dtype) and column.dtype.kind in 'biufcmM':
+                values = numpy.ascontiguousarray(column.to_numpy())
+            else:
+                values, uniques = pandas.factorize(column)
+                if isinstance(uniques, pandas.Index):
+                    uniques = uniques.array
+            offset = -(-offset // 8) * 8
+            arrays.append((offset, values))
+            self.layout.append((values.dtype.str, offset, uniques, column.dtype))
+            offset += values.nbytes
+        self.memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for offset, values in arrays:
+            numpy.ndarray(values.shape, values.dtype, buffer=self.memory.buf,
+                          offset=offset)[:] = values
+        self.specification = (self.memory.name, len(data_frame), list(data_frame.columns),
+                              self.layout)
+
+    def close(self):
+        """Release and remove the shared memory block."""
+        self.memory.close()
+        self.memory.unlink()
+
+
+def _attach_shared_frame(specification: Tuple):
+    """Pool initializer rebuilding the shared DataFrame in a worker."""
+    global _WORKER_FRAME, _WORKER_MEMORY  # pylint: disable=W0603
+    name, rows, columns, layout = specification
+    _WORKER_MEMORY = shared_memory.SharedMemory(name=name)
+    series = {}
+    for position, (dtype, offset, uniques, column_dtype) in enumerate(layout):
+        values = numpy.ndarray((rows,), numpy.dtype(dtype), buffer=_WORKER_MEMORY.buf,
+                               offset=offset)
+        if uniques is not None:
+            values = pandas.api.extensions.take(uniques, values, allow_fill=True)
+        series[position] = pandas.Series(values, dtype=column_dtype, copy=False)
+    _WORKER_FRAME = pandas.DataFrame(series, copy=False)
+    _WORKER_FRAME.columns = columns
+
+
+def _attach_pickled_frame(data_frame: pandas.DataFrame):
+    """Pool initializer keeping a pickled DataFrame in a worker."""
+    global _WORKER_FRAME  # pylint: disable=W0603
+    _WORKER_FRAME = data_frame
+
+
+def _run_partition(task: Tuple, start: int, stop: int) -> Any:
+    """Run a task on rows start to stop of the worker's DataFrame.
+
+    task is (function, args, kwargs, rows_only). With rows_only the
+    filtered positions and columns are returned instead of the
+    filtered DataFrame.
+    """
+    function, args, kwargs, rows_only = task
+    result = function(_WORKER_FRAME.iloc[start:stop], *args, **kwargs)
+    if rows_only:
+        return result.index.to_numpy(), list(result.columns)
+    return result
+
+
+def _run_in_pool(data_frame: pandas.DataFrame, task: Tuple,
+                 partitions: List[Tuple[int, int]], workers: int) -> List[Any]:
+    """Run task on every partition of data_frame in a process pool.
+
+    Returns:
+        The results of _run_partition in partition order.
+
+    """
+    if shared_memory is None:
+        shared_frame = None
+        initializer = _attach_pickled_frame
+        initargs = (data_frame.reset_index(drop=True),)
+    else:
+        shared_frame = _SharedFrame(data_frame)
+        initializer, initargs = _attach_shared_frame, (shared_frame.specification,)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(partitions)),
+                                 initializer=initializer, initargs=initargs) as executor:
+            futures = [executor.submit(_run_partition, task, start, stop)
+                       for start, stop in partitions]
+            return [future.result() for future in futures]
+    finally:
+        if shared_frame is not None:
+            shared_frame.close()
+
+
+def run_partitioned(data_frame: pandas.DataFrame, function: Callable, *args: Any,
+                    combine: Callable[[List[Any]], Any] = None, **kwargs: Any) -> Any:
+    """Run function on row partitions of data_frame in a process pool.
+
+    The columns of data_frame are copied once into shared memory and
+    every worker process attaches them, so the partitions themselves
+    are not pickled. Without multiprocessing.shared_memory (Python
+    3.7) data_frame is pickled once per worker instead.
+    function(partition, *args, **kwargs) must be a module level
+    function. Without combine it must be a filter: the
+    rows and columns it keeps are gathered from data_frame in row
+    order, so the result keeps the dtypes and index of data_frame.
+    With combine, the partition results are passed to it in row order
+    and its return value is returned.
+
+    A data_frame shorter than min_rows, a single partition or a single
+    worker runs function serially in this process.
+
+    Args:
+        data_frame(pandas.DataFrame): The DataFrame object being
+            processed. An IndexedFrame or a LazyQuery is materialized
+            first.
+        function(Callable): The function run on every partition.
+        args(Any): Passed to function after the partition.
+        combine(Callable): Optional. Reduces the partition results.
+        kwargs(Any): Passed to function, except for workers(int), the
+            worker processes, os.cpu_count() by default,
+            partition_rows(int), the rows of every partition, and
+            min_rows(int), the rows below which the work runs serially.
+
+    Raises:
+        ValueError - When partition_rows is not positive.
+
+    Returns:
+        The filtered DataFrame, or the return value of combine.
+
+    """
+    workers = kwargs.pop('workers', None) or os.cpu_count() or 1
+    partition_rows = kwargs.pop('partition_rows', DEFAULT_PARTITION_ROWS)
+    min_rows = kwargs.pop('min_rows', PARALLEL_MIN_ROWS)
+    if partition_rows < 1:
+        raise ValueError('partition_rows must be positive')
+    data_frame = _materialize(data_frame)
+    bounds = list(range(0, len(data_frame), partition_rows)) + [len(data_frame)]
+    partitions = list(zip(bounds[:-1], bounds[1:]))
+    if len(data_frame) < min_rows or len(partitions) < 2 or workers < 2:
+        log.debug('running %s serially', getattr(function, '__name__', function))
+        result = function(data_frame, *args, **kwargs)
+        return result if combine is None else combine([result])
+
+    log.debug('running %s on %s partitions', getattr(function, '__name__', function),
+              len(partitions))
+    results = _run_in_pool(data_frame, (function, args, kwargs, combine is None),
+                           partitions, workers)
+    if combine is not None:
+        return combine(results)
+    rows = numpy.concatenate([positions for positions, _ in results])
+    return data_frame.iloc[rows, data_frame.columns.get_indexer_for(results[0][1])]
+
+
+def parallel_filter_data_by_predicates(data_frame: pandas.DataFrame,
+                                       predicates: Sequence[Tuple[Text, Text, Any]],
+                                       columns: List = None, **options: Any) -> pandas.DataFrame:
+    """Run filter_data_by_predicates on row partitions in parallel.
+
+    options are workers, partition_rows and min_rows of
+    run_partitioned.
+
+    Returns:
+        A tabular representation of the data filtered.
+
+    """
+    return run_partitioned(data_frame, filter_data_by_predicates, predicates, columns,
+                           **options)
+
+
+def _partial_functions(functions: Sequence[Text]) -> List[Text]:
+    """Return the per partition aggregates that combine into functions."""
+    partial_functions = []
+    for function in functions:
+        for needed in (('sum', 'count') if function == 'mean' else (function,)):
+            if needed != 'distinct_count' and needed not in partial_functions:
+                partial_functions.append(needed)
+    return partial_functions
+
+
+def _aggregate_partition(data_frame: pandas.DataFrame, key_columns: List,
+                         aggregations: Dict[Text, List[Text]]) -> Tuple:
+    """Aggregate one partition into combinable partial results.
+
+    Distinct counts cannot be added up, so the partition's distinct
+    (key, value) rows are returned for them instead.
+    """
+    totals = aggregate_data_by_columns(data_frame, key_columns,
+                                       {column_name: _partial_functions(functions)
+                                        for column_name, functions in aggregations.items()
+                                        if _partial_functions(functions)})
+    distinct = {column_name: data_frame[list(dict.fromkeys(key_columns + [column_name]))]
+                .drop_duplicates()
+                for column_name, functions in aggregations.items()
+                if 'distinct_count' in functions}
+    return totals, distinct
+
+
+def _combine_aggregates(results: List[Tuple], key_columns: List,
+                        aggregations: Dict[Text, List[Text]]) -> pandas.DataFrame:
+    """Reduce the partial results of _aggregate_partition."""
+    totals = pandas.concat([totals for totals, _ in results], ignore_index=True)
+    reductions = {}
+    for column_name, functions in aggregations.items():
+        for function in _partial_functions(functions):
+            reductions[f"{column_name}_{function}"] = ('sum' if function == 'count'
+                                                       else function)
+    combined = aggregate_data_by_columns(totals, key_columns, reductions)
+    result = combined[key_columns].copy()
+    for column_name, functions in aggregations.items():
+        for function in functions:
+            name = f"{column_name}_{function}"
+            if function == 'mean':
+                with numpy.errstate(invalid='ignore', divide='ignore'):
+                    result[name] = (combined[f"{column_name}_sum_sum"].to_numpy()
+                                    / combined[f"{column_name}_count_sum"].to_numpy())
+            elif function == 'distinct_count':
+                pairs = pandas.concat([distinct[column_name] for _, distinct in results],
+                                      ignore_index=True)
+                result[name] = aggregate_data_by_columns(pairs, key_columns,
+                                                         {column_name: [function]})[name]
+            else:
+                reduction = 'sum' if function == 'count' else function
+                result[name] = combined[f"{name}_{reduction}"]
+    return result
+
+
+def parallel_aggregate_data_by_columns(data_frame: pandas.DataFrame, key_columns: List,
+                                       aggregations: Dict[Text, Sequence[Text]],
+                                       **options: Any) -> pandas.DataFrame:
+    """Run aggregate_data_by_columns on row partitions in parallel.
+
+    Every partition is aggregated on its own and the partial sums,
+    counts, minimums and maximums are aggregated again, so the result
+    equals aggregate_data_by_columns up to floating point rounding.
+    options are workers, partition_rows and min_rows of
+    run_partitioned.
+
+    Raises:
+        ValueError - When a function is not supported.
+
+    Returns:
+        A tabular representation of the groups.
+
+    """
+    if isinstance(key_columns, str):
+        key_columns = [key_columns]
+    aggregations = {column_name: [functions] if isinstance(functions, str) else list(functions)
+                    for column_name, functions in aggregations.items()}
+    for functions in aggregations.values():
+        for function in functions:
+            if function not in AGGREGATE_FUNCTIONS:
+                raise ValueError(f"function must be one of {AGGREGATE_FUNCTIONS}")
+    data_frame = _materialize(data_frame)
+    if len(data_frame) < options.get('min_rows', PARALLEL_MIN_ROWS):
+        return aggregate_data_by_columns(data_frame, key_columns, aggregations)
+    return run_partitioned(data_frame, _aggregate_partition, key_columns, aggregations,
+                           combine=partial(_combine_aggregates, key_columns=key_columns,
+                                           aggregations=aggregations),
+                           **options)
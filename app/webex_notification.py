@@ -9,16 +9,27 @@ Title: webex_notification.py
 
 Author: theStygianArchitect
 """
+import atexit
 import os
+import threading
 from pathlib import Path
 
 from httpx import Client
+from httpx import Limits
+from httpx import Timeout
+
+try:
+    import h2  # noqa: F401  pylint: disable=W0611
+except ModuleNotFoundError:
+    h2 = None  # pylint: disable=C0103
 
 from app.env_manipulation import read_env_file
 from app.logger import set_up_stream_logging
 
 log = set_up_stream_logging()  # pylint: disable=C0103
 
+WEBEX_BASE_URL = 'https://webexapis.com'
+
 
 def _handle_token_errors(payload):
     look_for = 'authorization request header'
@@ -42,6 +53,105 @@ def _handle_malformed_errors(payload, response_obj):
         raise RuntimeError('This is just to stop the execution. See statements above')
 
 
+class WebexClient:
+    """One pooled httpx.Client for every Webex request.
+
+    Connections are kept alive and reused across requests, so helpers
+    making several calls pay DNS, TCP and TLS setup once. http2 is used
+    when requested and the h2 package is installed. Without a token,
+    WEBEX_TOKEN is read on every request, so a refreshed token is used
+    right away. Use it as a context manager or call close when done.
+    """
+
+    def __init__(self, token: str = None, *, base_url: str = WEBEX_BASE_URL,
+                 verify=None, http2: bool = False, max_connections: int = 10,
+                 max_keepalive_connections: int = 5, keepalive_expiry: float = 30.0,
+                 timeout: float = 120, connect_timeout: float = 10, transport=None):
+        """Initialize the pooled client, falling back to HTTP/1.1 without h2."""
+        self._token = token
+        if verify is None:
+            verify = os.getenv('CA_BUNDLE') or False
+        if http2 and h2 is None:
+            log.warning('h2 is not installed, falling back to HTTP/1.1')
+            http2 = False
+        self._client = Client(
+            base_url=base_url,
+            verify=verify,
+            http2=http2,
+            headers={'Content-Type': 'application/json'},
+            limits=Limits(max_connections=max_connections,
+                          max_keepalive_connections=max_keepalive_connections,
+                          keepalive_expiry=keepalive_expiry),
+            timeout=Timeout(timeout, connect=connect_timeout),
+            transport=transport
+        )
+
+    def __enter__(self):
+        """Return the client for use as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the client on leaving the context."""
+        self.close()
+
+    @property
+    def is_closed(self) -> bool:
+        """Return whether the client was closed."""
+        return self._client.is_closed
+
+    def close(self):
+        """Close the pooled connections."""
+        self._client.close()
+
+    def request(
+            self,
+            url_path: str,
+            *,
+            method: str = 'get',
+            headers: dict = None,
+            url_params: dict = None,
+            data: dict = None,
+            json: dict = None
+    ):
+        """Communicate with Webex over the pooled connections."""
+        token = self._token if self._token is not None else os.getenv('WEBEX_TOKEN')
+        response_obj = self._client.request(
+            method=method.upper(),
+            url=url_path,
+            headers={'Authorization': f"Bearer {token}", **(headers or {})},
+            params=url_params,
+            data=data,
+            json=json
+        )
+        json_response = response_obj.json()
+        _handle_token_errors(json_response)
+        _handle_malformed_errors(json_response, response_obj)
+        return json_response
+
+
+_DEFAULT_CLIENT = None
+_DEFAULT_CLIENT_LOCK = threading.Lock()
+
+
+def default_webex_client() -> WebexClient:
+    """Return the shared WebexClient, creating it on first use."""
+    global _DEFAULT_CLIENT  # pylint: disable=W0603
+    with _DEFAULT_CLIENT_LOCK:
+        if _DEFAULT_CLIENT is None or _DEFAULT_CLIENT.is_closed:
+            _DEFAULT_CLIENT = WebexClient()
+        return _DEFAULT_CLIENT
+
+
+def _close_default_webex_client():
+    """Close the shared WebexClient at interpreter exit."""
+    with _DEFAULT_CLIENT_LOCK:
+        if _DEFAULT_CLIENT is not None:
+            _DEFAULT_CLIENT.close()
+
+
+atexit.register(_close_default_webex_client)
+
+
 def webex_request(
         url_path: str,
         *,
@@ -49,71 +159,50 @@ def webex_request(
         headers: dict = None,
         url_params: dict = None,
         data: dict = None,
-        json: dict = None
+        json: dict = None,
+        client: WebexClient = None
 ):
     """This function communicates with Webex."""
-    if not headers:
-        headers = {
-            'Content-Type':  'application/json',
-            'Authorization': f"Bearer {os.getenv('WEBEX_TOKEN')}"
-        }
-    ca_bundle = os.getenv('CA_BUNDLE')
-    if not ca_bundle:
-        ca_bundle = False
-
-    client = Client(
-        base_url='https://webexapis.com',
-        verify=ca_bundle,
-        timeout=120
-    )
-    response_obj = client.request(
-        method=method.upper(),
-        url=url_path,
-        headers=headers,
-        params=url_params,
-        data=data,
-        json=json
-    )
-    json_response = response_obj.json()
-    _handle_token_errors(json_response)
-    _handle_malformed_errors(json_response, response_obj)
-    return json_response
-
-
-def get_webex_teams() -> dict:
+    if client is None:
+        client = default_webex_client()
+    return client.request(url_path, method=method, headers=headers, url_params=url_params,
+                          data=data, json=json)
+
+
+def get_webex_teams(*, client: WebexClient = None) -> dict:
     """Collect all Webex spaces."""
     url_path = '/v1/teams'
-    return webex_request(url_path)
+    return webex_request(url_path, client=client)
 
 
-def find_webex_team(team_name: str) -> dict:
+def find_webex_team(team_name: str, *, client: WebexClient = None) -> dict:
     """Find a specific team."""
-    webex_teams: list = get_webex_teams()['items']
+    webex_teams: list = get_webex_teams(client=client)['items']
     for webex_team in webex_teams:
         if f"{webex_team['name']}".lower() == team_name.lower():
             return webex_team
     return {}
 
 
-def team_name_to_id(team_name: str) -> str:
+def team_name_to_id(team_name: str, *, client: WebexClient = None) -> str:
     """Return the unique identifier for a team."""
-    team_information = find_webex_team(team_name)
+    team_information = find_webex_team(team_name, client=client)
     return team_information.get('id', '')
 
 
-def get_team_rooms(team_name: str) -> dict:
+def get_team_rooms(team_name: str, *, client: WebexClient = None) -> dict:
     """Return a list of rooms for a webex team."""
     url_path = '/v1/rooms'
     params = {
-        'teamId': team_name_to_id(team_name)
+        'teamId': team_name_to_id(team_name, client=client)
     }
-    response = webex_request(url_path, url_params=params)
+    response = webex_request(url_path, url_params=params, client=client)
     return response
 
 
-def find_team_room(team_name: str, room_name: str) -> dict:
+def find_team_room(team_name: str, room_name: str, *, client: WebexClient = None) -> dict:
     """Find a specific team."""
-    team_rooms: list = get_team_rooms(team_name)['items']
+    team_rooms: list = get_team_rooms(team_name, client=client)['items']
     if room_name.lower() == 'general':
         room_name = team_name
 
@@ -123,38 +212,40 @@ def find_team_room(team_name: str, room_name: str) -> dict:
     return {}
 
 
-def room_name_to_id(team_name: str, room_name: str) -> dict:
+def room_name_to_id(team_name: str, room_name: str, *,
+                    client: WebexClient = None) -> dict:
     """Return the unique identifier for a team."""
-    room_information = find_team_room(team_name, room_name)
+    room_information = find_team_room(team_name, room_name, client=client)
     return room_information.get('id', {})
 
 
-def get_team_memberships(team_id: str):
+def get_team_memberships(team_id: str, *, client: WebexClient = None):
     """Return all the members of a team."""
     url_path = '/v1/team/memberships'
     params = {
         'teamId': team_id
     }
-    response = webex_request(url_path, url_params=params)
+    response = webex_request(url_path, url_params=params, client=client)
     return response
 
 
-def get_messages(team_name: str, room_name: str) -> dict:
+def get_messages(team_name: str, room_name: str, *, client: WebexClient = None) -> dict:
     """Return all messages."""
     url_path = '/v1/messages'
-    membership_details = get_team_memberships(team_name_to_id(team_name))
+    membership_details = get_team_memberships(team_name_to_id(team_name, client=client),
+                                              client=client)
     member_ids = [member['personId'] for member in membership_details['items']]
     print(member_ids)
     params = {
-        'roomId': room_name_to_id(team_name, room_name),
+        'roomId': room_name_to_id(team_name, room_name, client=client),
         'mentionedPeople': member_ids
     }
-    response = webex_request(url_path, url_params=params)
+    response = webex_request(url_path, url_params=params, client=client)
     return response
 
 
 def send_message(team_name: str, room_name: str, text: str = None,
-                 body_parameters: dict = None) -> dict:
+                 body_parameters: dict = None, *, client: WebexClient = None) -> dict:
     """Test send message."""
     url_path = '/v1/messages'
     if not text:
@@ -162,10 +253,10 @@ def send_message(team_name: str, room_name: str, text: str = None,
 
     if not body_parameters:
         body_parameters = {
-            'roomId': room_name_to_id(team_name, room_name),
+            'roomId': room_name_to_id(team_name, room_name, client=client),
             'text':   text
         }
-    response = webex_request(url_path, method='post', json=body_parameters)
+    response = webex_request(url_path, method='post', json=body_parameters, client=client)
     return response
 
 
@@ -174,14 +265,17 @@ def main():
     read_env_file()
     team_name = 'ckr'
     room_name = 'general'
-    print(get_team_rooms(team_name))
-    print(get_messages(team_name, room_name))
-    print(send_message(team_name, room_name, text='Hello World from python!'))
-    body_parameters = {
-        'roomId':   room_name_to_id(team_name, room_name),
-        'markdown': '<@all> **Hello World** _from python constructed body!_'
-    }
-    print(send_message(team_name, room_name, body_parameters=body_parameters))
+    with WebexClient() as client:
+        print(get_team_rooms(team_name, client=client))
+        print(get_messages(team_name, room_name, client=client))
+        print(send_message(team_name, room_name, text='Hello World from python!',
+                           client=client))
+        body_parameters = {
+            'roomId':   room_name_to_id(team_name, room_name, client=client),
+            'markdown': '<@all> **Hello World** _from python constructed body!_'
+        }
+        print(send_message(team_name, room_name, body_parameters=body_parameters,
+                           client=client))
 
 
 if __name__ == '__main__':
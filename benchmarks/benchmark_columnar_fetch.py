@@ -0,0 +1,75 @@
+#! /usr/bin/env python
+"""
+Description: Compare pandas.read_sql with the columnar fetch path.
+
+Without --connection_string a temporary SQLite database is populated
+with --rows rows. Pass a SQLAlchemy connection string and --sql_command
+to measure against a real server (PostgreSQL will use COPY).
+
+Title: benchmark_columnar_fetch.py
+
+Author: theStygianArchitect
+"""
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas  # noqa: E402  pylint: disable=C0413
+from sqlalchemy import create_engine  # noqa: E402  pylint: disable=C0413
+from sqlalchemy import text  # noqa: E402  pylint: disable=C0413
+
+from app.database import read_sql_columnar  # noqa: E402  pylint: disable=C0413
+
+
+def build_sqlite_engine(path: str, rows: int):
+    """Create a SQLite table with an integer, a float and a text column."""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE sample (id INTEGER, amount REAL, label TEXT)'))
+        connection.execute(text('INSERT INTO sample VALUES (:id, :amount, :label)'),
+                           [{'id': index, 'amount': index * 0.5, 'label': f"label_{index % 97}"}
+                            for index in range(rows)])
+    return engine
+
+
+def timed(function, repeat: int) -> float:
+    """Return the best wall clock time of repeat runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """Provide access to module as standalone project."""
+    parser = ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--connection_string')
+    parser.add_argument('--sql_command', default='SELECT id, amount, label FROM sample')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.connection_string:
+            engine = create_engine(args.connection_string)
+        else:
+            engine = build_sqlite_engine(os.path.join(directory, 'sample.db'), args.rows)
+        dtypes = {'id': 'int64', 'amount': 'float64'} if not args.connection_string else None
+        read_sql_seconds = timed(lambda: pandas.read_sql(args.sql_command, engine), args.repeat)
+        columnar_seconds = timed(lambda: read_sql_columnar(args.sql_command, engine, dtypes),
+                                 args.repeat)
+        engine.dispose()
+
+    print(f"pandas.read_sql:   {read_sql_seconds:.3f}s")
+    print(f"read_sql_columnar: {columnar_seconds:.3f}s")
+    print(f"speedup:           {read_sql_seconds / columnar_seconds:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
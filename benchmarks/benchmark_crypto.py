@@ -0,0 +1,62 @@
+#! /usr/bin/env python
+"""
+Description: Compare per-value Fernet calls with the Cipher batch API.
+
+Title: benchmark_crypto.py
+
+Author: theStygianArchitect
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet  # noqa: E402  pylint: disable=C0413
+
+from app.crypto import Cipher  # noqa: E402  pylint: disable=C0413
+from app.crypto import decrypt_string  # noqa: E402  pylint: disable=C0413
+from app.crypto import encrypt_string  # noqa: E402  pylint: disable=C0413
+from app.crypto import generate_key  # noqa: E402  pylint: disable=C0413
+
+
+def fernet_per_call(tokens, key):
+    """Encrypt the way encrypt_string did, building Fernet per value."""
+    return [Fernet(key.encode()).encrypt(token.encode()).decode('utf-8') for token in tokens]
+
+
+def main():
+    """Provide access to module as standalone project."""
+    parser = ArgumentParser()
+    parser.add_argument('--values', type=int, default=200000)
+    parser.add_argument('--batch_size', type=int, default=10000)
+    parser.add_argument('--max_workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    key = generate_key()
+    cipher = Cipher(key)
+    tokens = [f"customer-{index:09d}@example.com" for index in range(args.values)]
+    digests = cipher.encrypt_many(tokens)
+    cases = [
+        ('Fernet per value', lambda: fernet_per_call(tokens, key)),
+        ('encrypt_string', lambda: [encrypt_string(token, key) for token in tokens]),
+        ('encrypt_many', lambda: cipher.encrypt_many(tokens, args.batch_size)),
+        ('encrypt_many thread', lambda: cipher.encrypt_many(
+            tokens, args.batch_size, 'thread', args.max_workers)),
+        ('encrypt_many process', lambda: cipher.encrypt_many(
+            tokens, args.batch_size, 'process', args.max_workers)),
+        ('decrypt_string', lambda: [decrypt_string(digest, key) for digest in digests]),
+        ('decrypt_many', lambda: cipher.decrypt_many(digests, args.batch_size)),
+        ('decrypt_many process', lambda: cipher.decrypt_many(
+            digests, args.batch_size, 'process', args.max_workers)),
+    ]
+    for name, function in cases:
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        print(f"{name:22} {args.values / seconds:12,.0f} values/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+"""
+Description: Compare chained filter helpers with filter_data_by_predicates.
+
+Title: benchmark_filter_plan.py
+
+Author: theStygianArchitect
+"""
+import os
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy  # noqa: E402  pylint: disable=C0413
+import pandas  # noqa: E402  pylint: disable=C0413
+
+from app import pandas_aggregation_techniques as techniques  # noqa: E402  pylint: disable=C0413
+
+
+def build_data_frame(rows: int, width: int) -> pandas.DataFrame:
+    """Create a wide frame with integer, float and low cardinality string columns."""
+    generator = numpy.random.default_rng(0)
+    columns = {'id': numpy.arange(rows),
+               'group': generator.choice(['a', 'b', 'c', 'd'], rows),
+               'region': generator.choice(['north', 'south', 'east', 'west'], rows),
+               'status': generator.integers(0, 10, rows)}
+    for index in range(width):
+        columns[f"value_{index}"] = generator.random(rows)
+    return pandas.DataFrame(columns)
+
+
+def chained(data_frame: pandas.DataFrame) -> pandas.DataFrame:
+    """Apply the five filters the way services chain them today."""
+    data_frame = techniques.filter_data_where_column_neq_value(data_frame, 'group', 'a')
+    data_frame = techniques.filter_data_where_column_eq_value(data_frame, 'region', 'north')
+    data_frame = techniques.filter_data_where_column_isin_array(data_frame, 'status',
+                                                                [1, 2, 3, 4, 5, 6])
+    data_frame = techniques.filter_data_where_column_is_not_in_array(data_frame, 'group', ['d'])
+    return techniques.filter_data_by_columns(data_frame, ['id', 'group', 'value_0'])
+
+
+def single_pass(data_frame: pandas.DataFrame) -> pandas.DataFrame:
+    """Apply the same filters as one predicate plan."""
+    return techniques.filter_data_by_predicates(
+        data_frame,
+        [('group', 'neq', 'a'), ('region', 'eq', 'north'),
+         ('status', 'isin', [1, 2, 3, 4, 5, 6]), ('group', 'not_in', ['d'])],
+        columns=['id', 'group', 'value_0'])
+
+
+def measure(function, data_frame: pandas.DataFrame, repeat: int):
+    """Return the best wall clock time and the peak traced allocation of function."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(data_frame)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    function(data_frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    """Provide access to module as standalone project."""
+    parser = ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--width', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data_frame = build_data_frame(args.rows, args.width)
+    pandas.testing.assert_frame_equal(chained(data_frame), single_pass(data_frame))
+    for name, function in (('chained helpers', chained), ('single pass', single_pass)):
+        seconds, peak = measure(function, data_frame, args.repeat)
+        print(f"{name:16} {seconds * 1000:9.1f} ms  peak {peak / 2 ** 20:9.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#! /usr/bin/env python
+"""
+Description: Measure the overhead of filter tracing and debug logging.
+
+Calls filter_data_where_column_isin_array in a tight loop with a large
+filter_array, as the services do, with tracing disabled and enabled,
+and with the per-call debug logging the helpers used to do.
+
+Title: benchmark_filter_tracing.py
+
+Author: theStygianArchitect
+"""
+import logging
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy  # noqa: E402  pylint: disable=C0413
+import pandas  # noqa: E402  pylint: disable=C0413
+
+from app import pandas_aggregation_techniques as techniques  # noqa: E402  pylint: disable=C0413
+
+
+def logged_isin(data_frame: pandas.DataFrame, column_name, filter_array):
+    """Filter the way the helpers did before tracing, logging the array."""
+    techniques.log.debug('column_name: %s', column_name)
+    techniques.log.debug('filter_array: %s', filter_array)
+    return data_frame.loc[data_frame[column_name].isin(filter_array)]
+
+
+def timed(function, data_frame, filter_array, calls: int) -> float:
+    """Return the mean microseconds of one call."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        function(data_frame, 'id', filter_array)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    """Provide access to module as standalone project."""
+    parser = ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--array_size', type=int, default=100000)
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    data_frame = pandas.DataFrame({'id': numpy.arange(args.rows)})
+    filter_array = list(range(0, args.array_size * 2, 2))
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        for handler in techniques.log.handlers:
+            handler.setStream(devnull)
+        untraced = techniques.filter_data_where_column_isin_array.__wrapped__
+        cases = [('no tracing wrapper', untraced, logging.INFO, False, None),
+                 ('tracing disabled', techniques.filter_data_where_column_isin_array,
+                  logging.INFO, False, None),
+                 ('tracing to a list', techniques.filter_data_where_column_isin_array,
+                  logging.INFO, True, [].append),
+                 ('tracing to the log', techniques.filter_data_where_column_isin_array,
+                  logging.INFO, True, None),
+                 ('old debug logging, INFO level', logged_isin, logging.INFO, False, None),
+                 ('old debug logging, DEBUG level', logged_isin, logging.DEBUG, False, None)]
+        for name, function, level, tracing, sink in cases:
+            techniques.log.setLevel(level)
+            if tracing:
+                techniques.enable_filter_tracing(sink)
+            else:
+                techniques.disable_filter_tracing()
+            timed(function, data_frame, filter_array, 3)
+            print(f"{name:32} {timed(function, data_frame, filter_array, args.calls):10.1f} us")
+        techniques.disable_filter_tracing()
+
+
+if __name__ == '__main__':
+    main()
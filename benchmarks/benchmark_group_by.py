@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+"""
+Description: Compare DataFrame.groupby().agg() with aggregate_data_by_columns.
+
+The frames have a high cardinality string key, a low cardinality
+integer key, a float column with missing values and an integer column.
+
+Title: benchmark_group_by.py
+
+Author: theStygianArchitect
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy  # noqa: E402  pylint: disable=C0413
+import pandas  # noqa: E402  pylint: disable=C0413
+
+from app.pandas_aggregation_techniques import \
+    aggregate_data_by_columns  # noqa: E402  pylint: disable=C0413
+from app.pandas_aggregation_techniques import \
+    top_n_data_by_column  # noqa: E402  pylint: disable=C0413
+
+AGGREGATIONS = {'amount': ['sum', 'count', 'mean', 'min', 'max'],
+                'quantity': ['sum', 'distinct_count']}
+
+
+def build_data_frame(rows: int, keys: int) -> pandas.DataFrame:
+    """Create rows rows spread over keys string keys."""
+    generator = numpy.random.default_rng(0)
+    names = numpy.array([f"customer_{index:08d}" for index in range(keys)], dtype=object)
+    amount = generator.random(rows)
+    amount[generator.random(rows) < 0.05] = numpy.nan
+    return pandas.DataFrame({'customer': pandas.array(names[generator.integers(0, keys, rows)],
+                                                      dtype='str'),
+                             'region': generator.integers(0, 8, rows),
+                             'amount': amount,
+                             'quantity': generator.integers(0, 100, rows)})
+
+
+def pandas_aggregate(data_frame: pandas.DataFrame) -> pandas.DataFrame:
+    """Aggregate with DataFrame.groupby().agg()."""
+    aggregations = {column: [function.replace('distinct_count', 'nunique')
+                             for function in functions]
+                    for column, functions in AGGREGATIONS.items()}
+    return data_frame.groupby(['customer', 'region'], sort=False).agg(aggregations)
+
+
+def pandas_top_n(data_frame: pandas.DataFrame) -> pandas.DataFrame:
+    """Keep the three largest amounts per customer with pandas."""
+    return data_frame.dropna(subset=['amount']).sort_values(
+        'amount', ascending=False, kind='stable').groupby('customer', sort=False).head(3)
+
+
+def timed(function, *args) -> float:
+    """Return the wall clock seconds of one call."""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    """Provide access to module as standalone project."""
+    parser = ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 10000000, 50000000])
+    parser.add_argument('--key_ratio', type=float, default=0.1,
+                        help='distinct customers as a fraction of rows')
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        data_frame = build_data_frame(rows, max(int(rows * args.key_ratio), 1))
+        cases = (
+            ('groupby().agg()', pandas_aggregate, (data_frame,)),
+            ('aggregate_data_by_columns', aggregate_data_by_columns,
+             (data_frame, ['customer', 'region'], AGGREGATIONS)),
+            ('sort + groupby().head()', pandas_top_n, (data_frame,)),
+            ('top_n_data_by_column', top_n_data_by_column,
+             (data_frame, 'customer', 'amount', 3)),
+        )
+        for name, function, function_args in cases:
+            print(f"{rows:>10} rows  {name:26} {timed(function, *function_args):8.2f} s")
+        del data_frame
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+"""
+Description: Measure CustomisedJSONFormatter throughput per JSON backend.
+
+Formats the same records with the formatter as it was before host,
+pid and service were cached and records were serialized once, and
+with the current formatter, for each of the orjson, ujson and json
+backends logger falls back between.
+
+Title: benchmark_log_formatter.py
+
+Author: theStygianArchitect
+"""
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+from platform import node
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_log_formatter  # noqa: E402  pylint: disable=C0413
+
+from app.logger import CustomisedJSONFormatter  # noqa: E402  pylint: disable=C0413
+from app.logger import _default_json_serializer  # noqa: E402  pylint: disable=C0413
+
+
+class LegacyJSONFormatter(json_log_formatter.JSONFormatter):
+    """The formatter before caching and single pass serialization."""
+
+    def json_record(self, message, extra, record):
+        """Look up host and time on every record."""
+        extra['message'] = message
+        extra['host'] = node()
+        extra['function_name'] = record.funcName
+        extra['module_name'] = record.module
+        if 'time' not in extra:
+            extra['time'] = datetime.now().isoformat()
+        return extra
+
+    def to_json(self, record):
+        """Serialize, retrying with a default on TypeError."""
+        try:
+            return str(self.json_lib.dumps(record), 'utf-8')
+        except TypeError:
+            try:
+                return self.json_lib.dumps(record, default=_default_json_serializer)
+            except TypeError:
+                return self.json_lib.dumps(record)
+
+
+def records(count: int):
+    """Return count records like the services log, half with extra fields."""
+    built = []
+    for number in range(count):
+        record = logging.LogRecord('benchmark', logging.INFO, __file__, number,
+                                   {'status': 'Ok'} if number % 2 else 'rows: %s',
+                                   None if number % 2 else (number,), None,
+                                   func='health_check')
+        if not number % 2:
+            record.__dict__.update(query_id=number, elapsed=0.25, table='accounts')
+        built.append(record)
+    return built
+
+
+def throughput(formatter: logging.Formatter, batch, repeat: int) -> float:
+    """Return the records formatted per second; main keeps the best round."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for record in batch:
+            formatter.format(record)
+    return len(batch) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    """Provide access to module as standalone project."""
+    parser = ArgumentParser()
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    batch = records(args.records)
+    for name in ('orjson', 'ujson', 'json'):
+        try:
+            json_lib = importlib.import_module(name) if name != 'json' else json
+        except ModuleNotFoundError:
+            print(f'{name:<7} not installed')
+            continue
+        legacy = LegacyJSONFormatter()
+        legacy.json_lib = json_lib
+        current = CustomisedJSONFormatter(json_lib=json_lib, service='benchmark')
+        before = after = 0.0
+        for _ in range(args.rounds):
+            before = max(before, throughput(legacy, batch, args.repeat))
+            after = max(after, throughput(current, batch, args.repeat))
+        print(f'{name:<7} legacy {before:10,.0f} records/s  current {after:10,.0f} records/s'
+              f'  {after / before:4.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#! /usr/bin/env python
+"""
+Description: Measure the time logging calls spend on the calling thread.
+
+Logs the /health_check payload of main.py in a loop through the
+synchronous handlers and through AsyncLogHandler, writing to a plain
+FileHandler, to a RotatingCompressedFileHandler or to a stream that
+sleeps on every write like a slow stderr, and through a FileHandler
+behind each kind of LogSampler.
+
+Title: benchmark_logging.py
+
+Author: theStygianArchitect
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.logger import AsyncLogHandler  # noqa: E402  pylint: disable=C0413
+from app.logger import CustomisedJSONFormatter  # noqa: E402  pylint: disable=C0413
+from app.logger import LogSampler  # noqa: E402  pylint: disable=C0413
+from app.logger import RotatingCompressedFileHandler  # noqa: E402  pylint: disable=C0413
+
+
+class SlowStream:
+    """A stream that sleeps on every write and flush."""
+
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text):
+        """Write text after the delay."""
+        time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def flush(self):
+        """Flush after the delay."""
+        time.sleep(self.delay)
+        self.stream.flush()
+
+
+def write_syscalls() -> int:
+    """Return the write system calls of this process so far, 0 if unknown."""
+    try:
+        with open('/proc/self/io', encoding='utf-8') as io_counters:
+            return int(dict(line.split(': ') for line in io_counters.read().splitlines())
+                       ['syscw'])
+    except (OSError, KeyError, ValueError):
+        return 0
+
+
+def timed(handler: logging.Handler, records: int, sampler: logging.Filter = None):
+    """Return the mean microseconds a logging call takes and writes per record."""
+    logger = logging.getLogger(f'benchmark.{id(handler)}')
+    logger.propagate = False
+    if sampler is not None:
+        logger.addFilter(sampler)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    writes = write_syscalls()
+    start = time.perf_counter()
+    for _ in range(records):
+        logger.info({'status': 'Ok'})
+    elapsed = time.perf_counter() - start
+    handler.close()
+    return elapsed / records * 1e6, (write_syscalls() - writes) / records
+
+
+def main():
+    """Provide access to module as standalone project."""
+    parser = ArgumentParser()
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--write_delay', type=float, default=0.0001)
+    parser.add_argument('--max_bytes', type=int, default=1024 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_file = os.path.join(directory, 'log.json')
+        handlers = [('file', lambda: logging.FileHandler(log_file, encoding='utf-8')),
+                    ('rotating compressed file',
+                     lambda: RotatingCompressedFileHandler(log_file, max_bytes=args.max_bytes)),
+                    (f'stream sleeping {args.write_delay * 1e6:.0f} us per write',
+                     lambda: logging.StreamHandler(
+                         SlowStream(open(os.devnull, 'w', encoding='utf-8'),
+                                    args.write_delay)))]
+        for name, handler_factory in handlers:
+            for mode in ('synchronous', 'asynchronous'):
+                handler = handler_factory()
+                handler.setFormatter(CustomisedJSONFormatter())
+                if mode == 'asynchronous':
+                    handler = AsyncLogHandler(handler, capacity=args.records)
+                call, writes = timed(handler, args.records)
+                print(f'{name:<32} {mode:<13} {call:8.1f} us/call {writes:6.3f} writes/record')
+        for name, sampler in (('file sampled at 1 per second',
+                               LogSampler(default_template_rate=1)),
+                              ('file sampled at 1%', LogSampler({logging.INFO: 0.01})),
+                              ('file deduplicated', LogSampler(dedup_seconds=60))):
+            handler = logging.FileHandler(log_file, encoding='utf-8')
+            handler.setFormatter(CustomisedJSONFormatter())
+            call, writes = timed(handler, args.records, sampler)
+            print(f'{name:<32} {"synchronous":<13} {call:8.1f} us/call '
+                  f'{writes:6.3f} writes/record')
+
+
+if __name__ == '__main__':
+    main()
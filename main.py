@@ -22,6 +22,9 @@ except ModuleNotFoundError as module_not_found_error:
     print('Please install required packages')
     sys.exit(1)
 
+from app.database import async_dispose_all  # type: ignore
+from app.database import query_metrics  # type: ignore
+from app.logger import LogSampler  # type: ignore
 from app.logger import set_up_stream_logging  # type: ignore
 
 app = FastAPI()  # pylint: disable=C0103,E1101
@@ -30,7 +33,11 @@ app.add_middleware(CORSMiddleware,
                    allow_methods=['*'],
                    allow_headers=['*'])
 
-log = set_up_stream_logging(__file__)  # pylint: disable=C0103
+HEALTH_CHECK_RESULT = {'status': 'Ok'}
+# Probes hit /health_check far more often than anyone reads its log line.
+log = set_up_stream_logging(__file__, asynchronous=True,  # pylint: disable=C0103
+                            sampler=LogSampler(
+                                template_rate_limits={str(HEALTH_CHECK_RESULT): 1}))
 
 
 def custom_openapi():
@@ -52,11 +59,23 @@ def custom_openapi():
 @app.get('/health_check')
 async def health_check():
     """Perform health check."""
-    result = {'status': 'Ok'}
+    result = dict(HEALTH_CHECK_RESULT)
     log.info(result)
     return result
 
 
+@app.get('/metrics/database')
+async def database_metrics():
+    """Report database query latency histograms, pool and cache statistics."""
+    return query_metrics()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    """Release pooled database connections."""
+    await async_dispose_all()
+
+
 @app.get('/')
 async def index():
     """Redirect to docs page."""
@@ -3,7 +3,7 @@
 
 # declare vars
 test_directory_list=$(ls tests/*.py)
-app_directory_list=$(ls app/*.py)
+app_directory_list=$(ls app/*.py app/database/*.py)
 #script_name=$(basename "$0")
 #current_directory=$(pwd)
 
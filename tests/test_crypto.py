@@ -5,9 +5,24 @@ Title: test_crypto.py
 
 Author: theStygianArchitect
 """
+import os
+import tempfile
 import unittest
 
+import pandas
+from cryptography.fernet import InvalidToken
+
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_eq_value  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_isin_array  # pylint: disable=E0401
+from app.crypto import Cipher  # pylint: disable=E0401
+from app.crypto import decrypt_columns  # pylint: disable=E0401
+from app.crypto import decrypt_file  # pylint: disable=E0401
+from app.crypto import decrypt_file_chunks  # pylint: disable=E0401
 from app.crypto import decrypt_string  # pylint: disable=E0401
+from app.crypto import encrypt_columns  # pylint: disable=E0401
+from app.crypto import encrypt_file  # pylint: disable=E0401
 from app.crypto import encrypt_string  # pylint: disable=E0401
 
 
@@ -60,5 +75,161 @@ class CryptoTestCase(unittest.TestCase):
         self.assertRaises(ValueError, decrypt_string, digest='', key='')
 
 
+class CipherTestCase(unittest.TestCase):
+    """Unit Tests for the Cipher batch API."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.key = 'kAtftZHNEn2MyqkYk0e5Tzs_KlA3bsXNspvwYv8Bx8g='
+        self.cipher = Cipher(self.key)
+        self.tokens = [f"token_{index}" for index in range(25)]
+
+    def test_encrypt_many_and_decrypt_many(self):
+        """Validate batches round trip and match the per-call functions."""
+        digests = self.cipher.encrypt_many(self.tokens, batch_size=4)
+        self.assertEqual(len(set(digests)), 25)
+        self.assertEqual([decrypt_string(digest, self.key) for digest in digests], self.tokens)
+        self.assertEqual(self.cipher.decrypt_many(iter(digests), batch_size=7), self.tokens)
+        self.assertEqual(self.cipher.decrypt(encrypt_string('lol', self.key)), 'lol')
+
+    def test_series_keeps_index(self):
+        """Validate a pandas.Series is returned with the same index."""
+        series = pandas.Series(self.tokens[:3], index=[10, 20, 30], name='email')
+        digests = self.cipher.encrypt_many(series)
+        self.assertEqual(list(digests.index), [10, 20, 30])
+        self.assertEqual(digests.name, 'email')
+        self.assertEqual(list(self.cipher.decrypt_many(digests)), self.tokens[:3])
+
+    def test_pools(self):
+        """Validate thread and process pools keep the order of values."""
+        for pool in ('thread', 'process'):
+            digests = self.cipher.encrypt_many(self.tokens, batch_size=5, pool=pool,
+                                               max_workers=2)
+            self.assertEqual(self.cipher.decrypt_many(digests, batch_size=5, pool=pool,
+                                                      max_workers=2), self.tokens)
+        self.assertRaises(ValueError, self.cipher.encrypt_many, self.tokens, 5, 'fiber')
+
+    def test_missing_values(self):
+        """Validate Exception is raised when parameters missing."""
+        self.assertRaises(ValueError, Cipher, '')
+        self.assertRaises(ValueError, self.cipher.encrypt_many, ['a', ''])
+        self.assertRaises(ValueError, self.cipher.decrypt, '')
+
+
+class EncryptColumnsTestCase(unittest.TestCase):
+    """Unit Tests for column encryption."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.key = 'kAtftZHNEn2MyqkYk0e5Tzs_KlA3bsXNspvwYv8Bx8g='
+        self.data_frame = pandas.DataFrame({'email': ['a@b.c', None, 'd@e.f', 'a@b.c', ''],
+                                            'score': [1.5, 2.0, None, 4.0, 5.0],
+                                            'id': range(5)}, index=list('vwxyz'))
+
+    def test_round_trip_preserves_nulls(self):
+        """Validate nulls stay null and other cells round trip as str."""
+        encrypted = encrypt_columns(self.data_frame, ['email', 'score'], self.key)
+        self.assertEqual(list(encrypted['email'].isna()), [False, True, False, False, False])
+        self.assertEqual(encrypted.loc['z', 'email'], '')
+        self.assertNotEqual(encrypted.loc['v', 'email'], encrypted.loc['y', 'email'])
+        self.assertEqual(decrypt_string(encrypted.loc['v', 'email'], self.key), 'a@b.c')
+        self.assertEqual(self.data_frame.loc['v', 'email'], 'a@b.c')
+        decrypted = decrypt_columns(encrypted, ['email', 'score'], self.key, batch_size=2,
+                                    pool='thread', max_workers=2)
+        self.assertEqual(list(decrypted['email'].fillna('null')),
+                         ['a@b.c', 'null', 'd@e.f', 'a@b.c', ''])
+        self.assertEqual(list(decrypted['score'].fillna('null')), ['1.5', '2.0', 'null',
+                                                                   '4.0', '5.0'])
+        self.assertEqual(list(decrypted['id']), list(range(5)))
+
+    def test_deterministic_equality_filters(self):
+        """Validate deterministic digests can be filtered without decrypting."""
+        encrypted = encrypt_columns(self.data_frame, ['email'], self.key, deterministic=True)
+        cipher = Cipher(self.key)
+        self.assertEqual(encrypted.loc['v', 'email'], encrypted.loc['y', 'email'])
+        digest = cipher.encrypt('a@b.c', deterministic=True)
+        result = filter_data_where_column_eq_value(encrypted, 'email', digest)
+        self.assertEqual(list(result.index), ['v', 'y'])
+        digests = cipher.encrypt_many(['d@e.f', 'q@r.s'], deterministic=True)
+        result = filter_data_where_column_isin_array(encrypted, 'email', digests)
+        self.assertEqual(list(result.index), ['x'])
+        self.assertEqual(decrypt_string(digest, self.key), 'a@b.c')
+
+
+class EncryptFileTestCase(unittest.TestCase):
+    """Unit Tests for chunked file encryption."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.key = 'kAtftZHNEn2MyqkYk0e5Tzs_KlA3bsXNspvwYv8Bx8g='
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.source = os.path.join(self.directory.name, 'extract.csv')
+        self.sink = os.path.join(self.directory.name, 'extract.csv.enc')
+        self.payload = os.urandom(1000)
+        with open(self.source, 'wb') as source_file:
+            source_file.write(self.payload)
+
+    def tearDown(self):
+        """Overloaded method to clean up per test."""
+        self.directory.cleanup()
+
+    def _round_trip(self, chunk_size):
+        """Encrypt and decrypt the source returning the decrypted bytes."""
+        encrypt_file(self.source, self.sink, self.key, chunk_size)
+        decrypted = os.path.join(self.directory.name, 'extract.csv.dec')
+        written = decrypt_file(self.sink, decrypted, self.key)
+        with open(decrypted, 'rb') as decrypted_file:
+            data = decrypted_file.read()
+        self.assertEqual(written, len(data))
+        return data
+
+    def test_round_trip(self):
+        """Validate files of any size decrypt to the original bytes."""
+        self.assertEqual(self._round_trip(64), self.payload)
+        self.assertEqual(self._round_trip(100), self.payload)
+        self.assertEqual(self._round_trip(4096), self.payload)
+        with open(self.source, 'wb'):
+            self.payload = b''
+        self.assertEqual(self._round_trip(64), b'')
+
+    def test_random_access(self):
+        """Validate a range of chunks decrypts on its own."""
+        self.assertEqual(encrypt_file(self.source, self.sink, self.key, 64), 16)
+        self.assertEqual(b''.join(decrypt_file_chunks(self.sink, self.key, 3, 5)),
+                         self.payload[192:320])
+        self.assertEqual(b''.join(decrypt_file_chunks(self.sink, self.key, 15)),
+                         self.payload[960:])
+        with self.assertRaises(ValueError):
+            list(decrypt_file_chunks(self.sink, self.key, 10, 17))
+
+    def test_tampering_is_detected(self):
+        """Validate modified, truncated and foreign files do not decrypt."""
+        encrypt_file(self.source, self.sink, self.key, 64)
+        with open(self.sink, 'rb') as sink_file:
+            encrypted = sink_file.read()
+        for tampered in (encrypted[:100] + bytes((encrypted[100] ^ 1,)) + encrypted[101:],
+                         encrypted[:-(1000 - 960 + 16)]):
+            with open(self.sink, 'wb') as sink_file:
+                sink_file.write(tampered)
+            with self.assertRaises(InvalidToken):
+                list(decrypt_file_chunks(self.sink, self.key))
+        with self.assertRaises(ValueError):
+            list(decrypt_file_chunks(self.source, self.key))
+
+    def test_failed_decryption_leaves_no_plaintext(self):
+        """Validate a file failing authentication writes nothing to sink."""
+        encrypt_file(self.source, self.sink, self.key, 64)
+        with open(self.sink, 'r+b') as sink_file:
+            sink_file.seek(-1, os.SEEK_END)
+            last = sink_file.read(1)
+            sink_file.seek(-1, os.SEEK_END)
+            sink_file.write(bytes((last[0] ^ 1,)))
+        decrypted = os.path.join(self.directory.name, 'extract.csv.dec')
+        with self.assertRaises(InvalidToken):
+            decrypt_file(self.sink, decrypted, self.key)
+        self.assertEqual(sorted(os.listdir(self.directory.name)),
+                         sorted([os.path.basename(self.source), os.path.basename(self.sink)]))
+
+
 if __name__ == '__main__':
     unittest.main()
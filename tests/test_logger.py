@@ -0,0 +1,378 @@
+"""
+Description: Unit test for logger.
+
+Title: test_logger.py
+
+Author: theStygianArchitect
+"""
+import glob
+import gzip
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import date
+from datetime import datetime
+from unittest import mock
+
+import orjson
+import ujson
+
+from app.logger import AsyncLogHandler  # pylint: disable=E0401
+from app.logger import CustomisedJSONFormatter  # pylint: disable=E0401
+from app.logger import LogSampler  # pylint: disable=E0401
+from app.logger import RotatingCompressedFileHandler  # pylint: disable=E0401
+from app.logger import set_up_file_logging  # pylint: disable=E0401
+from app.logger import set_up_stream_logging  # pylint: disable=E0401
+
+
+class CustomisedJSONFormatterTestCase(unittest.TestCase):
+    """Unit Tests for CustomisedJSONFormatter."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.record = logging.LogRecord('test', logging.INFO, __file__, 1, 'rows: %s', (3,),
+                                        None, func='health_check')
+        self.record.created = datetime(2020, 5, 17, 8, 30, 15, 250).timestamp()
+        self.record.__dict__.update(day=date(2020, 5, 17), payload=object())
+
+    def test_format(self):
+        """Validate every backend writes the same fields once."""
+        for json_lib in (orjson, ujson, json):
+            formatter = CustomisedJSONFormatter(service='api', json_lib=json_lib)
+            record = json.loads(formatter.format(self.record))
+            self.assertEqual(record['message'], 'rows: 3')
+            self.assertEqual(record['time'], '2020-05-17T08:30:15.000250')
+            self.assertEqual(record['day'], '2020-05-17')
+            self.assertTrue(record['payload'].startswith('<object object'))
+            self.assertEqual((record['pid'], record['service'], record['function_name']),
+                             (os.getpid(), 'api', 'health_check'))
+
+    def test_format_unserializable(self):
+        """Validate circular values and exceptions are still logged."""
+        circular = {}
+        circular['self'] = circular
+        self.record.__dict__.update(circular=circular)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.record.exc_info = sys.exc_info()
+        record = json.loads(CustomisedJSONFormatter().format(self.record))
+        self.assertEqual(record['circular'], "{'self': {...}}")
+        self.assertIn('ValueError: boom', record['exc_info'])
+
+
+class _GatedStream(io.StringIO):
+    """A stream whose writes wait until the gate is opened."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.writes = 0
+
+    def write(self, text):
+        self.gate.wait(5)
+        self.writes += 1
+        return super().write(text)
+
+
+class AsyncLogHandlerTestCase(unittest.TestCase):
+    """Unit Tests for AsyncLogHandler."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.stream = _GatedStream()
+        target = logging.StreamHandler(self.stream)
+        target.setFormatter(CustomisedJSONFormatter())
+        self.handlers = []
+        self.target = target
+
+    def tearDown(self):
+        """Overloaded method to clean up per test."""
+        self.stream.gate.set()
+        for handler in self.handlers:
+            handler.close()
+
+    def _logger(self, **options):
+        """Return a logger writing through a new AsyncLogHandler."""
+        handler = AsyncLogHandler(self.target, **options)
+        self.handlers.append(handler)
+        logger = logging.getLogger(f'{self.id()}.{len(self.handlers)}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        return logger, handler
+
+    def _messages(self):
+        """Return the messages written to the stream."""
+        return [json.loads(line)['message'] for line in self.stream.getvalue().splitlines()]
+
+    def test_batches_and_flushes(self):
+        """Validate records are written in batches and flushed on close."""
+        logger, handler = self._logger(batch_size=100)
+        for number in range(250):
+            logger.info('record %d', number)
+        self.stream.gate.set()
+        handler.close()
+        self.assertEqual(self._messages(), [f'record {number}' for number in range(250)])
+        self.assertLess(self.stream.writes, 250)
+        self.assertEqual(handler.counters, {'queued': 250, 'dropped': 0, 'written': 250,
+                                            'pending': 0})
+        logger.info('after close')
+        self.assertEqual(self._messages()[-1], 'after close')
+
+    def test_drop_oldest(self):
+        """Validate a full queue discards its oldest records."""
+        logger, handler = self._logger(capacity=10, overflow='drop_oldest', batch_size=1)
+        logger.info('first')
+        while handler.counters['pending'] != 1 or handler._queue:  # pylint: disable=W0212
+            pass
+        for number in range(30):
+            logger.info('record %d', number)
+        self.assertEqual(handler.counters['dropped'], 20)
+        self.stream.gate.set()
+        handler.flush()
+        self.assertEqual(self._messages(),
+                         ['first'] + [f'record {number}' for number in range(20, 30)])
+
+    def test_sample(self):
+        """Validate a full queue keeps one in sample_rate new records."""
+        logger, handler = self._logger(capacity=5, overflow='sample', sample_rate=10,
+                                       batch_size=1)
+        logger.info('first')
+        while handler.counters['pending'] != 1 or handler._queue:  # pylint: disable=W0212
+            pass
+        for number in range(35):
+            logger.info('record %d', number)
+        self.stream.gate.set()
+        handler.flush()
+        self.assertEqual(self._messages(),
+                         ['first'] + [f'record {number}' for number in (3, 4, 5, 15, 25)])
+        self.assertEqual(handler.counters['dropped'], 30)
+
+    def test_block(self):
+        """Validate a full queue makes the logging thread wait."""
+        logger, handler = self._logger(capacity=2, overflow='block', batch_size=1)
+        thread = threading.Thread(target=lambda: [logger.info('record %d', number)
+                                                  for number in range(10)])
+        thread.start()
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+        self.stream.gate.set()
+        thread.join(5)
+        handler.flush()
+        self.assertEqual(self._messages(), [f'record {number}' for number in range(10)])
+        self.assertEqual(handler.counters['dropped'], 0)
+
+    def test_invalid_overflow(self):
+        """Validate an unknown overflow policy is rejected."""
+        with self.assertRaises(ValueError):
+            AsyncLogHandler(self.target, overflow='spill')
+
+    def test_set_up_stream_logging(self):
+        """Validate asynchronous wraps the stream handler."""
+        logger = set_up_stream_logging(self.id(), asynchronous=True)
+        self.handlers.extend(logger.handlers)
+        self.assertIsInstance(logger.handlers[0], AsyncLogHandler)
+        self.assertIsInstance(logger.handlers[0].target.formatter, CustomisedJSONFormatter)
+
+
+class RotatingCompressedFileHandlerTestCase(unittest.TestCase):
+    """Unit Tests for RotatingCompressedFileHandler."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.log_file = os.path.join(self.directory.name, 'service.log')
+        self.handlers = []
+
+    def tearDown(self):
+        """Overloaded method to clean up per test."""
+        for handler in self.handlers:
+            handler.close()
+        self.directory.cleanup()
+
+    def _logger(self, **options):
+        """Return a logger writing through a new RotatingCompressedFileHandler."""
+        handler = RotatingCompressedFileHandler(self.log_file, **options)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.handlers.append(handler)
+        logger = logging.getLogger(f'{self.id()}.{len(self.handlers)}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        return logger, handler
+
+    def _read(self):
+        """Return the lines of the compressed segments and the log, oldest first."""
+        lines = []
+        for segment in sorted(glob.glob(f'{self.log_file}.*')):
+            with gzip.open(segment, 'rt') as segment_file:
+                lines.extend(segment_file.read().splitlines())
+        with open(self.log_file, encoding='utf-8') as log_file:
+            return lines + log_file.read().splitlines()
+
+    def test_size_rollover_and_retention(self):
+        """Validate rotated logs are compressed and only the newest are kept."""
+        logger, handler = self._logger(max_bytes=100, backup_count=3)
+        for number in range(100):
+            logger.info('record %03d', number)
+        handler.close()
+        segments = glob.glob(f'{self.log_file}.*')
+        self.assertEqual(len(segments), 3)
+        self.assertTrue(all(segment.endswith('.gz') for segment in segments))
+        lines = self._read()
+        self.assertEqual(lines, [f'record {number:03d}' for number in range(100 - len(lines),
+                                                                            100)])
+        self.assertLessEqual(os.path.getsize(self.log_file), 100)
+
+    def test_time_rollover(self):
+        """Validate the log rolls over rotate_seconds after it was opened."""
+        logger, handler = self._logger(rotate_seconds=60)
+        logger.info('before')
+        record = logger.makeRecord(logger.name, logging.INFO, __file__, 1, 'after', None, None)
+        record.created += 61
+        logger.handle(record)
+        handler.close()
+        self.assertEqual(len(glob.glob(f'{self.log_file}.*.gz')), 1)
+        self.assertEqual(self._read(), ['before', 'after'])
+
+    def test_buffered_flush(self):
+        """Validate records are flushed every flush_records records."""
+        logger, _ = self._logger(flush_records=10, flush_seconds=60)
+        for number in range(9):
+            logger.info('record %d', number)
+        self.assertEqual(os.path.getsize(self.log_file), 0)
+        logger.info('record 9')
+        self.assertEqual(len(self._read()), 10)
+
+    def test_compression_error_handled(self):
+        """Validate compression failures go through handleError."""
+        logger, handler = self._logger(max_bytes=10)
+        with mock.patch.object(handler, '_compress', side_effect=OSError('disk full')), \
+                mock.patch.object(handler, 'handleError') as handle_error:
+            logger.info('record 0')
+            logger.info('record 1')
+            handler.close()
+        record = handle_error.call_args[0][0]
+        self.assertTrue(record.getMessage().startswith(f'Unable to compress {self.log_file}.'))
+
+    def test_set_up_file_logging(self):
+        """Validate a new logger gets a rotating file handler."""
+        logger = set_up_file_logging('service.log', self.directory.name)
+        self.handlers.extend(logger.handlers)
+        self.assertIsInstance(logger.handlers[0], RotatingCompressedFileHandler)
+        self.assertEqual(len(set_up_file_logging('service.log', self.directory.name).handlers),
+                         1)
+
+
+class LogSamplerTestCase(unittest.TestCase):
+    """Unit Tests for LogSampler."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.logger = logging.getLogger(self.id())
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.stream = io.StringIO()
+        handler = logging.StreamHandler(self.stream)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+        self.created = 1000.0
+
+    def _log(self, sampler, msg, *args, level=logging.INFO, seconds=0.0):
+        """Log msg through sampler seconds after the previous record."""
+        self.created += seconds
+        record = self.logger.makeRecord(self.logger.name, level, __file__, 1, msg, args, None)
+        record.created = self.created
+        if sampler.filter(record):
+            self.logger.handle(record)
+
+    def _lines(self):
+        """Return the logged lines."""
+        return self.stream.getvalue().splitlines()
+
+    def test_template_rate_limit(self):
+        """Validate a template keeps at most its rate of records per second."""
+        sampler = LogSampler(template_rate_limits={'hit %d': 2}, summary_seconds=10)
+        for number in range(10):
+            self._log(sampler, 'hit %d', number, seconds=0.1)
+            self._log(sampler, 'other %d', number)
+        self._log(sampler, 'hit %d', 10, seconds=1)
+        lines = self._lines()
+        self.assertEqual([line for line in lines if line.startswith('hit')],
+                         ['hit 0', 'hit 1', 'hit 5', 'hit 10'])
+        self.assertEqual(len([line for line in lines if line.startswith('other')]), 10)
+
+    def test_rate_limit_below_one_per_second(self):
+        """Validate a 0.1/s limit keeps one record every 10 seconds."""
+        sampler = LogSampler(template_rate_limits={'tick': 0.1},
+                             logger_rate_limits={self.logger.name: 0.5}, summary_seconds=1e9)
+        for _ in range(30):
+            self._log(sampler, 'tick', seconds=1)
+        self.assertEqual(self._lines(), ['tick'] * 3)
+
+    def test_template_rate_limit_of_dict_message(self):
+        """Validate a dict message is rate limited by its str."""
+        sampler = LogSampler(template_rate_limits={"{'status': 'Ok'}": 1}, summary_seconds=10)
+        for _ in range(3):
+            self._log(sampler, {'status': 'Ok'}, seconds=0.1)
+            self._log(sampler, {'status': 'Failed'})
+        self.assertEqual(self._lines(), ["{'status': 'Ok'}"] + ["{'status': 'Failed'}"] * 3)
+
+    def test_idle_state_pruned(self):
+        """Validate refilled buckets and expired dedup keys are dropped."""
+        sampler = LogSampler(default_template_rate=1, dedup_seconds=5, summary_seconds=10)
+        for number in range(3):
+            self._log(sampler, f'template {number}', seconds=1)
+        self._log(sampler, 'after', seconds=10)
+        self.assertEqual(len(sampler._buckets), 1)  # pylint: disable=W0212
+        self.assertEqual(len(sampler._last_seen), 1)  # pylint: disable=W0212
+
+    def test_logger_rate_limit_and_summary(self):
+        """Validate dropped records are summarized every summary_seconds."""
+        sampler = LogSampler(logger_rate_limits={self.logger.name: 1}, summary_seconds=5)
+        for number in range(5):
+            self._log(sampler, {'status': 'Ok', 'number': number}, seconds=0.1)
+        self._log(sampler, 'after', seconds=5)
+        self.assertEqual(self._lines(),
+                         ["{'status': 'Ok', 'number': 0}",
+                          "suppressed 4 similar messages: {'status': 'Ok', 'number': 1}",
+                          'after'])
+
+    def test_sample_rates(self):
+        """Validate levels are sampled and unlisted levels are kept."""
+        sampler = LogSampler({logging.DEBUG: 0.0, logging.INFO: 1.0}, summary_seconds=1e9)
+        self._log(sampler, 'debug', level=logging.DEBUG)
+        self._log(sampler, 'info')
+        self._log(sampler, 'error', level=logging.ERROR)
+        self.assertEqual(self._lines(), ['info', 'error'])
+        sampler.summarize()
+        self.assertEqual(self._lines()[-1], 'suppressed 1 similar messages: debug')
+
+    def test_dedup(self):
+        """Validate repeated messages are dropped within dedup_seconds."""
+        sampler = LogSampler(dedup_seconds=10, summary_seconds=1e9)
+        for _ in range(3):
+            self._log(sampler, 'rows: %d', 1, seconds=1)
+            self._log(sampler, 'rows: %d', 2)
+            self._log(sampler, {'status': 'Ok'})
+            self._log(sampler, {'status': [1]})
+        self._log(sampler, 'rows: %d', 1, seconds=10)
+        self.assertEqual(self._lines(), ['rows: 1', 'rows: 2', "{'status': 'Ok'}",
+                                         "{'status': [1]}", "{'status': [1]}",
+                                         "{'status': [1]}", 'rows: 1'])
+
+    def test_set_up_stream_logging(self):
+        """Validate the sampler is added to the logger."""
+        sampler = LogSampler(default_template_rate=1)
+        logger = set_up_stream_logging(self.id() + '.stream', sampler=sampler)
+        self.assertIn(sampler, logger.filters)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,328 @@
+"""
+Description: Unit test for pandas_aggregation_techniques.
+
+Title: test_pandas_aggregation_techniques.py
+
+Author: theStygianArchitect
+"""
+import unittest
+from functools import partial
+from unittest import mock
+
+import numpy
+import pandas
+
+from app.pandas_aggregation_techniques import IndexedFrame  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import aggregate_data_by_columns  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import disable_filter_tracing  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import enable_filter_tracing  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import filter_data_by_columns  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import filter_data_by_predicates  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import filter_data_frame_chunks  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_eq_value  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_is_not_in_array  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_isin_array  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_neq_value  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import top_n_data_by_column  # pylint: disable=E0401
+
+
+class FilterDataFrameChunksTestCase(unittest.TestCase):
+    """Unit Tests for chunked filtering."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.data_frame = pandas.DataFrame({'id': range(10),
+                                            'group': ['a', 'b'] * 5,
+                                            'value': range(10, 20)})
+
+    def test_filter_and_project_chunks(self):
+        """Validate chunked filtering equals filtering the whole frame."""
+        chunks = [self.data_frame.iloc[:4], self.data_frame.iloc[4:8], self.data_frame.iloc[8:]]
+        filters = [partial(filter_data_where_column_isin_array, column_name='id',
+                           filter_array=[1, 2, 9])]
+        result = pandas.concat(filter_data_frame_chunks(chunks, filters, columns=['id', 'value']))
+        self.assertEqual(list(result.columns), ['id', 'value'])
+        self.assertEqual(list(result['id']), [1, 2, 9])
+
+    def test_empty_chunks_skipped(self):
+        """Validate chunks without matches are not yielded."""
+        filters = [partial(filter_data_where_column_isin_array, column_name='id',
+                           filter_array=[0])]
+        chunks = list(filter_data_frame_chunks([self.data_frame.iloc[:5],
+                                                self.data_frame.iloc[5:]], filters))
+        self.assertEqual(len(chunks), 1)
+
+
+class FilterDataByPredicatesTestCase(unittest.TestCase):
+    """Unit Tests for single pass predicate filtering."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.data_frame = pandas.DataFrame({
+            'id': range(12),
+            'group': ['a', 'b', None, 'c'] * 3,
+            'amount': [1.0, numpy.nan, 3.0] * 4,
+            'nullable': pandas.array([1, None, 2, 3] * 3, dtype='Int64'),
+            'category': pandas.Categorical(['x', 'y', 'z'] * 4),
+        })
+
+    def test_matches_chained_helpers(self):
+        """Validate one pass equals chaining the individual helpers."""
+        cases = [
+            ('group', 'neq', 'a'), ('amount', 'neq', 3.0), ('nullable', 'neq', 2),
+            ('category', 'eq', 'x'), ('id', 'isin', [1, 2, 3, 5, 7, 11]),
+            ('group', 'not_in', [None]), ('amount', 'eq', numpy.nan), ('group', 'neq', None),
+        ]
+        helpers = {'eq': filter_data_where_column_eq_value,
+                   'neq': filter_data_where_column_neq_value,
+                   'isin': filter_data_where_column_isin_array,
+                   'not_in': filter_data_where_column_is_not_in_array}
+        for case in cases:
+            expected = helpers[case[1]](self.data_frame, case[0], case[2])
+            result = filter_data_by_predicates(self.data_frame, [case])
+            self.assertEqual(list(result['id']), list(expected['id']), case)
+
+        expected = self.data_frame
+        for column_name, operator, value in cases[:2] + cases[4:6]:
+            expected = helpers[operator](expected, column_name, value)
+        expected = filter_data_by_columns(expected, ['id', 'group'])
+        result = filter_data_by_predicates(self.data_frame, cases[:2] + cases[4:6],
+                                           columns=['id', 'group'])
+        pandas.testing.assert_frame_equal(result, expected)
+
+    def test_matches_helpers_on_coerced_dtypes(self):
+        """Validate datetime, bool and nullable columns coerce like the helpers."""
+        data_frame = pandas.DataFrame({
+            'id': range(3),
+            'day': pandas.to_datetime(['2020-01-01', '2020-01-02', None]),
+            'flag': [True, False, True],
+            'number': [1, 2, 3],
+            'nullable': pandas.array([True, None, False], dtype='boolean'),
+        })
+        helpers = {'eq': filter_data_where_column_eq_value,
+                   'neq': filter_data_where_column_neq_value,
+                   'isin': filter_data_where_column_isin_array,
+                   'not_in': filter_data_where_column_is_not_in_array}
+        values = {'day': ['2020-01-01', pandas.Timestamp('2020-01-02'), None],
+                  'flag': [1, True, 0.0], 'number': [True, 1.0, '1'],
+                  'nullable': [True, 1, None]}
+        for column_name, column_values in values.items():
+            for value in column_values:
+                for operator, helper in helpers.items():
+                    value_ = [value] if operator in ('isin', 'not_in') else value
+                    case = (column_name, operator, value_)
+                    expected = helper(data_frame, column_name, value_)
+                    result = filter_data_by_predicates(data_frame, [case])
+                    self.assertEqual(list(result['id']), list(expected['id']), case)
+
+    def test_contiguous_rows_are_sliced(self):
+        """Validate contiguous matches keep the index of the source."""
+        result = filter_data_by_predicates(self.data_frame, [('id', 'isin', [3, 4, 5])])
+        self.assertEqual(list(result.index), [3, 4, 5])
+
+    def test_invalid_operator(self):
+        """Validate Exception is raised for unknown operators."""
+        self.assertRaises(ValueError, filter_data_by_predicates, self.data_frame,
+                          [('id', 'gt', 1)])
+
+
+class IndexedFrameTestCase(unittest.TestCase):
+    """Unit Tests for IndexedFrame."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.data_frame = pandas.DataFrame({
+            'id': range(12),
+            'group': ['a', 'b', None, 'c'] * 3,
+            'amount': [1.0, 2.0, numpy.nan] * 4,
+            'nullable': pandas.array([1, None, 2, 2] * 3, dtype='Int64'),
+        }, index=range(100, 112))
+        self.helpers = {'eq': filter_data_where_column_eq_value,
+                        'neq': filter_data_where_column_neq_value,
+                        'isin': filter_data_where_column_isin_array,
+                        'not_in': filter_data_where_column_is_not_in_array}
+
+    def test_matches_helpers(self):
+        """Validate indexed filters return the rows of a column scan."""
+        indexed_frame = IndexedFrame(self.data_frame)
+        cases = [
+            ('group', 'eq', 'a'), ('group', 'neq', 'b'), ('group', 'isin', ['a', None]),
+            ('group', 'not_in', ['c']), ('amount', 'eq', 2), ('amount', 'isin', [numpy.nan]),
+            ('amount', 'neq', numpy.nan), ('nullable', 'neq', 2), ('nullable', 'eq', 9),
+            ('id', 'isin', [11, 0, 5]),
+        ]
+        for case in cases:
+            expected = self.helpers[case[1]](self.data_frame, case[0], case[2])
+            result = self.helpers[case[1]](indexed_frame, case[0], case[2])
+            pandas.testing.assert_frame_equal(result, expected)
+        self.assertEqual(indexed_frame.indexed_columns(), ['group', 'amount', 'nullable', 'id'])
+
+        result = filter_data_by_predicates(indexed_frame,
+                                           [('group', 'neq', 'b'), ('nullable', 'eq', 2)],
+                                           columns=['id'])
+        self.assertEqual(list(result['id']), [2, 3, 6, 7, 10, 11])
+
+    def test_matches_helpers_on_coerced_values(self):
+        """Validate values the column would coerce match like the helpers."""
+        data_frame = pandas.DataFrame({
+            'day': pandas.to_datetime(['2020-01-01', '2020-01-02', None]),
+            'flag': [True, False, True],
+            'number': [1, 2, 3],
+        })
+        indexed_frame = IndexedFrame(data_frame)
+        values = {'day': ['2020-01-01', pandas.Timestamp('2020-01-02')],
+                  'flag': [1, True, 0.0], 'number': [True, 1.0, '1']}
+        for column_name, column_values in values.items():
+            for value in column_values:
+                for operator, helper in self.helpers.items():
+                    value_ = [value] if operator in ('isin', 'not_in') else value
+                    expected = helper(data_frame, column_name, value_)
+                    result = helper(indexed_frame, column_name, value_)
+                    pandas.testing.assert_frame_equal(result, expected)
+
+    def test_missing_scalars(self):
+        """Validate NA and NaT are missing values like None and NaN."""
+        data_frame = pandas.DataFrame({
+            'nullable': pandas.array([1, None, 2], dtype='Int64'),
+            'label': pandas.array(['a', None, 'b'], dtype='string'),
+            'day': pandas.to_datetime(['2020-01-01', None, '2020-01-02']),
+        })
+        indexed_frame = IndexedFrame(data_frame)
+        for column_name in data_frame.columns:
+            for value in (pandas.NA, pandas.NaT, None):
+                for operator in ('eq', 'neq'):
+                    expected = filter_data_by_predicates(data_frame,
+                                                         [(column_name, operator, value)])
+                    result = indexed_frame.filter([(column_name, operator, value)])
+                    pandas.testing.assert_frame_equal(result, expected)
+
+    def test_invalidated_on_mutation(self):
+        """Validate assignment and replacement rebuild the index."""
+        indexed_frame = IndexedFrame(self.data_frame.copy())
+        self.assertEqual(len(filter_data_where_column_eq_value(indexed_frame, 'id', 3)), 1)
+        indexed_frame['id'] = 3
+        self.assertEqual(indexed_frame.indexed_columns(), [])
+        self.assertEqual(len(filter_data_where_column_eq_value(indexed_frame, 'id', 3)), 12)
+
+        indexed_frame.frame = self.data_frame.iloc[:4]
+        self.assertEqual(len(filter_data_where_column_eq_value(indexed_frame, 'id', 3)), 1)
+
+    def test_memory_budget(self):
+        """Validate indexes are evicted or skipped to stay in budget."""
+        indexed_frame = IndexedFrame(self.data_frame, memory_budget=0)
+        result = filter_data_where_column_eq_value(indexed_frame, 'group', 'a')
+        self.assertEqual(list(result['id']), [0, 4, 8])
+        self.assertEqual(indexed_frame.indexed_columns(), [])
+
+        indexed_frame = IndexedFrame(self.data_frame)
+        filter_data_where_column_eq_value(indexed_frame, 'id', 1)
+        indexed_frame.memory_budget = indexed_frame.nbytes + 1
+        filter_data_where_column_eq_value(indexed_frame, 'amount', 1)
+        self.assertEqual(indexed_frame.indexed_columns(), ['amount'])
+        self.assertLessEqual(indexed_frame.nbytes, indexed_frame.memory_budget)
+
+
+class AggregateDataByColumnsTestCase(unittest.TestCase):
+    """Unit Tests for the group-by aggregation functions."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        generator = numpy.random.default_rng(0)
+        rows = 500
+        amount = generator.random(rows)
+        amount[::7] = numpy.nan
+        self.data_frame = pandas.DataFrame({
+            'customer': generator.choice(['a', 'b', 'c', None], rows),
+            'region': generator.integers(0, 3, rows),
+            'amount': amount,
+            'quantity': generator.integers(-5, 5, rows),
+            'flag': generator.random(rows) < 0.5,
+            'label': generator.choice(['x', 'y', None], rows),
+        })
+
+    def test_matches_groupby(self):
+        """Validate the aggregates equal DataFrame.groupby().agg()."""
+        functions = ['sum', 'count', 'mean', 'min', 'max', 'distinct_count']
+        aggregations = {'amount': functions, 'quantity': functions, 'flag': functions,
+                        'label': ['count', 'min', 'max', 'distinct_count']}
+        result = aggregate_data_by_columns(self.data_frame, ['customer', 'region'],
+                                           aggregations)
+        expected = self.data_frame.groupby(['customer', 'region'], sort=False).agg(
+            {column: [function.replace('distinct_count', 'nunique') for function in names]
+             for column, names in aggregations.items()})
+        self.assertEqual(list(zip(result['customer'], result['region'])), list(expected.index))
+        for column_name, names in aggregations.items():
+            for function in names:
+                values = expected[(column_name, function.replace('distinct_count', 'nunique'))]
+                pandas.testing.assert_series_equal(
+                    result[f"{column_name}_{function}"], values.reset_index(drop=True),
+                    check_dtype=False, check_names=False)
+
+    def test_invalid_function(self):
+        """Validate Exception is raised for unknown functions."""
+        self.assertRaises(ValueError, aggregate_data_by_columns, self.data_frame, 'customer',
+                          {'amount': ['median']})
+
+    def test_top_n_per_group(self):
+        """Validate top_n_data_by_column keeps the ranked rows per group."""
+        for top_n in (1, 3, 20):
+            for ascending in (False, True):
+                result = top_n_data_by_column(self.data_frame, 'customer', 'amount', top_n,
+                                              ascending=ascending)
+                expected = self.data_frame.dropna(subset=['customer', 'amount']).sort_values(
+                    'amount', ascending=ascending, kind='stable')
+                expected = expected.groupby('customer', sort=False).head(top_n)
+                order = {key: position for position, key
+                         in enumerate(self.data_frame['customer'].dropna().unique())}
+                expected = expected.iloc[numpy.argsort(
+                    expected['customer'].map(order).to_numpy(), kind='stable')]
+                self.assertEqual(list(result.index), list(expected.index), (top_n, ascending))
+
+
+class FilterTracingTestCase(unittest.TestCase):
+    """Unit Tests for filter tracing."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.data_frame = pandas.DataFrame({'id': range(100)})
+        self.addCleanup(disable_filter_tracing)
+
+    def test_disabled_does_not_log(self):
+        """Validate no event or log call happens while disabled."""
+        disable_filter_tracing()
+        with mock.patch('app.pandas_aggregation_techniques.log') as log:
+            result = filter_data_where_column_isin_array(self.data_frame, 'id', list(range(50)))
+        self.assertEqual(len(result), 50)
+        self.assertEqual(log.mock_calls, [])
+
+    def test_enabled_records_events(self):
+        """Validate events hold row counts and sizes, not array contents."""
+        events = []
+        enable_filter_tracing(events.append)
+        filter_data_where_column_isin_array(self.data_frame, 'id', list(range(0, 1000, 2)))
+        filter_data_by_predicates(self.data_frame, [('id', 'neq', 3)], columns=['id'])
+        self.assertEqual([event['function'] for event in events],
+                         ['filter_data_where_column_isin_array', 'filter_data_by_predicates'])
+        self.assertEqual(events[0]['rows_in'], 100)
+        self.assertEqual(events[0]['rows_out'], 50)
+        self.assertEqual(events[0]['column_name'], 'id')
+        self.assertEqual(events[0]['filter_array_size'], 500)
+        self.assertNotIn('filter_array', events[0])
+        self.assertGreaterEqual(events[0]['seconds'], 0)
+        self.assertEqual((events[1]['predicates_size'], events[1]['columns_size']), (1, 1))
+
+    def test_default_sink_logs(self):
+        """Validate events are logged with structured extras by default."""
+        enable_filter_tracing()
+        with mock.patch('app.pandas_aggregation_techniques.log') as log:
+            filter_data_where_column_eq_value(self.data_frame, 'id', 7)
+        log.info.assert_called_once()
+        self.assertEqual(log.info.call_args.kwargs['extra']['rows_out'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Description: Unit test for pandas_compaction.
+
+Title: test_pandas_compaction.py
+
+Author: theStygianArchitect
+"""
+import unittest
+
+import numpy
+import pandas
+
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_eq_value  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_is_not_in_array  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_isin_array  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import \
+    filter_data_where_column_neq_value  # pylint: disable=E0401
+from app.pandas_compaction import compact_frame  # pylint: disable=E0401
+
+
+class CompactFrameTestCase(unittest.TestCase):
+    """Unit Tests for compact_frame."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        rows = 1000
+        self.data_frame = pandas.DataFrame({
+            'small': numpy.arange(rows) % 100,
+            'large': numpy.arange(rows) * 2 ** 40,
+            'whole': numpy.where(numpy.arange(rows) % 10 == 0, numpy.nan, numpy.arange(rows)),
+            'single': numpy.arange(rows, dtype=numpy.float32).astype(numpy.float64) / 4,
+            'fraction': numpy.arange(rows) / 3,
+            'status': pandas.Series(['open', 'closed', None, 'open'] * 250, dtype=object),
+            'unique': [f"row_{index}" for index in range(rows)],
+            'flag': pandas.Series([True, False, None, True] * 250, dtype=object),
+        })
+
+    def test_dtypes(self):
+        """Validate every column gets the smallest lossless dtype."""
+        result = compact_frame(self.data_frame)
+        self.assertEqual(result['small'].dtype, numpy.int8)
+        self.assertEqual(result['large'].dtype, numpy.int64)
+        self.assertEqual(result['whole'].dtype, numpy.float64)
+        self.assertEqual(result['single'].dtype, numpy.float64)
+        self.assertEqual(result['fraction'].dtype, numpy.float64)
+        self.assertIsInstance(result['status'].dtype, pandas.CategoricalDtype)
+        self.assertNotIsInstance(result['unique'].dtype, pandas.CategoricalDtype)
+        self.assertEqual(result['flag'].dtype, object)
+
+        result = compact_frame(self.data_frame, nullable=True, narrow_floats=True)
+        self.assertEqual(str(result['whole'].dtype), 'Int16')
+        self.assertEqual(result['single'].dtype, numpy.float32)
+        self.assertEqual(str(result['flag'].dtype), 'boolean')
+
+    def test_floats_not_narrowed(self):
+        """Validate float64 values matching a float32 keep filtering the same."""
+        data_frame = pandas.DataFrame({'value': [float(numpy.float32(0.1)), 0.5]})
+        result = compact_frame(data_frame)
+        self.assertEqual(result['value'].dtype, numpy.float64)
+        self.assertEqual(list(filter_data_where_column_eq_value(result, 'value', 0.1).index),
+                         list(filter_data_where_column_eq_value(data_frame, 'value', 0.1).index))
+
+    def test_helpers_unchanged_with_missing_values(self):
+        """Validate every helper returns the same rows after compaction."""
+        data_frame = pandas.DataFrame({
+            'whole': [1.0, numpy.nan, 2.0, 1.0],
+            'flag': pandas.Series([True, None, False, True], dtype=object),
+            'number': pandas.Series([1, None, 2, 1], dtype=object),
+            'status': pandas.Series(['open', None, 'closed', 'open'], dtype=object),
+        })
+        helpers = {'eq': filter_data_where_column_eq_value,
+                   'neq': filter_data_where_column_neq_value,
+                   'isin': filter_data_where_column_isin_array,
+                   'not_in': filter_data_where_column_is_not_in_array}
+        values = {'whole': 1, 'flag': True, 'number': 1, 'status': 'open'}
+        result = compact_frame(data_frame, category_ratio=1)
+        for column_name, value in values.items():
+            for operator, helper in helpers.items():
+                value_ = [value] if operator in ('isin', 'not_in') else value
+                self.assertEqual(list(helper(result, column_name, value_).index),
+                                 list(helper(data_frame, column_name, value_).index),
+                                 (column_name, operator))
+
+    def test_values_and_report(self):
+        """Validate values are unchanged and savings are reported."""
+        result = compact_frame(self.data_frame)
+        for column_name in self.data_frame.columns:
+            expected = self.data_frame[column_name]
+            actual = result[column_name]
+            self.assertEqual(list(expected.isna()), list(actual.isna()), column_name)
+            self.assertEqual(list(expected.dropna()), list(actual.dropna()), column_name)
+        bytes_saved = result.attrs['bytes_saved']
+        self.assertEqual(bytes_saved['large'], 0)
+        self.assertEqual(bytes_saved['small'], 7000)
+        self.assertGreater(bytes_saved['status'], 0)
+        self.assertEqual(
+            list(filter_data_where_column_eq_value(result, 'status', 'open').index),
+            list(filter_data_where_column_eq_value(self.data_frame, 'status', 'open').index))
+
+
+if __name__ == '__main__':
+    unittest.main()
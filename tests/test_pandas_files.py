@@ -0,0 +1,84 @@
+"""
+Description: Unit test for pandas_files.
+
+Title: test_pandas_files.py
+
+Author: theStygianArchitect
+"""
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from app.pandas_aggregation_techniques import filter_data_by_predicates  # pylint: disable=E0401
+from app.pandas_files import filter_data_file_chunks  # pylint: disable=E0401
+from app.pandas_files import write_filtered_data_file  # pylint: disable=E0401
+
+
+class FilterDataFileChunksTestCase(unittest.TestCase):
+    """Unit Tests for out-of-core file filtering."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.data_frame = pandas.DataFrame({'id': range(1000),
+                                            'group': ['a', 'b', 'c', 'd'] * 250,
+                                            'value': numpy.arange(1000) / 10})
+        self.csv_path = os.path.join(self.directory.name, 'source.csv')
+        self.parquet_path = os.path.join(self.directory.name, 'source.parquet')
+        self.data_frame.to_csv(self.csv_path, index=False)
+        self.data_frame.to_parquet(self.parquet_path, index=False, row_group_size=100)
+        self.predicates = [('id', 'isin', [3, 7, 420, 421]), ('group', 'neq', 'b')]
+
+    def tearDown(self):
+        """Overloaded method to clean up per test."""
+        self.directory.cleanup()
+
+    def test_matches_in_memory_filter(self):
+        """Validate every source gives the rows of an in-memory filter."""
+        expected = filter_data_by_predicates(self.data_frame, self.predicates, ['id', 'value'])
+        sources = [self.csv_path, self.parquet_path,
+                   (self.data_frame.iloc[start:start + 64] for start in range(0, 1000, 64))]
+        for source in sources:
+            result = pandas.concat(filter_data_file_chunks(source, self.predicates,
+                                                           ['id', 'value'], chunk_rows=64))
+            self.assertEqual(list(result.columns), ['id', 'value'])
+            self.assertEqual(list(result['id']), list(expected['id']))
+
+    def test_parquet_row_groups_skipped(self):
+        """Validate row group statistics skip groups that cannot match."""
+        chunks = list(filter_data_file_chunks(self.parquet_path, [('id', 'eq', 420)],
+                                              chunk_rows=1000))
+        self.assertEqual(len(chunks), 1)
+        chunks = list(filter_data_file_chunks(self.parquet_path, [('id', 'eq', 5000)]))
+        self.assertEqual(chunks, [])
+
+    def test_write_sink(self):
+        """Validate filtered chunks are streamed into CSV and Parquet sinks."""
+        for name in ('result.csv', 'result.parquet'):
+            sink = os.path.join(self.directory.name, name)
+            rows = write_filtered_data_file(self.csv_path, sink, [('group', 'eq', 'a')],
+                                            ['id'], chunk_rows=100)
+            result = (pandas.read_csv(sink) if name.endswith('.csv')
+                      else pandas.read_parquet(sink))
+            self.assertEqual(rows, 250)
+            self.assertEqual(list(result['id']), list(range(0, 1000, 4)))
+
+    def test_parquet_sink_with_changing_chunk_dtypes(self):
+        """Validate CSV chunks inferring different dtypes share one Parquet schema."""
+        source = os.path.join(self.directory.name, 'changing.csv')
+        sink = os.path.join(self.directory.name, 'changing.parquet')
+        with open(source, 'w', encoding='utf-8') as source_file:
+            source_file.write('id,amount,label,flag\n1,,,\n2,,,\n3,1,x,True\n'
+                              '4,2.5,y,False\n5,3,7,\n')
+        self.assertEqual(write_filtered_data_file(source, sink, [], chunk_rows=2), 5)
+        result = pandas.read_parquet(sink)
+        self.assertEqual(list(result['amount'].fillna(-1)), [-1, -1, 1.0, 2.5, 3.0])
+        self.assertEqual(list(result['label'].fillna('')), ['', '', 'x', 'y', '7'])
+        self.assertEqual(list(result['flag'].fillna('')), ['', '', True, False, ''])
+
+
+if __name__ == '__main__':
+    unittest.main()
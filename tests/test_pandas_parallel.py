@@ -0,0 +1,80 @@
+"""
+Description: Unit test for pandas_parallel.
+
+Title: test_pandas_parallel.py
+
+Author: theStygianArchitect
+"""
+import unittest
+from unittest import mock
+
+import numpy
+import pandas
+
+from app import pandas_parallel  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import aggregate_data_by_columns  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import filter_data_by_columns  # pylint: disable=E0401
+from app.pandas_aggregation_techniques import filter_data_by_predicates  # pylint: disable=E0401
+from app.pandas_parallel import parallel_aggregate_data_by_columns  # pylint: disable=E0401
+from app.pandas_parallel import parallel_filter_data_by_predicates  # pylint: disable=E0401
+from app.pandas_parallel import run_partitioned  # pylint: disable=E0401
+
+
+class ParallelExecutionTestCase(unittest.TestCase):
+    """Unit Tests for partitioned parallel execution."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        generator = numpy.random.default_rng(0)
+        rows = 3000
+        self.data_frame = pandas.DataFrame({
+            'id': range(rows),
+            'group': generator.choice(['a', 'b', None], rows),
+            'amount': generator.random(rows),
+            'nullable': pandas.array(generator.choice([1, 2, None], rows), dtype='Int64'),
+            'when': pandas.date_range('2020-01-01', periods=rows, freq='min'),
+        }, index=numpy.arange(rows) * 2)
+
+    def test_filter_matches_serial(self):
+        """Validate partitions in worker processes give the serial result."""
+        predicates = [('group', 'neq', 'a'), ('nullable', 'isin', [2])]
+        for columns in (None, ['when', 'id']):
+            result = parallel_filter_data_by_predicates(self.data_frame, predicates, columns,
+                                                        workers=2, partition_rows=700,
+                                                        min_rows=0)
+            pandas.testing.assert_frame_equal(
+                result, filter_data_by_predicates(self.data_frame, predicates, columns))
+
+    def test_without_shared_memory(self):
+        """Validate workers receive a pickled DataFrame without shared_memory."""
+        predicates = [('group', 'neq', 'a'), ('nullable', 'isin', [2])]
+        with mock.patch.object(pandas_parallel, 'shared_memory', None):
+            result = parallel_filter_data_by_predicates(self.data_frame, predicates,
+                                                        workers=2, partition_rows=700,
+                                                        min_rows=0)
+        pandas.testing.assert_frame_equal(
+            result, filter_data_by_predicates(self.data_frame, predicates))
+
+    def test_aggregate_matches_serial(self):
+        """Validate partial aggregates are reduced to the serial result."""
+        functions = ['sum', 'count', 'mean', 'min', 'max', 'distinct_count']
+        aggregations = {'amount': functions, 'nullable': functions, 'id': ['distinct_count']}
+        result = parallel_aggregate_data_by_columns(self.data_frame, 'group', aggregations,
+                                                    workers=2, partition_rows=700, min_rows=0)
+        pandas.testing.assert_frame_equal(
+            result, aggregate_data_by_columns(self.data_frame, 'group', aggregations),
+            check_dtype=False)
+
+    def test_small_input_runs_serially(self):
+        """Validate no process pool is started below min_rows."""
+        with mock.patch('app.pandas_parallel.ProcessPoolExecutor') as executor:
+            result = run_partitioned(self.data_frame, filter_data_by_columns, ['id'],
+                                     combine=pandas.concat, workers=4, partition_rows=100)
+        executor.assert_not_called()
+        self.assertEqual(list(result.columns), ['id'])
+        self.assertRaises(ValueError, run_partitioned, self.data_frame, filter_data_by_columns,
+                          ['id'], partition_rows=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
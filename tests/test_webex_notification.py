@@ -0,0 +1,83 @@
+"""
+Description: Unit test for webex_notification.
+
+Title: test_webex_notification.py
+
+Author: theStygianArchitect
+"""
+import unittest
+from unittest import mock
+
+import httpx
+
+from app import webex_notification  # pylint: disable=E0401
+from app.webex_notification import WebexClient  # pylint: disable=E0401
+from app.webex_notification import get_messages  # pylint: disable=E0401
+
+
+class WebexClientTestCase(unittest.TestCase):
+    """Unit Tests for WebexClient."""
+
+    def setUp(self):
+        """Overloaded method to setup variables per test."""
+        self.requests = []
+        self.transport = httpx.MockTransport(self._respond)
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        """Answer like Webex for the ckr team and its general room."""
+        self.requests.append(request)
+        items = {
+            '/v1/teams': [{'id': 'team-1', 'name': 'CKR'}],
+            '/v1/rooms': [{'id': 'room-1', 'title': 'ckr'}],
+            '/v1/team/memberships': [{'personId': 'person-1'}],
+            '/v1/messages': [{'id': 'message-1'}],
+        }[request.url.path]
+        return httpx.Response(200, json={'items': items})
+
+    def test_helpers_share_client(self):
+        """Validate a helper sends every request through one client."""
+        with WebexClient('token', transport=self.transport) as client:
+            messages = get_messages('ckr', 'general', client=client)
+        self.assertTrue(client.is_closed)
+        self.assertEqual(messages, {'items': [{'id': 'message-1'}]})
+        self.assertEqual([request.url.path for request in self.requests],
+                         ['/v1/teams', '/v1/team/memberships', '/v1/teams', '/v1/rooms',
+                          '/v1/messages'])
+        self.assertEqual(self.requests[-1].url.params['roomId'], 'room-1')
+        self.assertTrue(all(request.headers['Authorization'] == 'Bearer token'
+                            for request in self.requests))
+
+    def test_default_client_is_reused(self):
+        """Validate helpers without a client reuse the default client."""
+        client = WebexClient('token', transport=self.transport)
+        with mock.patch.object(webex_notification, '_DEFAULT_CLIENT', client), \
+                mock.patch('atexit.register') as register:
+            webex_notification.get_webex_teams()
+            self.assertIs(webex_notification.default_webex_client(), client)
+            client.close()
+            replacement = webex_notification.default_webex_client()
+            self.assertIsNot(replacement, client)
+            webex_notification._close_default_webex_client()  # pylint: disable=W0212
+            self.assertTrue(replacement.is_closed)
+        self.assertEqual(len(self.requests), 1)
+        register.assert_not_called()
+
+    def test_token_read_per_request(self):
+        """Validate a client without a token uses the current WEBEX_TOKEN."""
+        with WebexClient(transport=self.transport) as client:
+            for token in ('old', 'new'):
+                with mock.patch.dict('os.environ', {'WEBEX_TOKEN': token}):
+                    client.request('/v1/teams')
+        self.assertEqual([request.headers['Authorization'] for request in self.requests],
+                         ['Bearer old', 'Bearer new'])
+
+    def test_http2_without_h2(self):
+        """Validate http2 falls back to HTTP/1.1 when h2 is missing."""
+        with mock.patch.object(webex_notification, 'h2', None):
+            with WebexClient('token', http2=True, transport=self.transport) as client:
+                client.request('/v1/teams')
+        self.assertEqual(len(self.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()